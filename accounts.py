@@ -0,0 +1,197 @@
+# accounts.py
+"""
+Account-scoped configuration, state and quota accounting.
+
+accounts.json lists the mailboxes the agent serves. Each account keeps its
+OAuth tokens, replied ids, sender info, sender reputation, mail index,
+attachment cache, deferred campaigns, unsent label updates and daily quota
+usage in its own state directory (accounts/<name>/ by default):
+
+    {
+        "llm_concurrency": 8,
+        "accounts": [
+            {"name": "sales", "max_emails": 200, "daily_llm_tokens": 500000},
+            {"name": "support", "state_dir": "/srv/agent/support"}
+        ]
+    }
+
+    python accounts.py add sales     # authorize Gmail + Calendar for a new account
+    python accounts.py list          # accounts and today's quota usage
+"""
+
+import json
+import os
+from datetime import date
+
+# ------------------------
+# Config
+# ------------------------
+ACCOUNTS_FILE = "accounts.json"
+ACCOUNTS_DIR = "accounts"
+QUOTA_FILE = "quota.json"
+LLM_CONCURRENCY = 8  # LLM requests in flight across all accounts
+
+DEFAULTS = {
+    "enabled": True,
+    "max_emails": 100,              # emails per run
+    "daily_gmail_units": 1000000,   # Gmail API quota units per day
+    "daily_llm_tokens": 1000000,    # prompt + completion tokens per day
+}
+
+# Gmail API quota units per call, by metrics stage
+GMAIL_UNITS = {
+    "gmail.profile": 1,
+    "gmail.labels": 1,
+    "gmail.list": 5,
+    "gmail.get": 5,
+    "gmail.attachment": 5,
+    "gmail.draft": 10,
+    "gmail.batch_modify": 50,
+    "gmail.send": 100,
+}
+
+# (module, attribute, file name) of every per-account state path
+STATE_FILES = [
+    ("main", "TOKEN_FILE", "token.json"),
+    ("main", "REPLIED_FILE", "replied_emails.json"),
+    ("main", "SENDER_INFO_FILE", "sender_info.json"),
+    ("calender_integration", "TOKEN_FILE", "token_calendar.json"),
+    ("sender_reputation", "REPUTATION_FILE", "sender_reputation.json"),
+    ("mail_index", "INDEX_FILE", "mail_index.db"),
+    ("attachments", "CACHE_FILE", "attachment_cache.json"),
+    ("mass_email", "PENDING_CAMPAIGNS_FILE", "pending_campaigns.json"),
+    ("gmail_labels", "PENDING_FILE", "pending_labels.json"),
+]
+
+
+# ------------------------
+# Configuration
+# ------------------------
+def load_config(path=ACCOUNTS_FILE):
+    """Read accounts.json; every account gets DEFAULTS and a state_dir."""
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            config = json.load(f)
+    else:
+        config = {}
+    config.setdefault("llm_concurrency", LLM_CONCURRENCY)
+    accounts = []
+    for entry in config.get("accounts", []):
+        account = dict(DEFAULTS, **entry)
+        account.setdefault("state_dir", os.path.join(ACCOUNTS_DIR, account["name"]))
+        accounts.append(account)
+    config["accounts"] = accounts
+    return config
+
+
+def get_account(name, path=ACCOUNTS_FILE):
+    for account in load_config(path)["accounts"]:
+        if account["name"] == name:
+            return account
+    raise KeyError(f"No account named {name!r} in {path}")
+
+
+def state_path(account, filename):
+    return os.path.join(account["state_dir"], filename)
+
+
+def activate(account):
+    """
+    Point every per-account state path at `account`'s state directory and
+    drop state cached for the previously active account.
+    """
+    import importlib
+
+    import attachments
+    import mail_index
+    import sender_reputation
+
+    os.makedirs(account["state_dir"], exist_ok=True)
+    sender_reputation.reset()
+    attachments.reset()
+    mail_index.close()
+    for module_name, attribute, filename in STATE_FILES:
+        setattr(importlib.import_module(module_name), attribute, state_path(account, filename))
+    importlib.import_module("main").load_replied_state()
+
+
+# ------------------------
+# Quota accounting
+# ------------------------
+def gmail_units(calls):
+    """Gmail quota units spent for a {stage: call count} mapping."""
+    return sum(GMAIL_UNITS.get(stage, 0) * count for stage, count in calls.items())
+
+
+def load_quota(account):
+    """Today's usage for `account`; counters restart every day."""
+    today = date.today().isoformat()
+    path = state_path(account, QUOTA_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            quota = json.load(f)
+        if quota.get("date") == today:
+            return quota
+    return {"date": today, "gmail_units": 0, "llm_tokens": 0, "emails": 0, "runs": 0}
+
+
+def remaining(account):
+    quota = load_quota(account)
+    return {"gmail_units": account["daily_gmail_units"] - quota["gmail_units"],
+            "llm_tokens": account["daily_llm_tokens"] - quota["llm_tokens"]}
+
+
+def record_usage(account, usage, emails=0):
+    """Add one run's metrics.usage() to the account's daily totals."""
+    quota = load_quota(account)
+    quota["gmail_units"] += gmail_units(usage.get("calls", {}))
+    quota["llm_tokens"] += usage.get("llm_tokens", 0)
+    quota["emails"] += emails
+    quota["runs"] += 1
+    os.makedirs(account["state_dir"], exist_ok=True)
+    path = state_path(account, QUOTA_FILE)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(quota, f, indent=4)
+    os.replace(tmp_file, path)
+    return quota
+
+
+def add_account(name, path=ACCOUNTS_FILE):
+    """Append `name` to accounts.json (if missing) and return its account entry."""
+    raw = {"llm_concurrency": LLM_CONCURRENCY, "accounts": []}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            raw = json.load(f)
+    if all(entry["name"] != name for entry in raw.setdefault("accounts", [])):
+        raw["accounts"].append({"name": name})
+        with open(path, "w") as f:
+            json.dump(raw, f, indent=4)
+    return get_account(name, path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "add" and len(sys.argv) > 2:
+        account = add_account(sys.argv[2])
+        activate(account)
+        import calender_integration
+        import main
+        main.load_gmail_credentials()
+        calender_integration.get_calendar_service()
+        print(f"✅ Account '{account['name']}' authorized; state in {account['state_dir']}")
+        print(f"   Put the signature details in {state_path(account, 'sender_info.json')}")
+    elif command == "list":
+        config = load_config()
+        print(f"LLM concurrency: {config['llm_concurrency']}\n")
+        print(f"{'account':<20}{'emails':>8}{'gmail units':>22}{'llm tokens':>22}  state")
+        for account in config["accounts"]:
+            quota = load_quota(account)
+            units = f"{quota['gmail_units']}/{account['daily_gmail_units']}"
+            tokens = f"{quota['llm_tokens']}/{account['daily_llm_tokens']}"
+            flag = "" if account["enabled"] else "  (disabled)"
+            print(f"{account['name']:<20}{quota['emails']:>8}{units:>22}{tokens:>22}  {account['state_dir']}{flag}")
+    else:
+        print("Usage: python accounts.py [list | add <name>]")
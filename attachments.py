@@ -0,0 +1,329 @@
+# attachments.py
+"""
+Attachment text extraction for incoming emails.
+
+PDF, DOCX, calendar invite (.ics) and plain-text attachments are made
+visible to reply generation, calendar extraction and the mail index. Only
+supported attachments within the size budget are downloaded, with
+messages().attachments().get on a few helper threads; PDF and DOCX parsing
+runs in a process pool under a page budget so it never holds up the inbox
+stream. Extracted text is cached per attachment and saved between runs, so
+the same attachment is never downloaded or parsed twice.
+"""
+
+import base64
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from prompt_budget import compact_whitespace, truncate_to_tokens
+
+# ------------------------
+# Config
+# ------------------------
+CACHE_FILE = "attachment_cache.json"
+CACHE_ENTRIES = 2000              # extracted texts kept in the cache file
+MAX_ATTACHMENT_BYTES = 5 * 2**20  # larger attachments are not downloaded
+MAX_ATTACHMENTS = 3               # per email
+MAX_PAGES = 10                    # PDF pages parsed per attachment
+MAX_ATTACHMENT_TOKENS = 600       # text kept per attachment
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+DOWNLOAD_WORKERS = 4
+LOOKAHEAD = 20                    # emails whose attachments are processed ahead of the consumer
+
+PDF_TYPES = ("application/pdf",)
+DOCX_TYPES = ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",)
+TEXT_TYPES = ("text/plain", "text/csv", "text/calendar", "application/ics")
+EXTENSION_TYPES = {".pdf": PDF_TYPES[0], ".docx": DOCX_TYPES[0], ".ics": "text/calendar",
+                   ".txt": "text/plain", ".csv": "text/csv"}
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+ICS_FIELDS = {"SUMMARY": "Event", "DTSTART": "Start", "DTEND": "End", "LOCATION": "Location",
+              "ORGANIZER": "Organizer", "DESCRIPTION": "Description"}
+
+_cache = None
+_cache_dirty = False
+_cache_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ------------------------
+# Finding attachments
+# ------------------------
+def _mime_type(part):
+    mime_type = (part.get("mimeType") or "").lower()
+    if mime_type in ("", "application/octet-stream"):
+        mime_type = EXTENSION_TYPES.get(os.path.splitext(part.get("filename", ""))[1].lower(), mime_type)
+    return mime_type
+
+
+def find_attachments(payload, msg_id):
+    """
+    Descriptors of the supported attachments in a message payload, within the
+    size and count budgets. Inline attachment data is kept; everything else is
+    fetched later by attachment id.
+    """
+    found = []
+    stack = [payload] if payload else []
+    while stack and len(found) < MAX_ATTACHMENTS:
+        part = stack.pop(0)
+        stack.extend(part.get("parts", []) or [])
+        if not part.get("filename"):
+            continue
+        mime_type = _mime_type(part)
+        body = part.get("body", {})
+        if mime_type not in PDF_TYPES + DOCX_TYPES + TEXT_TYPES:
+            continue
+        if body.get("size", 0) > MAX_ATTACHMENT_BYTES:
+            metrics.incr("attachments.too_large")
+            continue
+        found.append({
+            # Gmail attachment ids change between fetches; message id + part id do not
+            "key": f"{msg_id}/{part.get('partId', len(found))}",
+            "msg_id": msg_id,
+            "filename": part["filename"],
+            "mime_type": mime_type,
+            "attachment_id": body.get("attachmentId"),
+            "data": body.get("data"),
+        })
+    return found
+
+
+# ------------------------
+# Parsing (runs in the process pool for PDF and DOCX)
+# ------------------------
+def _pdf_text(data, max_pages):
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    pages = reader.pages[:max_pages]
+    text = "\n".join(page.extract_text() or "" for page in pages)
+    if len(reader.pages) > max_pages:
+        text += f"\n[{len(reader.pages) - max_pages} more page(s) not read]"
+    return text
+
+
+def _docx_text(data):
+    import zipfile
+    from xml.etree import ElementTree
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = ("".join(node.text or "" for node in p.iter(f"{WORD_NS}t")) for p in root.iter(f"{WORD_NS}p"))
+    return "\n".join(p for p in paragraphs if p.strip())
+
+
+def _ics_text(text):
+    """The fields of each VEVENT that matter for scheduling, one per line."""
+    unfolded = re.sub(r"\r?\n[ \t]", "", text)
+    lines = []
+    for line in unfolded.splitlines():
+        name, _, value = line.partition(":")
+        field_name = name.split(";")[0].upper()
+        if field_name in ICS_FIELDS and value:
+            value = value.replace("\\n", " ").replace("\\", "")
+            lines.append(f"{ICS_FIELDS[field_name]}: {value}")
+    return "\n".join(lines)
+
+
+def extract_text(data, mime_type, max_pages=MAX_PAGES):
+    """Plain text of one attachment's bytes; raises on files that cannot be parsed."""
+    if mime_type in PDF_TYPES:
+        return _pdf_text(data, max_pages)
+    if mime_type in DOCX_TYPES:
+        return _docx_text(data)
+    text = data.decode("utf-8", errors="ignore")
+    if mime_type in ("text/calendar", "application/ics"):
+        return _ics_text(text)
+    return text
+
+
+# ------------------------
+# Cache
+# ------------------------
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = OrderedDict()
+        if os.path.exists(CACHE_FILE):
+            try:
+                with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                    _cache.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable {CACHE_FILE}: {e}")
+    return _cache
+
+
+def cached_text(key):
+    with _cache_lock:
+        return _load_cache().get(key)
+
+
+def _store(key, text):
+    global _cache_dirty
+    with _cache_lock:
+        cache = _load_cache()
+        cache[key] = text
+        cache.move_to_end(key)
+        while len(cache) > CACHE_ENTRIES:
+            cache.popitem(last=False)
+        _cache_dirty = True
+
+
+def save():
+    """Write the cache file if anything was added since the last save."""
+    global _cache_dirty
+    with _cache_lock:
+        if not _cache_dirty:
+            return
+        tmp_file = CACHE_FILE + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(_cache, f)
+        os.replace(tmp_file, CACHE_FILE)
+        _cache_dirty = False
+
+
+def reset():
+    """Save and forget the cache, e.g. before switching accounts."""
+    global _cache
+    save()
+    with _cache_lock:
+        _cache = None
+
+
+# ------------------------
+# Extraction stage
+# ------------------------
+def _parse_pool():
+    """
+    The shared process pool, started on first use (spawn, so no locks or
+    clients are inherited). None inside a daemonic process, which cannot have children.
+    """
+    global _pool
+    import multiprocessing
+
+    if multiprocessing.current_process().daemon:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            _pool = ProcessPoolExecutor(PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            # A multiprocessing finalizer rather than atexit: pool and supervisor workers skip
+            # atexit but join their children on exit, which would wait on this pool forever.
+            # Priority 20 runs it before the pool's own queues are closed (priority 10).
+            multiprocessing.util.Finalize(_pool, _pool.shutdown, kwargs={"cancel_futures": True},
+                                          exitpriority=20)
+    return _pool
+
+
+class AttachmentExtractor:
+    """
+    Adds attachment text to EmailRecords.
+
+    `service_factory()` builds a Gmail service; each download thread gets its
+    own, because googleapiclient services are not thread-safe.
+    """
+
+    def __init__(self, service_factory, download_workers=DOWNLOAD_WORKERS):
+        self.service_factory = service_factory
+        self._downloads = ThreadPoolExecutor(download_workers, thread_name_prefix="attachment")
+        self._local = threading.local()
+
+    def _service(self):
+        if getattr(self._local, "service", None) is None:
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def _download(self, attachment):
+        if attachment["data"]:
+            return attachment["data"]
+        with metrics.timed("gmail.attachment"):
+            return self._service().users().messages().attachments().get(
+                userId="me", messageId=attachment["msg_id"], id=attachment["attachment_id"]
+            ).execute().get("data", "")
+
+    def _text(self, attachment):
+        """Text of one attachment: cache, then download and parse. None if it cannot be read."""
+        text = cached_text(attachment["key"])
+        if text is not None:
+            metrics.incr("attachments.cache_hit")
+            return text
+        try:
+            encoded = self._download(attachment)
+            data = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            mime_type = attachment["mime_type"]
+            pool = _parse_pool() if mime_type in PDF_TYPES + DOCX_TYPES else None
+            with metrics.timed("attachments.parse"):
+                if pool:
+                    text = pool.submit(extract_text, data, mime_type).result()
+                else:
+                    text = extract_text(data, mime_type)
+        except Exception as e:
+            print(f"⚠️ Could not read attachment {attachment['filename']}: {e}")
+            metrics.incr("attachments.failed")
+            return None
+        text = truncate_to_tokens(compact_whitespace(text), MAX_ATTACHMENT_TOKENS)
+        _store(attachment["key"], text)
+        metrics.incr("attachments.extracted")
+        return text
+
+    def _extract_all(self, record):
+        sections = []
+        for attachment in record.attachments:
+            text = self._text(attachment)
+            if text:
+                sections.append(f"[{attachment['filename']}]\n{text}")
+        if sections:
+            record.add_attachment_text("\n\n".join(sections))
+        return record
+
+    def submit(self, record):
+        """Start extracting `record`'s attachments; returns a future that resolves to the record."""
+        return self._downloads.submit(self._extract_all, record)
+
+    def close(self):
+        self._downloads.shutdown(cancel_futures=True)
+        save()
+
+
+def with_attachment_text(records, service_factory, lookahead=LOOKAHEAD):
+    """
+    Pass `records` through with attachment text added, in their original order.
+    The first record is yielded as soon as it is ready; more records are only
+    pulled while the one at the head is still being extracted, up to
+    `lookahead` at once, so one slow PDF only delays the records behind it.
+    """
+    records = iter(records)
+    extractor = None
+    pending = deque()
+    exhausted = False
+    try:
+        while True:
+            while pending and not (hasattr(pending[0], "result") and not pending[0].done()):
+                item = pending.popleft()
+                yield item.result() if hasattr(item, "result") else item
+            if exhausted or len(pending) >= lookahead:
+                if not pending:
+                    return
+                yield pending.popleft().result()
+                continue
+            record = next(records, None)
+            if record is None:
+                exhausted = True
+            elif record.attachments:
+                extractor = extractor or AttachmentExtractor(service_factory)
+                pending.append(extractor.submit(record))
+            else:
+                pending.append(record)
+    finally:
+        if extractor:
+            extractor.close()
+        else:
+            save()
@@ -0,0 +1,586 @@
+# benchmark.py
+"""
+Offline throughput benchmark for the email pipeline.
+
+Runs fetch_emails, send_mass_email, send_daily_report and
+process_email_for_calendar against the local stand-ins in fake_services.py,
+each scenario in a fresh interpreter so peak RSS is per scenario. The
+`startup` scenario times a cold `import main`.
+
+    python benchmark.py                          # all scenarios
+    python benchmark.py -s fetch -s calendar --llm-latency 0.3
+    python benchmark.py --json bench.json --baseline old_bench.json
+"""
+
+import argparse
+import builtins
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fake_services import FakeServices, sample_pdf
+
+# ------------------------
+# Helpers
+# ------------------------
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def build_fake_service(url, name, version, path=""):
+    """Build a googleapiclient service pointed at the local stand-in server."""
+    import httplib2
+    from googleapiclient.discovery import build
+
+    return build(name, version, http=httplib2.Http(), static_discovery=True,
+                 client_options={"api_endpoint": f"{url}/{path}"})
+
+
+@contextlib.contextmanager
+def scripted_input(answers):
+    """Feed canned answers to input() for the interactive flows."""
+    answers = iter(answers)
+    original = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+def write_sample_pdf(path, lines):
+    """Write a minimal single-page PDF containing `lines` of text."""
+    with open(path, "wb") as f:
+        f.write(sample_pdf(lines))
+
+
+# ------------------------
+# Scenarios (run inside a child process)
+# ------------------------
+def scenario_fetch(url, opts):
+    from main import fetch_emails
+
+    service = build_fake_service(url, "gmail", "v1")
+    latencies, items = [], 0
+    for _ in range(opts["iterations"]):
+        start = time.perf_counter()
+        emails = fetch_emails(service, n=opts["batch"])
+        latencies.append(time.perf_counter() - start)
+        items += len(emails)
+    return {"items": items, "latencies": latencies}
+
+
+def scenario_mass_email(url, opts, mode="1"):
+    import mass_email
+
+    mass_email.RATE_LIMIT_SECONDS = opts["rate_limit"]
+    mass_email.BATCH_POLL_SECONDS = 0.05
+    _pace_sends(opts)
+    service = build_fake_service(url, "gmail", "v1")
+    sender_info = {"name": "Bench User", "email": "me@example.com", "designation": "Tester",
+                   "company": "RetailEye", "phone": ""}
+    recipients = ",".join(f"user{i}@example.com" for i in range(opts["batch"]))
+    latencies = []
+    for _ in range(opts["iterations"]):
+        start = time.perf_counter()
+        with scripted_input(["1", recipients, "Weekly update", "", "y", mode]):
+            mass_email.send_mass_email(service, sender_info)
+        latencies.append(time.perf_counter() - start)
+    return {"items": opts["batch"] * opts["iterations"], "latencies": latencies}
+
+
+def scenario_mass_batch(url, opts):
+    """send_mass_email in deferred mode: one Batch API job per campaign instead of a completion per recipient."""
+    return scenario_mass_email(url, opts, mode="2")
+
+
+def _pace_sends(opts):
+    """Batched sends keep their quota pacing only when --rate-limit asks for real pacing."""
+    import campaign_delivery
+
+    if not opts["rate_limit"]:
+        campaign_delivery.SEND_UNITS_PER_SECOND = None
+
+
+def scenario_campaign_send(url, opts):
+    """Delivery only: pre-rendered MIME in Gmail batch requests vs the one-message-per-call loop."""
+    import mass_email
+    from campaign_delivery import CampaignTemplate, deliver
+
+    mass_email.RATE_LIMIT_SECONDS = opts["rate_limit"]
+    _pace_sends(opts)
+    service = build_fake_service(url, "gmail", "v1")
+    sender_info = {"name": "Bench User", "email": "me@example.com", "designation": "Tester",
+                   "company": "RetailEye", "phone": ""}
+    recipients = [{"name": f"User{i}", "email": f"user{i}@example.com"} for i in range(opts["batch"] * 5)]
+    bodies = [f"Hello User{i},\n\nThis week's update covers the new store layouts, the festive offers "
+              f"and the stock review.\n\nBest regards," for i in range(len(recipients))]
+    latencies, legacy, failed = [], [], 0
+    for _ in range(opts["iterations"]):
+        start = time.perf_counter()
+        template = CampaignTemplate(sender_info["email"], "Weekly update", mass_email._signature(sender_info))
+        results = deliver(service, template, zip(recipients, bodies))
+        latencies.append(time.perf_counter() - start)
+        failed += sum(1 for result in results if result["error"])
+        start = time.perf_counter()
+        for recipient, body in zip(recipients, bodies):
+            mass_email._send_one(service, sender_info, recipient, "Weekly update", body)
+            time.sleep(mass_email.RATE_LIMIT_SECONDS)
+        legacy.append(time.perf_counter() - start)
+    items = len(recipients) * opts["iterations"]
+    return {"items": items, "latencies": latencies,
+            "note": f"{items / sum(latencies) * 60:.0f} msgs/min batched vs {items / sum(legacy) * 60:.0f} "
+                    f"msgs/min one by one; {failed} failed"}
+
+
+def scenario_daily_report(url, opts):
+    import send_daily_report
+
+    workdir = tempfile.mkdtemp(prefix="bench_report_")
+    write_sample_pdf(os.path.join(workdir, "LavishSup_report.pdf"),
+                     [f"Category {i}: sales {1000 + 37 * i} units, stock alerts {i % 3}" for i in range(40)])
+    csv_path = os.path.join(workdir, "recipients.csv")
+    with open(csv_path, "w") as f:
+        f.write("email\n" + "\n".join(f"manager{i}@example.com" for i in range(opts["batch"])) + "\n")
+    send_daily_report.REPORTS_FOLDER = workdir
+    send_daily_report.RECIPIENTS_CSV = csv_path
+
+    service = build_fake_service(url, "gmail", "v1")
+    latencies = []
+    for _ in range(opts["iterations"]):
+        start = time.perf_counter()
+        send_daily_report.send_daily_report(service, "me@example.com")
+        latencies.append(time.perf_counter() - start)
+    return {"items": opts["iterations"], "latencies": latencies}
+
+
+def scenario_calendar(url, opts):
+    import calender_integration
+    from fake_services import build_mailbox
+    from inbox_stream import get_message_body
+
+    calendar_service = build_fake_service(url, "calendar", "v3", "calendar/v3/")
+    calender_integration.get_calendar_service = lambda: calendar_service
+    mailbox = build_mailbox(opts["emails"], opts["seed"])[:opts["batch"] * opts["iterations"]]
+    latencies = []
+    for message in mailbox:
+        body = get_message_body(message["payload"]) or "(No content)"
+        start = time.perf_counter()
+        calender_integration.process_email_for_calendar(body, email_sender="bench", email_subject="bench")
+        latencies.append(time.perf_counter() - start)
+    return {"items": len(mailbox), "latencies": latencies}
+
+
+def scenario_pipeline(url, opts):
+    """Option 1 processing of a fetched batch; every draft is reviewed and discarded."""
+    import calender_integration
+    import email_pipeline
+    from fake_services import build_mailbox
+    from inbox_stream import get_message_body
+
+    calender_integration.get_calendar_service = lambda: build_fake_service(url, "calendar", "v3", "calendar/v3/")
+    service = build_fake_service(url, "gmail", "v1")
+    mailbox = build_mailbox(opts["emails"], opts["seed"])
+    latencies, items = [], 0
+    for i in range(opts["iterations"]):
+        batch = [{"id": m["id"], "sender": "bench@example.com", "subject": m["kind"],
+                  "body": get_message_body(m["payload"]) or "(No content)"}
+                 for m in mailbox[i * opts["batch"]:(i + 1) * opts["batch"]]]
+        start = time.perf_counter()
+        with scripted_input(itertools.repeat("")):
+            email_pipeline.process_emails(service, batch, max_workers=opts["workers"])
+        latencies.append(time.perf_counter() - start)
+        items += len(batch)
+    return {"items": items, "latencies": latencies}
+
+
+def scenario_reply_stream(url, opts):
+    """Time to first visible reply text: streamed LiveDraft vs the blocking completion."""
+    import reply_handler
+    from fake_services import build_mailbox
+    from inbox_stream import get_message_body
+
+    emails = [{"id": m["id"], "sender": "Bench <bench@example.com>", "subject": m["kind"],
+               "body": get_message_body(m["payload"]) or "(No content)"}
+              for m in build_mailbox(opts["batch"], opts["seed"])]
+    reply_handler.analyze_email(emails[0])  # create the client outside the timings
+    latencies, blocking = [], []
+    for _ in range(opts["iterations"]):
+        for email_data in emails:
+            start = time.perf_counter()
+            live = reply_handler.analyze_email_live(email_data).start()
+            first = None
+            for _kind, _text in live:
+                if first is None:
+                    first = time.perf_counter() - start
+            latencies.append(first if first is not None else time.perf_counter() - start)
+            start = time.perf_counter()
+            reply_handler.analyze_email(email_data)
+            blocking.append(time.perf_counter() - start)
+    return {"items": len(latencies), "latencies": latencies,
+            "note": f"blocking completion p50 {percentile(blocking, 50) * 1000:.1f} ms"}
+
+
+def scenario_triage(url, opts):
+    """Daily digest triage: emails packed several to a request, against one summary call per email."""
+    import daily_digest
+    import mail_index
+    import metrics
+    from fake_services import build_mailbox
+    from inbox_stream import get_message_body
+    from summarize_emails import summarize_email
+
+    service = build_fake_service(url, "gmail", "v1")
+    mailbox = build_mailbox(opts["emails"], opts["seed"])
+    since = time.time()
+    latencies, per_email, items = [], [], 0
+    for i in range(opts["iterations"]):
+        batch = [{"id": m["id"], "sender": "bench@example.com", "subject": m["kind"],
+                  "body": get_message_body(m["payload"]) or "(No content)"}
+                 for m in mailbox[i * opts["batch"]:(i + 1) * opts["batch"]]]
+        for email_data in batch:
+            mail_index.index_email(email_data)
+        start = time.perf_counter()
+        daily_digest.send_daily_digest(service, "me@example.com", since=since)
+        latencies.append(time.perf_counter() - start)
+        items += len(batch)
+        start = time.perf_counter()
+        for email_data in batch:
+            summarize_email(email_data["body"])
+        per_email.append(time.perf_counter() - start)
+    requests = metrics.usage()["calls"].get("llm.triage", 0)
+    return {"items": items, "latencies": latencies,
+            "note": f"{requests} triage request(s) for {items} emails; one call per email "
+                    f"{items / sum(per_email):.1f} emails/s"}
+
+
+def scenario_stream(url, opts):
+    """Drain the whole synthetic mailbox through the paginated, prefetching inbox stream."""
+    from main import stream_incoming_emails
+
+    service = build_fake_service(url, "gmail", "v1")
+    prefetch_service = build_fake_service(url, "gmail", "v1")
+    latencies, items = [], 0
+    for _ in range(opts["iterations"]):
+        last = time.perf_counter()
+        for record in stream_incoming_emails(service, prefetch_service=prefetch_service):
+            record.body
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+            items += 1
+    return {"items": items, "latencies": latencies}
+
+
+def scenario_poll(url, opts):
+    """Repeated inbox polls where every handled and spam email is labeled and marked read in bulk."""
+    from gmail_labels import OutcomeLabeler
+    from main import stream_incoming_emails
+
+    service = build_fake_service(url, "gmail", "v1")
+    labeler = OutcomeLabeler(build_fake_service(url, "gmail", "v1"))
+    latencies, items = [], 0
+    for i in range(opts["iterations"]):
+        start = time.perf_counter()
+        seen = 0
+        for record in stream_incoming_emails(service, on_spam=labeler.add_spam):
+            labeler.add(record.id, "skipped")
+            seen += 1
+        labeler.flush()
+        latencies.append(time.perf_counter() - start)
+        items += seen
+        print(f"Poll {i + 1}: {seen} email(s) to process")
+    return {"items": items, "latencies": latencies}
+
+
+def scenario_attachments(url, opts):
+    """Inbox stream with attachment extraction: a cold pass, then a pass served from the attachment cache."""
+    import attachments
+    from main import stream_incoming_emails
+
+    service = build_fake_service(url, "gmail", "v1")
+    factory = lambda: build_fake_service(url, "gmail", "v1")
+    latencies, passes = [], []
+    for _ in range(2):
+        start = last = time.perf_counter()
+        with_text = 0
+        for record in stream_incoming_emails(service, limit=opts["batch"] * opts["iterations"],
+                                             attachment_service_factory=factory):
+            with_text += "=== Attachments ===" in record.body
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+        passes.append(time.perf_counter() - start)
+    attachments.save()
+    return {"items": len(latencies), "latencies": latencies,
+            "note": f"{with_text} email(s) with attachment text; cold pass {passes[0] * 1000:.0f} ms, "
+                    f"cached pass {passes[1] * 1000:.0f} ms"}
+
+
+def scenario_html(url, opts):
+    """HTML-only marketing newsletters converted to text, and the prompt tokens that saves over raw HTML."""
+    from fake_services import TOPICS, marketing_newsletter
+    from html_text import html_to_text
+    from prompt_budget import count_tokens
+
+    pages = [marketing_newsletter(TOPICS[i % len(TOPICS)], 1000 + i, sections=40 + 10 * (i % 5))
+             for i in range(opts["batch"])]
+    latencies, html_tokens, text_tokens = [], 0, 0
+    for _ in range(opts["iterations"]):
+        for html in pages:
+            start = time.perf_counter()
+            text = html_to_text(html)
+            latencies.append(time.perf_counter() - start)
+    for html in pages:
+        html_tokens += count_tokens(html)
+        text_tokens += count_tokens(html_to_text(html))
+    size_kb = sum(map(len, pages)) / len(pages) / 1024
+    return {"items": len(latencies), "latencies": latencies,
+            "note": f"{size_kb:.0f} KB per email; {html_tokens // len(pages)} tokens raw HTML "
+                    f"vs {text_tokens // len(pages)} as text"}
+
+
+def _spam_samples(opts):
+    from fake_services import build_mailbox
+    from inbox_stream import get_message_body
+
+    return [(get_message_body(m["payload"]) or "(No content)", m["kind"] == "marketing")
+            for m in build_mailbox(opts["emails"], opts["seed"])]
+
+
+def _score_texts(is_spam, texts):
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        is_spam(text)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def scenario_spam_pickle(url, opts):
+    """Frozen TF-IDF spam_model.pkl + vectorizer.pkl: load time and scoring throughput."""
+    import spam_classifier
+
+    texts = [text for text, _ in _spam_samples(opts)]
+    start = time.perf_counter()
+    spam_classifier.load_model()
+    load = time.perf_counter() - start
+    latencies = _score_texts(spam_classifier.is_spam, texts)
+    return {"items": len(texts), "latencies": latencies, "load_ms": load * 1000}
+
+
+def _train_online_model(model_file, opts):
+    import online_spam_model
+
+    online_spam_model.ONLINE_MODEL_FILE = model_file
+    texts, labels = zip(*_spam_samples(opts))
+    online_spam_model.partial_fit(list(texts), [int(label) for label in labels])
+    online_spam_model.save_model()
+
+
+def scenario_spam_online(url, opts):
+    """Hashing + SGD engine, trained on the synthetic mailbox first if no model is saved."""
+    import online_spam_model
+
+    samples = _spam_samples(opts)
+    if not os.path.exists(online_spam_model.ONLINE_MODEL_FILE):
+        # Train in a separate process so the timed load below still pays for importing sklearn
+        model_file = os.path.join(tempfile.mkdtemp(prefix="bench_spam_"), "model.pkl")
+        subprocess.run([sys.executable, "-c", f"import benchmark; benchmark._train_online_model({model_file!r}, {opts!r})"],
+                       check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        online_spam_model.ONLINE_MODEL_FILE = model_file
+    start = time.perf_counter()
+    online_spam_model.load_model()
+    online_spam_model._get_vectorizer()
+    load = time.perf_counter() - start
+    latencies = _score_texts(online_spam_model.is_spam, [text for text, _ in samples])
+    return {"items": len(samples), "latencies": latencies, "load_ms": load * 1000}
+
+
+def scenario_startup(url, opts):
+    """Cold start: `import main` in a fresh interpreter, without OPENAI_API_KEY or network."""
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "OPENAI_BASE_URL")}
+    latencies = []
+    for _ in range(opts["iterations"]):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        latencies.append(time.perf_counter() - start)
+    return {"items": opts["iterations"], "latencies": latencies}
+
+
+SCENARIOS = {
+    "fetch": scenario_fetch,
+    "mass_email": scenario_mass_email,
+    "mass_batch": scenario_mass_batch,
+    "campaign_send": scenario_campaign_send,
+    "daily_report": scenario_daily_report,
+    "calendar": scenario_calendar,
+    "pipeline": scenario_pipeline,
+    "triage": scenario_triage,
+    "stream": scenario_stream,
+    "reply_stream": scenario_reply_stream,
+    "poll": scenario_poll,
+    "attachments": scenario_attachments,
+    "html": scenario_html,
+    "spam_pickle": scenario_spam_pickle,
+    "spam_online": scenario_spam_online,
+    "startup": scenario_startup,
+}
+
+
+def _run_in_child(name, url, opts):
+    import metrics
+
+    import attachments
+    import mail_index
+    import sender_reputation
+
+    # Keep persistent agent state out of the working directory
+    state_dir = tempfile.mkdtemp(prefix="bench_state_")
+    attachments.CACHE_FILE = os.path.join(state_dir, "attachment_cache.json")
+    sender_reputation.REPUTATION_FILE = os.path.join(state_dir, "sender_reputation.json")
+    mail_index.INDEX_FILE = os.path.join(state_dir, "mail_index.db")
+    os.environ["OPENAI_API_KEY"] = "bench-key"
+    os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+    sink = sys.stdout if opts["verbose"] else open(os.devnull, "w", encoding="utf-8")
+    with contextlib.redirect_stdout(sink):
+        start = time.perf_counter()
+        result = SCENARIOS[name](url, opts)
+        result["wall"] = time.perf_counter() - start
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["profile"] = metrics.snapshot()
+    return result
+
+
+# ------------------------
+# Reporting
+# ------------------------
+def summarize(name, result, calls):
+    items = result["items"]
+    busy = sum(result["latencies"])
+    total_calls = sum(calls.values())
+    return {
+        "scenario": name,
+        "items": items,
+        "wall_s": round(result["wall"], 4),
+        "emails_per_s": round(items / busy, 2) if busy else 0.0,
+        "p50_ms": round(percentile(result["latencies"], 50) * 1000, 2),
+        "p95_ms": round(percentile(result["latencies"], 95) * 1000, 2),
+        "api_calls": total_calls,
+        "api_calls_per_email": round(total_calls / items, 2) if items else 0.0,
+        "calls_by_route": calls,
+        "peak_rss_mb": round(result["peak_rss_mb"], 1) if result["peak_rss_mb"] else None,
+        "profile": result["profile"],
+        "load_ms": round(result["load_ms"], 2) if "load_ms" in result else None,
+        "note": result.get("note"),
+    }
+
+
+def print_table(rows, baseline=None):
+    baseline = {row["scenario"]: row for row in (baseline or [])}
+    header = f"{'scenario':<14}{'items':>7}{'emails/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'calls/email':>13}{'peak MB':>9}"
+    print(header)
+    print("─" * len(header))
+    for row in rows:
+        print(f"{row['scenario']:<14}{row['items']:>7}{row['emails_per_s']:>11}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['api_calls_per_email']:>13}{str(row['peak_rss_mb']):>9}")
+        if row.get("load_ms") is not None:
+            print(f"{'':<14}model load {row['load_ms']} ms")
+        if row.get("note"):
+            print(f"{'':<14}{row['note']}")
+        old = baseline.get(row["scenario"])
+        if old and old.get("emails_per_s"):
+            change = (row["emails_per_s"] - old["emails_per_s"]) / old["emails_per_s"] * 100
+            flag = "⚠️ " if change < -10 else ""
+            print(f"{'':<14}{flag}throughput {change:+.1f}% vs baseline, "
+                  f"p95 {old['p95_ms']} → {row['p95_ms']} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the email agent against local fake services.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--emails", type=int, default=200, help="Synthetic mailbox size")
+    parser.add_argument("--batch", type=int, default=20, help="Emails/recipients per iteration")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake OpenAI seconds per call")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Fake Google API seconds per call")
+    parser.add_argument("--batch-latency", type=float, default=0.5, help="Fake Batch API seconds per job")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="mass_email.RATE_LIMIT_SECONDS during the run (default 0 to measure the code)")
+    parser.add_argument("--workers", type=int, default=40, help="Thread pool size for the pipeline scenario")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's own output")
+    parser.add_argument("--profile", action="store_true", help="Print the per-stage breakdown of each scenario")
+    args = parser.parse_args(argv)
+
+    opts = {"emails": args.emails, "batch": args.batch, "iterations": args.iterations,
+            "rate_limit": args.rate_limit, "seed": args.seed, "verbose": args.verbose,
+            "workers": args.workers}
+    names = args.scenario or list(SCENARIOS)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+
+    rows = []
+    ctx = multiprocessing.get_context("spawn")
+    with FakeServices(args.emails, args.llm_latency, args.api_latency, args.seed,
+                      batch_latency=args.batch_latency) as services:
+        print(f"🧪 Fake services on {services.url} (llm latency {args.llm_latency}s)\n")
+        for name in names:
+            services.reset_counters()
+            services.reset_mailbox()
+            # Not a multiprocessing.Pool: its daemonic workers could not start process pools of their own
+            with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                try:
+                    result = pool.submit(_run_in_child, name, services.url, opts).result()
+                except Exception as e:
+                    print(f"❌ Scenario '{name}' failed: {e}")
+                    continue
+            rows.append(summarize(name, result, services.snapshot_counters()))
+
+    print_table(rows, baseline)
+    if args.profile:
+        import metrics
+
+        for row in rows:
+            print(f"\n📊 {row['scenario']}")
+            print(metrics.format_profile(row["profile"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"options": vars(args), "results": rows}, f, indent=4)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,37 +2,36 @@
 
 import os
 import json
-from openai import OpenAI
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-
-# -------------------------------
-# OpenAI client setup
-# -------------------------------
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not set in environment variables.")
-
-client = OpenAI(api_key=api_key)
+from datetime import datetime
+import metrics
+from openai_client import get_client, llm_slot
+from prompt_budget import compact_email_body, MAX_EVENT_TOKENS
+from event_detector import could_contain_event
 
 # -------------------------------
 # Google Calendar API setup
 # -------------------------------
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
+TOKEN_FILE = "token_calendar.json"     # per account, see accounts.activate()
+CREDENTIALS_FILE = "credentials.json"
 
 def get_calendar_service():
+    # Google client libraries are imported here so importing this module stays cheap
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from googleapiclient.discovery import build
+
     creds = None
-    if os.path.exists("token_calendar.json"):
-        creds = Credentials.from_authorized_user_file("token_calendar.json", SCOPES)
+    if os.path.exists(TOKEN_FILE):
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
         else:
-            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
+            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
             creds = flow.run_local_server(port=0)
-        with open("token_calendar.json", "w") as token:
+        with open(TOKEN_FILE, "w") as token:
             token.write(creds.to_json())
     service = build("calendar", "v3", credentials=creds)
     return service
@@ -50,7 +49,8 @@ def is_slot_free(service, start_time, end_time):
         "timeZone": "Asia/Kolkata",
         "items": [{"id": "primary"}]
     }
-    events_result = service.freebusy().query(body=body).execute()
+    with metrics.timed("calendar.freebusy"):
+        events_result = service.freebusy().query(body=body).execute()
     busy_times = events_result['calendars']['primary']['busy']
     return len(busy_times) == 0
 
@@ -68,7 +68,8 @@ def add_event_to_calendar(service, summary, start_time, end_time):
             "start": {"dateTime": start_time, "timeZone": "Asia/Kolkata"},
             "end": {"dateTime": end_time, "timeZone": "Asia/Kolkata"},
         }
-        created_event = service.events().insert(calendarId="primary", body=event).execute()
+        with metrics.timed("calendar.insert"):
+            created_event = service.events().insert(calendarId="primary", body=event).execute()
         print("\n📅 Calendar Update")
         print("─────────────────────────────")
         print(f"Title      : {summary}")
@@ -87,6 +88,15 @@ def extract_event_from_email(email_body):
     Returns dict: {"title": str, "start_time": str, "end_time": str} in ISO format.
     If no event found, returns None.
     """
+    # Forwarded invites are the event itself, so only reply history is stripped
+    email_body = compact_email_body(email_body, MAX_EVENT_TOKENS, keep_forwarded=True)
+
+    # Most mail has no date or time at all; skip the LLM call for those. Checked after
+    # compaction, since every reply's "On <date> at <time>, X wrote:" header has both
+    if not could_contain_event(email_body):
+        metrics.incr("calendar.prefilter_skipped")
+        return None
+    metrics.incr("calendar.prefilter_passed")
     prompt = f"""
     Extract any meeting, appointment, or important date from this email.
     Return ONLY in JSON format like:
@@ -100,14 +110,16 @@ def extract_event_from_email(email_body):
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Extract events from emails in JSON format only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0
-        )
+        with llm_slot(), metrics.timed("llm.calendar"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "Extract events from emails in JSON format only."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0
+            )
+        metrics.record_llm_usage("llm.calendar", response)
         content = response.choices[0].message.content.strip()
 
         if content.lower() in ["null", '"null"']:
@@ -123,13 +135,57 @@ def extract_event_from_email(email_body):
         print(f"❌ Error extracting event: {e}")
         return None
 
+# -------------------------------
+# Detect event and check availability (no user-facing output)
+# -------------------------------
+def detect_calendar_event(email_body, service):
+    """
+    Run the LLM extraction and freebusy check for one email.
+    Safe to call from a worker thread with a thread-owned service.
+    Returns (event, slot_free), or (None, None) if no event was found.
+    """
+    event = extract_event_from_email(email_body)
+    if not event:
+        return None, None
+    return event, is_slot_free(service, event['start_time'], event['end_time'])
+
+def _overlaps(start, end, booked):
+    try:
+        start_dt, end_dt = datetime.fromisoformat(start), datetime.fromisoformat(end)
+        return any(start_dt < datetime.fromisoformat(b_end) and end_dt > datetime.fromisoformat(b_start)
+                   for b_start, b_end in booked)
+    except ValueError:
+        return any(start < b_end and end > b_start for b_start, b_end in booked)
+
+def book_detected_event(service, event, slot_free, booked=None):
+    """
+    Add a detected event if its slot was free.
+    `booked` collects (start, end) slots added in this run, so two emails checked
+    concurrently against the same free slot cannot both be booked.
+    """
+    if not event:
+        print("ℹ️ No event detected in this email.\n")
+        return
+
+    start = event['start_time']
+    end = event['end_time']
+    if slot_free and booked is not None and _overlaps(start, end, booked):
+        slot_free = False
+    if slot_free:
+        add_event_to_calendar(service, event['title'], start, end)
+        if booked is not None:
+            booked.append((start, end))
+    else:
+        print(f"⚠️ Cannot add '{event['title']}' — slot from {start} to {end} is already booked.\n")
+
 # -------------------------------
 # Process email for calendar
 # -------------------------------
-def process_email_for_calendar(email_body, email_sender=None, email_subject=None):
+def process_email_for_calendar(email_body, email_sender=None, email_subject=None, detection=None, booked=None):
     """
     Detect event in email and add to calendar if slot is free.
     Shows email sender/subject for context.
+    `detection` is a precomputed detect_calendar_event() result, if any.
     """
     header_info = ""
     if email_sender or email_subject:
@@ -141,15 +197,7 @@ def process_email_for_calendar(email_body, email_sender=None, email_subject=None
         print(header_info)
 
     print("🔹 Processing email for calendar...")
-    service = get_calendar_service()
-    event = extract_event_from_email(email_body)
-    if not event:
-        print("ℹ️ No event detected in this email.\n")
-        return
-
-    start = event['start_time']
-    end = event['end_time']
-    if is_slot_free(service, start, end):
-        add_event_to_calendar(service, event['title'], start, end)
-    else:
-        print(f"⚠️ Cannot add '{event['title']}' — slot from {start} to {end} is already booked.\n")
+    service = get_calendar_service() if detection is None or detection[0] else None
+    if detection is None:
+        detection = detect_calendar_event(email_body, service)
+    book_detected_event(service, *detection, booked=booked)
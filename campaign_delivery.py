@@ -0,0 +1,156 @@
+# campaign_delivery.py
+"""
+Campaign delivery engine for mass email.
+
+The MIME header block and signature are rendered once per campaign, so each
+recipient's message is only their address and body spliced into that
+skeleton and base64url-encoded; no MIMEText object is built per recipient.
+Messages go out as Gmail batch HTTP requests, several sends per round trip,
+paced to stay within the per-user quota, and every per-message result is
+mapped back to its recipient.
+"""
+
+import base64
+import time
+from collections import deque
+from email.mime.text import MIMEText
+from urllib.parse import urljoin
+
+import metrics
+
+# ------------------------
+# Config
+# ------------------------
+SEND_BATCH_SIZE = 10         # sends per batch HTTP request; Gmail rate-limits large bursts
+SEND_UNITS = 100             # quota units per messages.send
+SEND_UNITS_PER_SECOND = 250  # Gmail per-user quota rate; None disables pacing
+MAX_ATTEMPTS = 4             # per message, for rate-limit and server errors
+RETRY_BASE_SECONDS = 2       # doubled on every further attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+TO_PLACEHOLDER = "recipient@campaign.invalid"
+
+
+# ------------------------
+# Rendering
+# ------------------------
+class CampaignTemplate:
+    """
+    A campaign's pre-rendered message skeleton. render() produces the same
+    message as a MIMEText with these headers, always as UTF-8 base64.
+    """
+
+    def __init__(self, sender, subject, signature=""):
+        skeleton = MIMEText("", "plain", "utf-8")
+        skeleton["to"] = TO_PLACEHOLDER
+        skeleton["from"] = sender
+        skeleton["subject"] = subject
+        headers = skeleton.as_bytes().partition(b"\n\n")[0]
+        self._before, self._after = headers.split(TO_PLACEHOLDER.encode("ascii"))
+        self._after += b"\n\n"
+        self.signature = signature
+
+    def render(self, to, body):
+        """The base64url `raw` field for one recipient's message."""
+        if "\r" in to or "\n" in to:
+            raise ValueError(f"invalid recipient address {to!r}")
+        text = (body + self.signature).encode("utf-8")
+        message = self._before + to.encode("utf-8") + self._after + base64.encodebytes(text)
+        return base64.urlsafe_b64encode(message).decode("ascii")
+
+
+# ------------------------
+# Batch sending
+# ------------------------
+def _batch_uri(service):
+    # Built from the service's endpoint, so a client_options api_endpoint also applies to batches
+    return urljoin(service._baseUrl, service._rootDesc.get("batchPath", "batch"))
+
+
+def _retryable(exception):
+    status = getattr(getattr(exception, "resp", None), "status", None)
+    return status in RETRY_STATUSES or (status == 403 and "ateLimitExceeded" in str(exception))
+
+
+def _send_batch(service, items):
+    """One batch HTTP request for [(request_id, raw)]; returns {request_id: (response, exception)}."""
+    from googleapiclient.http import BatchHttpRequest
+
+    outcomes = {}
+
+    def callback(request_id, response, exception):
+        outcomes[request_id] = (response, exception)
+
+    batch = BatchHttpRequest(callback=callback, batch_uri=_batch_uri(service))
+    for request_id, raw in items:
+        batch.add(service.users().messages().send(userId="me", body={"raw": raw}), request_id=request_id)
+    start = time.perf_counter()
+    try:
+        with metrics.timed("gmail.send_batch"):
+            batch.execute()
+    except Exception as e:
+        return {request_id: (None, e) for request_id, _ in items}
+    # One gmail.send sample per message, so per-send timings and quota accounting still add up
+    share = (time.perf_counter() - start) / len(items)
+    for _ in items:
+        metrics.record("gmail.send", share)
+    return outcomes
+
+
+def deliver(service, template, messages, on_result=None, batch_size=SEND_BATCH_SIZE):
+    """
+    Send `messages`, an iterable of (recipient, body) pairs with recipient a
+    {"name", "email"} dict, in batches of `batch_size` sends. Rate-limited and
+    failed-on-the-server sends are retried with backoff.
+
+    Returns one result per message, in input order:
+    {"recipient": ..., "id": <Gmail message id or None>, "error": <None or str>}.
+    `on_result(result)` is called as soon as each message has its final outcome.
+    """
+    results = []
+    queue = deque()  # (result, raw, attempt)
+    next_send = time.monotonic()
+
+    def finish(result, error=None):
+        result["error"] = error
+        metrics.incr("campaign.failed" if error else "campaign.sent")
+        if on_result:
+            on_result(result)
+
+    def flush():
+        nonlocal next_send
+        items = [queue.popleft() for _ in range(min(batch_size, len(queue)))]
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_send = time.monotonic()
+        if SEND_UNITS_PER_SECOND:
+            next_send += len(items) * SEND_UNITS / SEND_UNITS_PER_SECOND
+        outcomes = _send_batch(service, [(str(i), raw) for i, (_, raw, _) in enumerate(items)])
+        backoff = 0
+        for i, (result, raw, attempt) in enumerate(items):
+            response, exception = outcomes.get(str(i), (None, RuntimeError("no response in batch")))
+            if exception is None:
+                result["id"] = response.get("id")
+                finish(result)
+            elif _retryable(exception) and attempt + 1 < MAX_ATTEMPTS:
+                metrics.incr("campaign.retried")
+                backoff = max(backoff, RETRY_BASE_SECONDS * 2 ** attempt)
+                queue.append((result, raw, attempt + 1))
+            else:
+                finish(result, str(exception))
+        if backoff:
+            next_send = max(next_send, time.monotonic() + backoff)
+
+    for recipient, body in messages:
+        result = {"recipient": recipient, "id": None, "error": None}
+        results.append(result)
+        try:
+            queue.append((result, template.render(recipient["email"], body), 0))
+        except ValueError as e:
+            finish(result, str(e))
+        if len(queue) >= batch_size:
+            flush()
+    while queue:
+        flush()
+    return results
@@ -1,59 +1,23 @@
-from openai import OpenAI
-import os
+import sys
 import time
 from email.utils import parseaddr
+from llm_stream import DraftFilter, stream_chat
 from info_of_sender import choose_signature  # Import signature logic
 
-# ------------------------
-# Setup OpenAI client
-# ------------------------
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found in environment variables.")
-
-client = OpenAI(api_key=api_key)
-
 # ------------------------
 # Prevent sending emails to yourself
 # ------------------------
 MY_EMAIL = "your_email@gmail.com"  # Replace with your email
 IGNORE_LIST = [MY_EMAIL, "noreply@gmail.com"]
 
-# ------------------------
-# Clean AI-generated draft
-# ------------------------
-def clean_ai_draft(draft):
-    """
-    Removes greetings, subject lines, and AI-generated signatures from draft.
-    """
-    lines = draft.splitlines()
-    cleaned = []
-
-    for line in lines:
-        line_strip = line.strip()
-        if not line_strip:
-            continue
-        # Skip AI-generated greetings
-        if line_strip.lower().startswith("dear "):
-            continue
-        # Skip AI-generated subject lines
-        if line_strip.lower().startswith("subject:"):
-            continue
-        # Skip AI-generated signatures
-        if line_strip.lower() in ["best regards,", "regards,", "sincerely,", "thank you,"]:
-            continue
-        cleaned.append(line_strip)
-
-    return "\n".join(cleaned)
-
 # ------------------------
 # Generate AI email draft
 # ------------------------
-def generate_new_email(to_email, subject, instructions, tone="polite and professional"):
+def compose_prompt(to_email, subject, instructions, tone="polite and professional"):
     if not instructions.strip():
         instructions = "Please write a concise and professional email."
 
-    prompt = f"""
+    return f"""
     You are an AI email assistant.
     Compose an email to {to_email} with subject "{subject}".
     Instructions: {instructions}
@@ -62,19 +26,34 @@ def generate_new_email(to_email, subject, instructions, tone="polite and profess
     Do NOT include a greeting like 'Dear ...', subject line, or signature in your response.
     """
 
+def stream_new_email(to_email, subject, instructions, tone="polite and professional", out=sys.stdout):
+    """
+    Generate the AI draft; the cleaned draft is written to `out` token by token
+    as it arrives. Returns the cleaned draft. If a stream fails after text was
+    shown, a marker line separates it from the regenerated draft.
+    """
+    prompt = compose_prompt(to_email, subject, instructions, tone)
+
     for attempt in range(3):  # retry up to 3 times
+        draft_filter = DraftFilter()
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            return response.choices[0].message.content.strip()
+            for delta in stream_chat("llm.compose", [{"role": "user", "content": prompt}], temperature=0.3):
+                text = draft_filter.feed(delta)
+                if text:
+                    out.write(text)
+                    out.flush()
+            out.write(draft_filter.finish() + "\n")
+            out.flush()
+            return draft_filter.text
         except Exception as e:
-            print(f"Error generating email (attempt {attempt+1}): {e}")
+            print(f"\nError generating email (attempt {attempt+1}): {e}")
+            if draft_filter.text:
+                print("--- Draft interrupted; discard the text above ---")
             time.sleep(2)
 
-    return "Sorry, I couldn't generate the email at this time."
+    fallback = "Sorry, I couldn't generate the email at this time."
+    print(fallback)
+    return fallback
 
 # ------------------------
 # Compose email flow
@@ -100,11 +79,10 @@ def compose_email_flow(service, to_email=None, subject=None, instructions=None,
     if not tone:
         tone = input("Preferred tone (default polite and professional): ").strip() or "polite and professional"
 
-    # Generate AI draft
-    draft = generate_new_email(to_email, subject, instructions, tone)
-
-    # Clean AI draft
-    draft_cleaned = clean_ai_draft(draft)
+    # Generate the AI draft, cleaned and shown as it streams
+    print("\n--- AI-generated Draft ---")
+    draft_cleaned = stream_new_email(to_email, subject, instructions, tone)
+    print("--------------------------")
 
     # ------------------------
     # Add signature
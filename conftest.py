@@ -0,0 +1,2 @@
+# conftest.py
+# Lets the tests in tests/ import the top-level modules of this repo.
@@ -0,0 +1,135 @@
+# daily_digest.py
+"""
+Daily digest of processed mail.
+
+Every email indexed since midnight is listed in one email to yourself,
+grouped by priority with a one-line summary each. Emails that have not been
+triaged yet are triaged first, several to a request.
+
+    python daily_digest.py           # print today's digest
+    python daily_digest.py --send    # email it to the authenticated account
+"""
+
+import base64
+import threading
+import time
+from datetime import datetime
+from email.mime.text import MIMEText
+
+import metrics
+import mail_index
+
+# ------------------------
+# Config
+# ------------------------
+DIGEST_TIME = "19:30"  # daily send time, before the 8 PM store report
+PRIORITY_LABELS = {5: "🔴 Urgent", 4: "🟠 Needs a reply", 3: "🟡 Normal", 2: "🟢 Low", 1: "⚪ FYI"}
+SUMMARY_CHARS = 200    # per email in the digest
+
+
+def start_of_day(now=None):
+    now = now or datetime.now()
+    return now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def _one_line(summary):
+    text = " ".join(line.strip(" -•*") for line in (summary or "").splitlines() if line.strip())
+    return text if len(text) <= SUMMARY_CHARS else text[:SUMMARY_CHARS - 1].rstrip() + "…"
+
+
+def collect(since=None):
+    """
+    Emails indexed since `since` (default: midnight), highest priority first.
+    Untriaged ones are triaged in packed batches; summaries written by the
+    reply flow are kept and only their priority is added.
+    """
+    from summarize_emails import DEFAULT_PRIORITY, triage_emails
+
+    rows = mail_index.indexed_since(start_of_day() if since is None else since)
+    untriaged = [row for row in rows if row["priority"] is None]
+    if untriaged:
+        results = triage_emails(untriaged)
+        for row in untriaged:
+            result = results.get(row["id"], {})
+            row["priority"] = result.get("priority", DEFAULT_PRIORITY)
+            row["summary"] = row["summary"] or result.get("summary")
+            mail_index.update_analysis(row["id"], summary=row["summary"], priority=row["priority"])
+        rows.sort(key=lambda row: (-row["priority"], row["indexed_at"]))
+    return rows
+
+
+def build_digest(rows, day=None):
+    """Subject and plain-text body of the digest for `rows`."""
+    day = (day or datetime.now()).strftime("%d %b %Y")
+    subject = f"Daily email digest – {day} ({len(rows)} email(s))"
+    if not rows:
+        return subject, f"No emails were processed on {day}."
+
+    lines = [f"{len(rows)} email(s) processed on {day}."]
+    for priority in sorted(PRIORITY_LABELS, reverse=True):
+        group = [row for row in rows if row["priority"] == priority]
+        if not group:
+            continue
+        lines.append(f"\n{PRIORITY_LABELS[priority]} ({len(group)})")
+        for row in group:
+            lines.append(f"- {row['subject'] or '(No subject)'} — {row['sender']}")
+            if row["summary"]:
+                lines.append(f"  {_one_line(row['summary'])}")
+    events = [row for row in rows if row.get("event")]
+    if events:
+        lines.append("\n📅 Events")
+        lines.extend(f"- {row['event'].get('title')} at {row['event'].get('start_time')} ({row['subject']})"
+                     for row in events)
+    return subject, "\n".join(lines)
+
+
+def send_daily_digest(service, sender, since=None):
+    """Triage what is left, then email today's digest to `sender`."""
+    try:
+        with metrics.timed("digest.build"):
+            rows = collect(since)
+        subject, body = build_digest(rows)
+        message = MIMEText(body)
+        message["to"] = sender
+        message["from"] = sender
+        message["subject"] = subject
+        raw_message = {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}
+        with metrics.timed("gmail.send"):
+            service.users().messages().send(userId="me", body=raw_message).execute()
+        print(f"✅ Daily digest of {len(rows)} email(s) sent to {sender}.")
+    except Exception as e:
+        print("❌ Error sending daily digest:", e)
+
+
+def schedule_daily_digest(service, sender):
+    import schedule
+
+    # Its own scheduler and thread, so the report scheduler never runs this job twice
+    scheduler = schedule.Scheduler()
+    scheduler.every().day.at(DIGEST_TIME).do(send_daily_digest, service, sender)
+
+    def run_scheduler():
+        while True:
+            scheduler.run_pending()
+            time.sleep(30)
+
+    thread = threading.Thread(target=run_scheduler, daemon=True)
+    thread.start()
+    print(f"🕒 Daily digest scheduler started (auto send at {DIGEST_TIME}).")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Digest of today's processed mail.")
+    parser.add_argument("--send", action="store_true", help="Email the digest instead of printing it")
+    args = parser.parse_args()
+
+    if args.send:
+        from main import authenticate_gmail
+
+        gmail_service, address = authenticate_gmail()
+        send_daily_digest(gmail_service, address)
+    else:
+        digest_subject, digest_body = build_digest(collect())
+        print(f"{digest_subject}\n\n{digest_body}")
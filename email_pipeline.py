@@ -0,0 +1,131 @@
+# email_pipeline.py
+"""
+Concurrent processing engine for option 1.
+
+The network-bound stages of every fetched email (reply/summary LLM call,
+calendar extraction and freebusy) run in a thread pool as soon as the email
+arrives from the inbox stream. Results are then presented to the user in the
+original order, so the interactive review only waits on emails that are not
+finished yet and a batch takes roughly as long as its slowest email instead
+of the sum. Replies stream into a LiveDraft, so an email reached before its
+reply is complete is shown token by token from where generation has got to.
+"""
+
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import mail_index
+import calender_integration
+from reply_handler import analyze_email_live, handle_email, is_ignored_sender
+
+# ------------------------
+# Config
+# ------------------------
+MAX_WORKERS = 40  # two jobs per email, so up to 20 emails are analyzed at once
+
+_local = threading.local()
+
+
+def _calendar_service():
+    """One Calendar service per thread; googleapiclient services are not thread-safe."""
+    if getattr(_local, "calendar_service", None) is None:
+        _local.calendar_service = calender_integration.get_calendar_service()
+    return _local.calendar_service
+
+
+def _detect_event(body):
+    with metrics.timed("pipeline.calendar"):
+        return calender_integration.detect_calendar_event(body, _calendar_service())
+
+
+def _analyze(live):
+    with metrics.timed("pipeline.reply"):
+        return live.run()
+
+
+def _index_results(email_data, analysis, detection):
+    """Store the summary and detected event in the local mail index."""
+    try:
+        mail_index.update_analysis(email_data["id"], summary=analysis[0] if analysis else None,
+                                   event=detection[0] if detection else None)
+    except Exception as e:
+        print(f"⚠️ Failed to index analysis for {email_data['id']}: {e}")
+
+
+# ------------------------
+# Processing engine
+# ------------------------
+def process_emails(service, emails, max_workers=MAX_WORKERS, on_replied=None, on_outcome=None,
+                   handler=handle_email):
+    """
+    Analyze `emails` (a list or a stream) concurrently, then review them one by one in order.
+    At most max_workers // 2 emails are in flight, so a long stream is processed in
+    constant memory. `on_replied(email_id)` and `on_outcome(email_id, outcome)` are called
+    with the handler's outcome ("processed", "skipped", ...); a handler that returns None
+    (nothing generated or sent) triggers neither, so the email is retried next time.
+    `handler(service, email_data, live_draft)` defaults to the interactive handle_email.
+    Returns the number of emails processed.
+    """
+    emails = iter(emails)
+    first = next(emails, None)
+    if first is None:
+        return 0
+
+    # Authenticate once up front so a missing token never opens several OAuth flows at once
+    try:
+        _calendar_service()
+    except Exception as e:
+        print(f"⚠️ Calendar integration error: {e}")
+
+    booked = []
+    window = max(1, max_workers // 2)
+    processed = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="email") as pool:
+        def submit(email_data):
+            live = None if is_ignored_sender(email_data["sender"]) else analyze_email_live(email_data)
+            if live:
+                pool.submit(_analyze, live)
+            calendar_job = pool.submit(_detect_event, email_data["body"])
+            jobs.append((email_data, live, calendar_job))
+
+        jobs = deque()
+        submit(first)
+        for email_data in itertools.islice(emails, window - 1):
+            submit(email_data)
+
+        while jobs:
+            email_data, live, calendar_job = jobs.popleft()
+            print(f"\n📧 Processing email from {email_data['sender']} with subject: {email_data['subject']}")
+            analysis = detection = None
+            try:
+                outcome = handler(service, email_data, live)
+                analysis = live.result() if live else None
+                # No outcome means generation or sending failed: the email stays unread for the next poll
+                if outcome and on_replied:
+                    on_replied(email_data["id"])
+                if outcome and on_outcome:
+                    on_outcome(email_data["id"], outcome)
+            except Exception as e:
+                print(f"❌ Error handling email {email_data['id']}: {e}")
+            try:
+                detection = calendar_job.result()
+                calender_integration.process_email_for_calendar(
+                    email_data["body"],
+                    email_sender=email_data["sender"],
+                    email_subject=email_data["subject"],
+                    detection=detection,
+                    booked=booked,
+                )
+            except Exception as e:
+                print(f"⚠️ Calendar integration error: {e}")
+            _index_results(email_data, analysis, detection)
+            processed += 1
+
+            # Keep the window full: start the next email as soon as one is presented
+            next_email = next(emails, None)
+            if next_email is not None:
+                submit(next_email)
+    return processed
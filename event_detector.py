@@ -0,0 +1,119 @@
+# event_detector.py
+"""
+Cheap local pre-filter for calendar extraction.
+
+Decides from precompiled date/time/meeting-keyword patterns whether an email
+could contain an event, so extract_event_from_email only spends an LLM call
+on candidates. It runs on the compacted body, without quoted reply history,
+whose "On <date> at <time>, X wrote:" header would match every reply. Run it
+directly to measure skip rate and recall:
+
+    python event_detector.py                 # synthetic labeled mailbox
+    python event_detector.py labeled.jsonl   # lines of {"text": ..., "has_event": true/false}
+"""
+
+import json
+import re
+
+# ------------------------
+# Precompiled patterns
+# ------------------------
+MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+WEEKDAYS = r"(?:mon(?:day)?|tue(?:s(?:day)?)?|wed(?:nesday)?|thu(?:rs(?:day)?)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)"
+
+DATE_RE = re.compile(
+    r"\b(?:"
+    + WEEKDAYS + r"|today|tomorrow|tonight|next week|this week|end of (?:the )?(?:day|week|month)"
+    + r"|\d{1,2}(?:st|nd|rd|th)?\s+" + MONTHS
+    + r"|" + MONTHS + r"\.?\s+\d{1,2}(?:st|nd|rd|th)?"
+    + r"|\d{4}-\d{2}-\d{2}"
+    + r"|\d{1,2}[/.]\d{1,2}(?:[/.]\d{2,4})?"
+    + r")\b",
+    re.I,
+)
+TIME_RE = re.compile(
+    r"\b(?:\d{1,2}(?::[0-5]\d)?\s*(?:am|pm|a\.m\.|p\.m\.)|(?:[01]?\d|2[0-3]):[0-5]\d|noon|midnight)(?!\w)",
+    re.I,
+)
+KEYWORD_RE = re.compile(
+    r"\b(?:meeting|meet|call|appointment|interview|webinar|conference|schedul\w*|invit\w*|calendar"
+    r"|zoom|google meet|teams|sync|stand-?up|demo|workshop|session|deadline|due|reservation"
+    r"|booked|booking|event|rsvp|catch up|see you|visit)\b",
+    re.I,
+)
+
+
+def could_contain_event(text: str) -> bool:
+    """
+    True if `text` mentions a date together with a time or a meeting keyword,
+    or a time together with a meeting keyword.
+    """
+    if not text:
+        return False
+    has_date = DATE_RE.search(text) is not None
+    has_time = TIME_RE.search(text) is not None
+    if has_date and has_time:
+        return True
+    if not (has_date or has_time):
+        return False
+    return KEYWORD_RE.search(text) is not None
+
+
+# ------------------------
+# Evaluation
+# ------------------------
+def evaluate(samples):
+    """
+    `samples` is an iterable of (raw body, has_event). Each body is compacted as
+    extract_event_from_email does before the check. Returns skip rate, recall
+    and precision.
+    """
+    from prompt_budget import MAX_EVENT_TOKENS, compact_email_body
+
+    total = candidates = true_pos = false_neg = 0
+    for text, has_event in samples:
+        total += 1
+        predicted = could_contain_event(compact_email_body(text, MAX_EVENT_TOKENS, keep_forwarded=True))
+        candidates += predicted
+        if has_event and predicted:
+            true_pos += 1
+        elif has_event:
+            false_neg += 1
+    positives = true_pos + false_neg
+    return {
+        "emails": total,
+        "llm_calls": candidates,
+        "skip_rate": round(1 - candidates / total, 4) if total else 0.0,
+        "recall": round(true_pos / positives, 4) if positives else 1.0,
+        "precision": round(true_pos / candidates, 4) if candidates else 1.0,
+    }
+
+
+def _synthetic_samples(size=1000):
+    from fake_services import build_mailbox
+    from inbox_stream import get_message_body
+
+    for message in build_mailbox(size):
+        yield get_message_body(message["payload"]) or "(No content)", message["has_event"]
+
+
+def _jsonl_samples(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                yield row["text"], bool(row["has_event"])
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    samples = _jsonl_samples(source) if source else _synthetic_samples()
+    result = evaluate(samples)
+    print(f"📅 Event pre-filter on {source or 'synthetic mailbox'}")
+    print(f"Emails       : {result['emails']}")
+    print(f"LLM calls    : {result['llm_calls']}")
+    print(f"Skip rate    : {result['skip_rate']:.1%}")
+    print(f"Recall       : {result['recall']:.1%}")
+    print(f"Precision    : {result['precision']:.1%}")
@@ -0,0 +1,790 @@
+# fake_services.py
+"""
+Local stand-ins for the Gmail, Google Calendar and OpenAI HTTP APIs.
+
+Used by benchmark.py to exercise the agent offline: a single threaded HTTP
+server answers the REST routes the agent calls, serves a synthetic mailbox
+and counts every request so API calls per email can be reported.
+"""
+
+import base64
+import email.parser
+import email.policy
+import io
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import zipfile
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ------------------------
+# Synthetic mailbox
+# ------------------------
+SENDERS = [
+    ("Priya Sharma", "priya.sharma@retaileye.in"),
+    ("Store Ops", "ops@retaileye.in"),
+    ("GitHub", "notifications@github.com"),
+    ("Amazon Offers", "deals@offers.amazon.in"),
+    ("Rahul Verma", "rahul.verma@gmail.com"),
+    ("HR Team", "hr@retaileye.in"),
+    ("Newsletter", "news@marketing-weekly.com"),
+    ("Ankit Jain", "ankit@supplierhub.co"),
+]
+# A few senders carry most of the traffic, as in a real inbox
+SENDER_WEIGHTS = [6, 10, 25, 12, 4, 3, 15, 5]
+
+MEETING_TEMPLATES = [
+    "Hi,\n\nCan we schedule a meeting on {day} at {time} to review the {topic}? "
+    "It should take about an hour.\n\nThanks,\n{name}",
+    "Hello team,\n\nReminder: the {topic} call is on {date} from {time} to {end}. "
+    "Please join on Google Meet.\n\nRegards,\n{name}",
+    "Hi,\n\nI have booked an appointment with the vendor for {day}, {date} at {time} "
+    "regarding the {topic}.\n\nBest,\n{name}",
+]
+PLAIN_TEMPLATES = [
+    "Hi,\n\nPlease find the updated {topic} figures in the shared drive. "
+    "Let me know if anything looks off.\n\nThanks,\n{name}",
+    "Hello,\n\nThe {topic} has been approved. No further action is needed from your side.\n\n{name}",
+    "Hey,\n\nQuick question about the {topic}: are we still using the old supplier list?\n\n{name}",
+]
+NOTIFICATION_TEMPLATES = [
+    "[retaileye/agent] New comment on pull request #{num}: looks good to me, merging after CI.",
+    "Your order #{num} has been shipped and will arrive soon.",
+    "Build #{num} passed on main.",
+]
+TOPICS = ["Q3 sales report", "inventory audit", "store layout", "supplier contract",
+          "festive campaign", "billing software rollout", "staff roster"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+TIMES = [("10:00 AM", "11:00 AM"), ("2:30 PM", "3:30 PM"), ("4 pm", "5 pm"), ("11:15", "12:00")]
+
+SIGNATURE = "\n\n--\n{name}\nRetailEye | Bengaluru\nSent from my iPhone"
+QUOTED_HISTORY = (
+    "\n\nOn {date}, {name} <{email}> wrote:\n"
+    + "\n".join("> " + line for line in [
+        "Following up on the earlier thread about the {topic}.",
+        "We discussed the numbers last week and agreed to revisit them.",
+        "Attaching the previous summary below for reference.",
+        "",
+        "> On an earlier date, someone else wrote:",
+        "> > Original message with all the historical context of this thread.",
+    ] * 6)
+)
+MARKETING_HTML = (
+    "<html><head><style>.btn{{color:#fff;background:#e60}} td{{padding:4px}}</style>"
+    "<script>window.dataLayer=window.dataLayer||[];</script></head><body>"
+    "<table width='100%'><tr><td><img src='https://track.example.com/open?id={num}' width='1' height='1'>"
+    "<h1>Big {topic} sale!</h1>"
+    + "<p>Save up to {num}% on everything this week only. Shop now and enjoy free delivery.</p>" * 8
+    + "<a class='btn' href='https://track.example.com/click?id={num}'>Shop now</a>"
+    "</td></tr></table><p style='font-size:10px'>Unsubscribe | Privacy</p></body></html>"
+)
+
+
+def _b64url(text) -> str:
+    data = text.encode("utf-8") if isinstance(text, str) else text
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def marketing_newsletter(topic, num, sections=40):
+    """A large HTML-only newsletter in the style of bulk marketing mail (~100 KB at 40 sections)."""
+    preheader = ("<div style='display:none;max-height:0;overflow:hidden'>"
+                 f"Don't miss our {topic} deals" + "&zwnj;&nbsp;" * 80 + "</div>")
+    section = (
+        "<table role='presentation' width='100%' cellpadding='0' cellspacing='0' border='0' "
+        "style='background:#ffffff;border-collapse:collapse;mso-table-lspace:0pt;mso-table-rspace:0pt'>"
+        "<tr><td style='padding:24px 32px;font-family:Helvetica,Arial,sans-serif;font-size:16px;"
+        "line-height:24px;color:#333333'>"
+        "<a href='https://track.example.com/click?id={num}&amp;s={i}&amp;utm_source=newsletter"
+        "&amp;utm_medium=email&amp;utm_campaign=weekly'><img src='https://cdn.example.com/img/{i}.png' "
+        "width='536' alt='' style='display:block;border:0;outline:none;text-decoration:none'></a>"
+        "<h2 style='margin:16px 0 8px;font-size:22px;color:#e60'>{title} — offer {i}</h2>"
+        "<p style='margin:0 0 12px'>Get up to {pct}% off on {topic} essentials. Limited stock, "
+        "order before midnight for free delivery.</p>"
+        "<a class='btn' style='background:#e60;color:#fff;padding:12px 24px;border-radius:4px' "
+        "href='https://track.example.com/click?id={num}&amp;cta={i}'>Shop now</a>"
+        "</td></tr></table>"
+    )
+    body = "".join(section.format(num=num, i=i, title=topic.title(), topic=topic, pct=10 + i % 60)
+                   for i in range(sections))
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Newsletter</title>"
+        "<style>" + ".btn{color:#fff;background:#e60} td{padding:4px} " * 40 + "</style>"
+        "<script>window.dataLayer=window.dataLayer||[];</script></head><body style='margin:0'>"
+        + preheader + body
+        + f"<img src='https://track.example.com/open?id={num}' width='1' height='1' style='display:none'>"
+        "<p style='font-size:10px;color:#999'>You received this email because you subscribed. "
+        "<a href='https://track.example.com/unsub'>Unsubscribe</a> | Privacy</p></body></html>"
+    )
+
+
+# ------------------------
+# Sample attachments
+# ------------------------
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def sample_pdf(lines, pages=1) -> bytes:
+    """A minimal PDF with `lines` of text on each of `pages` pages."""
+    text_ops = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(
+        "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '"
+        for line in lines
+    ) + " ET"
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    font_id = 3 + 2 * pages
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>"]
+    for i in range(pages):
+        objects += [
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>",
+            f"<< /Length {len(text_ops)} >>\nstream\n{text_ops}\nendstream",
+        ]
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return out
+
+
+def sample_docx(paragraphs) -> bytes:
+    """A minimal Word document with one paragraph per item of `paragraphs`."""
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs)
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f"<w:body>{body}</w:body></w:document>")
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml",
+                         '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/'
+                         'package/2006/content-types"><Default Extension="xml" ContentType="application/xml"/>'
+                         f'<Override PartName="/word/document.xml" ContentType="{DOCX_MIME}.main+xml"/></Types>')
+        archive.writestr("word/document.xml", document)
+    return out.getvalue()
+
+
+def sample_invite(topic, start, end) -> bytes:
+    return ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nMETHOD:REQUEST\r\nBEGIN:VEVENT\r\n"
+            f"SUMMARY:{topic.title()} review\r\nDTSTART:{start:%Y%m%dT%H%M%S}\r\n"
+            f"DTEND:{end:%Y%m%dT%H%M%S}\r\nLOCATION:Google Meet\r\n"
+            "END:VEVENT\r\nEND:VCALENDAR\r\n").encode("utf-8")
+
+
+def _attachment(index, kind, topic, num, when):
+    """(filename, mime type, bytes) attached to some plain and meeting emails, or None."""
+    if kind == "plain" and index % 4 == 0:
+        lines = [f"Invoice {num} for the {topic}", f"Amount due: Rs {num * 12}",
+                 f"Due date: {when:%d %B %Y}"] + [f"Line item {i}: {topic} services" for i in range(20)]
+        return f"invoice_{num}.pdf", "application/pdf", sample_pdf(lines, pages=3)
+    if kind == "plain" and index % 4 == 2:
+        paragraphs = [f"Agenda: {topic}", "1. Review last week's numbers", "2. Open issues",
+                      f"Proposed date: {when:%A %d %B %Y} at 3 PM"]
+        return f"agenda_{num}.docx", DOCX_MIME, sample_docx(paragraphs)
+    if kind == "meeting" and index % 3 == 0:
+        return "invite.ics", "text/calendar", sample_invite(topic, when, when + timedelta(hours=1))
+    return None
+
+
+def _headers(sender, subject, date, extra=None):
+    headers = [
+        {"name": "From", "value": f"{sender[0]} <{sender[1]}>"},
+        {"name": "To", "value": "me@example.com"},
+        {"name": "Subject", "value": subject},
+        {"name": "Date", "value": date.strftime("%a, %d %b %Y %H:%M:%S +0530")},
+    ]
+    for name, value in (extra or {}).items():
+        headers.append({"name": name, "value": value})
+    return headers
+
+
+def make_message(index: int, rng: random.Random, now: datetime) -> dict:
+    """Build one Gmail API message resource; `has_event` is kept as a label for evaluation."""
+    sender = rng.choices(SENDERS, weights=SENDER_WEIGHTS)[0]
+    name = sender[0].split()[0]
+    topic = rng.choice(TOPICS)
+    num = rng.randint(10, 9999)
+    date = now - timedelta(minutes=index * 7)
+    kind = rng.choices(["meeting", "plain", "thread", "notification", "marketing"],
+                       weights=[15, 20, 10, 30, 25])[0]
+    extra = {}
+    has_event = False
+
+    if kind == "meeting":
+        start, end = rng.choice(TIMES)
+        when = now + timedelta(days=rng.randint(1, 14))
+        text = rng.choice(MEETING_TEMPLATES).format(
+            day=rng.choice(DAYS), date=when.strftime("%d %B %Y"), time=start, end=end,
+            topic=topic, name=name)
+        subject = f"Meeting: {topic}"
+        has_event = True
+    elif kind == "thread":
+        text = rng.choice(PLAIN_TEMPLATES).format(topic=topic, name=name)
+        text += SIGNATURE.format(name=name)
+        text += QUOTED_HISTORY.format(date=date.strftime("%a, %d %b %Y at %H:%M"), name=name,
+                                      email=sender[1], topic=topic)
+        subject = f"Re: {topic}"
+    elif kind == "notification":
+        text = rng.choice(NOTIFICATION_TEMPLATES).format(num=num)
+        subject = text.split(":")[0][:60]
+        extra = {"Precedence": "bulk"}
+    elif kind == "marketing":
+        text = None
+        subject = f"{topic.title()} offers inside"
+        extra = {"List-Unsubscribe": f"<mailto:unsubscribe@{sender[1].split('@')[1]}>",
+                 "Precedence": "bulk"}
+    else:
+        text = rng.choice(PLAIN_TEMPLATES).format(topic=topic, name=name)
+        subject = topic.capitalize()
+
+    headers = _headers(sender, subject, date, extra)
+    if text is None:
+        html = MARKETING_HTML.format(topic=topic, num=num)
+        payload = {"mimeType": "text/html", "headers": headers,
+                   "body": {"size": len(html), "data": _b64url(html)}}
+        snippet = f"Big {topic} sale!"
+    elif rng.random() < 0.5:
+        html = "<html><body>" + "".join(f"<p>{line}</p>" for line in text.splitlines()) + "</body></html>"
+        payload = {
+            "mimeType": "multipart/alternative", "headers": headers, "body": {"size": 0},
+            "parts": [
+                {"partId": "0", "mimeType": "text/plain", "headers": [],
+                 "body": {"size": len(text), "data": _b64url(text)}},
+                {"partId": "1", "mimeType": "text/html", "headers": [],
+                 "body": {"size": len(html), "data": _b64url(html)}},
+            ],
+        }
+        snippet = text[:100]
+    else:
+        payload = {"mimeType": "text/plain", "headers": headers,
+                   "body": {"size": len(text), "data": _b64url(text)}}
+        snippet = text[:100]
+
+    msg_id = f"{index:016x}"
+    attachment_data = {}
+    attachment = _attachment(index, kind, topic, num, now + timedelta(days=index % 10 + 1, hours=6))
+    if attachment:
+        filename, mime_type, data = attachment
+        attachment_id = f"ANGjdJ{index:08x}"
+        attachment_data[attachment_id] = _b64url(data)
+        inner = dict(payload, partId="0", headers=[])
+        payload = {
+            "mimeType": "multipart/mixed", "headers": headers, "body": {"size": 0},
+            "parts": [inner, {"partId": "1", "mimeType": mime_type, "filename": filename, "headers": [],
+                              "body": {"attachmentId": attachment_id, "size": len(data)}}],
+        }
+    return {
+        "id": msg_id,
+        "threadId": msg_id,
+        "labelIds": ["INBOX", "UNREAD"],
+        "snippet": snippet.replace("\n", " "),
+        "payload": payload,
+        "sizeEstimate": len(json.dumps(payload)),
+        "internalDate": str(int(date.timestamp() * 1000)),
+        "has_event": has_event,
+        "kind": kind,
+        "attachment_data": attachment_data,
+    }
+
+
+def build_mailbox(size: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    now = datetime(2026, 10, 19, 9, 0, 0)
+    return [make_message(i + 1, rng, now) for i in range(size)]
+
+
+# ------------------------
+# Fake LLM responses
+# ------------------------
+FIRST_TOKEN_SHARE = 0.2  # streamed responses: share of llm_latency before the first token
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def fake_completion_text(messages: list) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    prompt = " ".join(m.get("content", "") for m in messages if m.get("role") == "user")
+
+    if "Extract events" in system:
+        if re.search(r"\b(meeting|call|appointment)\b", prompt, re.I) and re.search(r"\d", prompt):
+            day = 20 + (len(prompt) % 8)
+            return json.dumps({
+                "title": "Meeting",
+                "start_time": f"2026-10-{day}T10:00:00+05:30",
+                "end_time": f"2026-10-{day}T11:00:00+05:30",
+            })
+        return "null"
+    if "You triage emails" in system:
+        emails = re.findall(r'<email id="([^"]+)">\nFrom: [^\n]*\nSubject: ([^\n]*)', prompt)
+        return json.dumps({"emails": [
+            {"id": msg_id, "summary": f"The sender writes about {subject.lower() or 'an update'}.",
+             "priority": 1 if re.search(r"newsletter|offer|sale|digest", subject, re.I) else 2 + len(subject) % 3}
+            for msg_id, subject in emails
+        ]})
+    if "Summary:" in prompt and "Reply:" in prompt:
+        return ("Summary:\nThe sender shares an update and asks for a quick confirmation.\n\n"
+                "Reply:\nThank you for the update. I have gone through it and will get back "
+                "to you with confirmation by end of day.\nBest regards,")
+    if "3 bullet points" in system:
+        return "- Update shared\n- Action requested\n- Follow-up expected"
+    return ("Hello,\n\nThank you for your continued support. Please find below the key points "
+            "for this week and let us know if you have any questions.\n\nBest regards")
+
+
+def _form_fields(content_type, raw):
+    """Parse a multipart/form-data body into {name: str}; file fields stay bytes, with `<name>.filename`."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw)
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        data = part.get_payload(decode=True) or b""
+        filename = part.get_filename()
+        if filename:
+            fields[name], fields[f"{name}.filename"] = data, filename
+        else:
+            fields[name] = data.decode("utf-8")
+    return fields
+
+
+# ------------------------
+# HTTP server
+# ------------------------
+class FakeServices:
+    """
+    One local HTTP server answering Gmail, Calendar and OpenAI routes.
+
+    `llm_latency` and `api_latency` are per-request delays in seconds,
+    used to model network and model time without touching real services.
+    Batch API jobs complete `batch_latency` seconds after they are created.
+    """
+
+    def __init__(self, mailbox_size=200, llm_latency=0.0, api_latency=0.0, seed=7,
+                 host="127.0.0.1", port=0, batch_latency=0.0):
+        self.lock = threading.Lock()
+        self.mailbox_size = mailbox_size
+        self.seed = seed
+        self.reset_mailbox()
+        self.llm_latency = llm_latency
+        self.api_latency = api_latency
+        self.batch_latency = batch_latency
+        self.counters = Counter()
+        self.sent = []
+        self.drafts = []
+        self.events = []
+        self.files = {}
+        self.batches = {}
+        self.labels = [{"id": name, "name": name, "type": "system"}
+                       for name in ("INBOX", "UNREAD", "SENT", "SPAM", "TRASH")]
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_mailbox(self):
+        """Restore every message to unread with its original labels."""
+        mailbox = build_mailbox(self.mailbox_size, self.seed)
+        with self.lock:
+            self.mailbox = mailbox
+            self.messages = {m["id"]: m for m in mailbox}
+
+    def reset_counters(self):
+        with self.lock:
+            self.counters.clear()
+
+    def snapshot_counters(self) -> dict:
+        with self.lock:
+            return dict(self.counters)
+
+    def count(self, route: str):
+        with self.lock:
+            self.counters[route] += 1
+
+    # ------------------------
+    # Route handlers
+    # ------------------------
+    def gmail_profile(self, query, body):
+        return 200, {"emailAddress": "me@example.com", "messagesTotal": len(self.mailbox)}
+
+    def gmail_list(self, query, body):
+        q = query.get("q", [""])[0]
+        label_ids = query.get("labelIds", [])
+        max_results = min(int(query.get("maxResults", ["100"])[0]), 500)
+        offset = int(query.get("pageToken", ["0"])[0] or 0)
+        with self.lock:
+            matches = [m for m in self.mailbox
+                       if all(label in m["labelIds"] for label in label_ids)
+                       and ("is:unread" not in q or "UNREAD" in m["labelIds"])]
+        page = matches[offset:offset + max_results]
+        result = {
+            "messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page],
+            "resultSizeEstimate": len(matches),
+        }
+        if offset + max_results < len(matches):
+            result["nextPageToken"] = str(offset + max_results)
+        if not page:
+            result.pop("messages")
+        return 200, result
+
+    def gmail_get(self, query, body, msg_id):
+        message = self.messages.get(msg_id)
+        if not message:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        return 200, {k: v for k, v in message.items() if k not in ("has_event", "kind", "attachment_data")}
+
+    def gmail_attachment(self, query, body, msg_id, attachment_id):
+        data = self.messages.get(msg_id, {}).get("attachment_data", {}).get(attachment_id)
+        if data is None:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        return 200, {"attachmentId": attachment_id, "size": len(data) * 3 // 4, "data": data}
+
+    def gmail_draft_create(self, query, body):
+        message = body.get("message", {})
+        with self.lock:
+            self.drafts.append(message)
+            draft_id = f"r{len(self.drafts):012d}"
+        return 200, {"id": draft_id, "message": {"id": f"draft{draft_id}",
+                                                 "threadId": message.get("threadId", draft_id)}}
+
+    def gmail_labels_list(self, query, body):
+        with self.lock:
+            return 200, {"labels": list(self.labels)}
+
+    def gmail_labels_create(self, query, body):
+        with self.lock:
+            if any(label["name"] == body.get("name") for label in self.labels):
+                return 409, {"error": {"code": 409, "message": "Label name exists or conflicts"}}
+            label = {"id": f"Label_{len(self.labels) + 1}", "name": body["name"], "type": "user"}
+            self.labels.append(label)
+        return 200, label
+
+    def gmail_batch_modify(self, query, body):
+        ids = body.get("ids", [])
+        if len(ids) > 1000:
+            return 400, {"error": {"code": 400, "message": "Too many ids; at most 1000 allowed"}}
+        add, remove = body.get("addLabelIds", []), set(body.get("removeLabelIds", []))
+        with self.lock:
+            for msg_id in ids:
+                message = self.messages.get(msg_id)
+                if message:
+                    labels = [label for label in message["labelIds"] if label not in remove]
+                    message["labelIds"] = labels + [label for label in add if label not in labels]
+        return 204, None
+
+    def gmail_send(self, query, body):
+        with self.lock:
+            self.sent.append(body.get("raw", ""))
+            msg_id = f"sent{len(self.sent):012x}"
+        return 200, {"id": msg_id, "threadId": msg_id, "labelIds": ["SENT"]}
+
+    def gmail_batch(self, query, body):
+        """A Gmail batch HTTP request: every application/http part is routed on its own."""
+        content_type, raw = body
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw)
+        boundary = "batch_fake_boundary"
+        out = []
+        for part in message.iter_parts():
+            request = part.get_payload(decode=True) or b""
+            head, payload = (re.split(rb"\r?\n\r?\n", request, maxsplit=1) + [b""])[:2]
+            method, path = head.splitlines()[0].decode("latin-1").split()[:2]
+            try:
+                inner_body = json.loads(payload) if payload.strip() else {}
+            except ValueError:
+                inner_body = {}
+            status, result = self.dispatch(method, urlparse(path), inner_body)
+            data = json.dumps(result) if result is not None else ""
+            content_id = (part.get("Content-ID") or "").strip("<>")
+            out.append(f"--{boundary}\r\nContent-Type: application/http\r\n"
+                       f"Content-ID: <response-{content_id}>\r\n\r\n"
+                       f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                       f"Content-Type: application/json; charset=UTF-8\r\n"
+                       f"Content-Length: {len(data.encode('utf-8'))}\r\n\r\n{data}\r\n")
+        out.append(f"--{boundary}--\r\n")
+        return 200, ("".join(out).encode("utf-8"), f"multipart/mixed; boundary={boundary}")
+
+    def calendar_freebusy(self, query, body):
+        start, end = body.get("timeMin"), body.get("timeMax")
+        with self.lock:
+            busy = [{"start": e["start"], "end": e["end"]} for e in self.events
+                    if e["start"] < end and e["end"] > start]
+        return 200, {"kind": "calendar#freeBusy", "timeMin": start, "timeMax": end,
+                     "calendars": {"primary": {"busy": busy}}}
+
+    def calendar_insert(self, query, body, calendar_id):
+        with self.lock:
+            event_id = f"evt{len(self.events) + 1}"
+            self.events.append({"id": event_id, "start": body["start"]["dateTime"],
+                                "end": body["end"]["dateTime"]})
+        return 200, {"id": event_id, "summary": body.get("summary"), "status": "confirmed",
+                     "htmlLink": f"{self.url}/calendar/event?eid={event_id}"}
+
+    def openai_chat(self, query, body):
+        messages = body.get("messages", [])
+        content = fake_completion_text(messages)
+        prompt_tokens = sum(_approx_tokens(m.get("content", "")) for m in messages)
+        if body.get("stream"):
+            return 200, self._chat_stream(body, content, prompt_tokens)
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        return 200, self._chat_body(body)
+
+    def _chat_body(self, body):
+        messages = body.get("messages", [])
+        content = fake_completion_text(messages)
+        prompt_tokens = sum(_approx_tokens(m.get("content", "")) for m in messages)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens,
+                      "completion_tokens": _approx_tokens(content),
+                      "total_tokens": prompt_tokens + _approx_tokens(content)},
+        }
+
+    def _chat_stream(self, body, content, prompt_tokens):
+        """
+        Server-sent chat.completion.chunk events. The first token arrives after
+        FIRST_TOKEN_SHARE of llm_latency; the rest is spread over the tokens.
+        """
+        tokens = re.findall(r"\s*\S+|\s+", content) or [""]
+        first_delay = self.llm_latency * FIRST_TOKEN_SHARE
+        token_delay = self.llm_latency * (1 - FIRST_TOKEN_SHARE) / len(tokens)
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini")}
+        time.sleep(first_delay)
+        for i, token in enumerate(tokens):
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            yield dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+            time.sleep(token_delay)
+        yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            completion_tokens = _approx_tokens(content)
+            yield dict(base, choices=[], usage={"prompt_tokens": prompt_tokens,
+                                                "completion_tokens": completion_tokens,
+                                                "total_tokens": prompt_tokens + completion_tokens})
+
+    def _add_file(self, data, filename, purpose):
+        with self.lock:
+            file_id = f"file-{len(self.files) + 1}"
+            self.files[file_id] = {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                                   "filename": filename, "purpose": purpose, "status": "processed", "data": data}
+        return {k: v for k, v in self.files[file_id].items() if k != "data"}
+
+    def openai_file_upload(self, query, body):
+        return 200, self._add_file(body.get("file", b""), body.get("file.filename", "upload.jsonl"),
+                                   body.get("purpose", "batch"))
+
+    def openai_file_content(self, query, body, file_id):
+        with self.lock:
+            stored = self.files.get(file_id)
+        if not stored:
+            return 404, {"error": {"message": f"No such File object: {file_id}", "type": "invalid_request_error"}}
+        return 200, stored["data"]
+
+    def openai_batch_create(self, query, body):
+        with self.lock:
+            stored = self.files.get(body.get("input_file_id"))
+        if not stored:
+            return 400, {"error": {"message": "input_file_id not found", "type": "invalid_request_error"}}
+        total = sum(1 for line in stored["data"].splitlines() if line.strip())
+        with self.lock:
+            batch_id = f"batch_{len(self.batches) + 1}"
+            self.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+                "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window"),
+                "status": "validating", "output_file_id": None, "error_file_id": None,
+                "created_at": int(time.time()), "metadata": body.get("metadata"),
+                "request_counts": {"total": total, "completed": 0, "failed": 0},
+                "_started": time.monotonic(),
+            }
+        return 200, self._batch_view(batch_id)
+
+    def openai_batch_retrieve(self, query, body, batch_id):
+        with self.lock:
+            batch = self.batches.get(batch_id)
+        if not batch:
+            return 404, {"error": {"message": f"No such batch: {batch_id}", "type": "invalid_request_error"}}
+        if batch["status"] in ("validating", "in_progress"):
+            if time.monotonic() - batch["_started"] >= self.batch_latency:
+                self._complete_batch(batch)
+            else:
+                batch["status"] = "in_progress"
+        return 200, self._batch_view(batch_id)
+
+    def _batch_view(self, batch_id):
+        with self.lock:
+            return {k: v for k, v in self.batches[batch_id].items() if not k.startswith("_")}
+
+    def _complete_batch(self, batch):
+        """Answer every request line of the input file like /v1/chat/completions would."""
+        with self.lock:
+            data = self.files[batch["input_file_id"]]["data"]
+        out = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            out.append(json.dumps({
+                "id": f"batch_req_{len(out) + 1}", "custom_id": request["custom_id"], "error": None,
+                "response": {"status_code": 200, "request_id": f"req_{len(out) + 1}",
+                             "body": self._chat_body(request.get("body", {}))},
+            }))
+        output = self._add_file("".join(row + "\n" for row in out).encode("utf-8"),
+                                "batch_output.jsonl", "batch_output")
+        with self.lock:
+            batch.update(status="completed", output_file_id=output["id"], completed_at=int(time.time()))
+            batch["request_counts"]["completed"] = len(out)
+
+    def routes(self):
+        return [
+            ("GET", r"/gmail/v1/users/[^/]+/profile", "gmail.profile", self.gmail_profile),
+            ("GET", r"/gmail/v1/users/[^/]+/messages", "gmail.list", self.gmail_list),
+            ("GET", r"/gmail/v1/users/[^/]+/messages/([^/]+)", "gmail.get", self.gmail_get),
+            ("GET", r"/gmail/v1/users/[^/]+/messages/([^/]+)/attachments/([^/]+)", "gmail.attachment",
+             self.gmail_attachment),
+            ("POST", r"/gmail/v1/users/[^/]+/messages/send", "gmail.send", self.gmail_send),
+            ("POST", r"/batch(?:/gmail/v1)?", "gmail.batch", self.gmail_batch),
+            ("POST", r"/gmail/v1/users/[^/]+/messages/batchModify", "gmail.batch_modify", self.gmail_batch_modify),
+            ("POST", r"/gmail/v1/users/[^/]+/drafts", "gmail.draft", self.gmail_draft_create),
+            ("GET", r"/gmail/v1/users/[^/]+/labels", "gmail.labels_list", self.gmail_labels_list),
+            ("POST", r"/gmail/v1/users/[^/]+/labels", "gmail.labels_create", self.gmail_labels_create),
+            ("POST", r"/calendar/v3/freeBusy", "calendar.freebusy", self.calendar_freebusy),
+            ("POST", r"/calendar/v3/calendars/([^/]+)/events", "calendar.insert", self.calendar_insert),
+            ("POST", r"/v1/chat/completions", "openai.chat", self.openai_chat),
+            ("POST", r"/v1/files", "openai.files", self.openai_file_upload),
+            ("GET", r"/v1/files/([^/]+)/content", "openai.files", self.openai_file_content),
+            ("POST", r"/v1/batches", "openai.batches", self.openai_batch_create),
+            ("GET", r"/v1/batches/([^/]+)", "openai.batches", self.openai_batch_retrieve),
+        ]
+
+    def dispatch(self, method, parsed, body):
+        """Route one request: (status, payload), counted under its route name."""
+        for route_method, pattern, name, handler in self.routes():
+            m = re.fullmatch(pattern, parsed.path)
+            if route_method == method and m:
+                self.count(name)
+                return handler(parse_qs(parsed.query), body, *m.groups())
+        return 404, {"error": {"code": 404, "message": f"No route for {method} {parsed.path}"}}
+
+    def _make_handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # avoid 40 ms delayed-ACK stalls on keep-alive
+
+            def log_message(self, format, *args):
+                pass
+
+            def _dispatch(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                try:
+                    if content_type.startswith("multipart/form-data"):
+                        body = _form_fields(content_type, raw)
+                    elif content_type.startswith("multipart/mixed"):
+                        body = (content_type, raw)
+                    else:
+                        body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+                # One api_latency per HTTP request, so a batch costs one round trip
+                if services.api_latency and not parsed.path.startswith("/v1/"):
+                    time.sleep(services.api_latency)
+                status, payload = services.dispatch(method, parsed, body)
+                if hasattr(payload, "__next__"):
+                    return self._send_events(status, payload)
+                return self._send(status, payload)
+
+            def _send(self, status, payload):
+                if isinstance(payload, tuple):
+                    data, content_type = payload
+                elif isinstance(payload, bytes):
+                    data, content_type = payload, "application/octet-stream"
+                else:
+                    data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                    content_type = "application/json; charset=UTF-8"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_events(self, status, events):
+                """Stream `events` as server-sent events over chunked transfer encoding."""
+                self.send_response(status)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for event in itertools.chain(events, ["[DONE]"]):
+                    data = event if isinstance(event, str) else json.dumps(event)
+                    chunk = f"data: {data}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the local Gmail/Calendar/OpenAI stand-in server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--emails", type=int, default=200, help="Synthetic mailbox size")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per chat completion")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Seconds per Google API request")
+    parser.add_argument("--batch-latency", type=float, default=5.0, help="Seconds until a Batch API job completes")
+    args = parser.parse_args()
+
+    services = FakeServices(args.emails, args.llm_latency, args.api_latency, port=args.port,
+                            batch_latency=args.batch_latency).start()
+    print(f"🧪 Fake services listening on {services.url}")
+    print(f"   OPENAI_BASE_URL={services.url}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        services.stop()
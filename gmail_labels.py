@@ -0,0 +1,152 @@
+# gmail_labels.py
+"""
+Bulk outcome labels and read state for processed mail.
+
+Every message the agent is done with gets one label per outcome and loses
+UNREAD, so the `is:unread` inbox query only returns new mail. Updates are
+queued and sent with users().messages().batchModify, up to 1,000 ids per call.
+Updates that could not be sent are kept in PENDING_FILE and retried by the
+next run's labeler.
+
+    python gmail_labels.py backfill    # label ids already in replied_emails.json
+"""
+
+import json
+import os
+import threading
+
+import metrics
+
+# ------------------------
+# Config
+# ------------------------
+OUTCOME_LABELS = {
+    "processed": "Agent/Processed",  # reply sent
+    "drafted": "Agent/Drafted",      # reply saved as a draft by an unattended run
+    "skipped": "Agent/Skipped",      # reviewed without a reply, or ignored sender
+    "spam": "Agent/Spam",            # dropped by the spam filter
+}
+BATCH_LIMIT = 1000  # batchModify maximum ids per request
+PENDING_FILE = "pending_labels.json"  # updates a failed flush left queued, retried by the next run
+
+
+def ensure_labels(service, names=OUTCOME_LABELS.values()):
+    """Return {label name: label id}, creating any of `names` that do not exist yet."""
+    with metrics.timed("gmail.labels"):
+        existing = service.users().labels().list(userId="me").execute().get("labels", [])
+    ids = {label["name"]: label["id"] for label in existing}
+    for name in names:
+        if name not in ids:
+            with metrics.timed("gmail.labels"):
+                created = service.users().labels().create(userId="me", body={
+                    "name": name,
+                    "labelListVisibility": "labelShow",
+                    "messageListVisibility": "show",
+                }).execute()
+            ids[name] = created["id"]
+    return ids
+
+
+class OutcomeLabeler:
+    """
+    Queues (message id, outcome) pairs and applies them with batchModify.
+
+    Safe to call from several threads: the queue and the API calls share one
+    lock, so `service` should be a Gmail service used by nothing else.
+    A full batch is flushed immediately; call flush() when a run ends.
+    Updates left in PENDING_FILE by an earlier run are queued again, so the
+    first flush() retries them.
+    """
+
+    def __init__(self, service, mark_read=True, batch_limit=BATCH_LIMIT):
+        self.service = service
+        self.mark_read = mark_read
+        self.batch_limit = min(batch_limit, BATCH_LIMIT)
+        self._pending = {outcome: [] for outcome in OUTCOME_LABELS}
+        self._label_ids = None
+        self._lock = threading.Lock()
+        if os.path.exists(PENDING_FILE):
+            with open(PENDING_FILE, "r") as f:
+                for outcome, ids in json.load(f).items():
+                    if outcome in self._pending:
+                        self._pending[outcome].extend(ids)
+
+    def add(self, msg_id, outcome):
+        if outcome not in OUTCOME_LABELS:
+            raise ValueError(f"Unknown outcome {outcome!r}; expected one of {sorted(OUTCOME_LABELS)}")
+        with self._lock:
+            queue = self._pending[outcome]
+            queue.append(msg_id)
+            if len(queue) >= self.batch_limit:
+                self._apply(outcome)
+
+    def add_spam(self, record):
+        """on_spam hook for the inbox stream."""
+        self.add(record.id, "spam")
+
+    def flush(self):
+        """
+        Send every queued update. Returns the number of messages modified.
+        Whatever is still queued afterwards is saved to PENDING_FILE.
+        """
+        with self._lock:
+            done = sum(self._apply(outcome) for outcome in OUTCOME_LABELS)
+            self._save_pending()
+            return done
+
+    def _save_pending(self):
+        left = {outcome: ids for outcome, ids in self._pending.items() if ids}
+        if not left:
+            if os.path.exists(PENDING_FILE):
+                os.remove(PENDING_FILE)
+            return
+        tmp_file = PENDING_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(left, f, indent=4)
+        os.replace(tmp_file, PENDING_FILE)
+        print(f"⚠️ {sum(map(len, left.values()))} label update(s) saved to {PENDING_FILE} for the next run")
+
+    def _apply(self, outcome):
+        ids = self._pending[outcome]
+        if not ids:
+            return 0
+        if self._label_ids is None:
+            try:
+                self._label_ids = ensure_labels(self.service)
+            except Exception as e:
+                # Left queued; flush() saves them for the next run
+                print(f"⚠️ Failed to set up outcome labels: {e}")
+                return 0
+        body = {"addLabelIds": [self._label_ids[OUTCOME_LABELS[outcome]]]}
+        if self.mark_read:
+            body["removeLabelIds"] = ["UNREAD"]
+        done = 0
+        while ids:
+            chunk = ids[:self.batch_limit]
+            body["ids"] = chunk
+            try:
+                with metrics.timed("gmail.batch_modify"):
+                    self.service.users().messages().batchModify(userId="me", body=body).execute()
+            except Exception as e:
+                # Left queued; flush() saves them for the next run
+                print(f"⚠️ Failed to label {len(ids)} email(s) as {OUTCOME_LABELS[outcome]}: {e}")
+                return done
+            del ids[:len(chunk)]
+            done += len(chunk)
+            metrics.incr(f"labels.{outcome}", len(chunk))
+        return done
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python gmail_labels.py backfill")
+        raise SystemExit(1)
+
+    from main import build_gmail_service, replied_data
+
+    labeler = OutcomeLabeler(build_gmail_service())
+    for msg_id in replied_data.get("replied_ids", []):
+        labeler.add(msg_id, "processed")
+    print(f"🏷️ Labeled {labeler.flush()} email(s) as {OUTCOME_LABELS['processed']} and marked them read")
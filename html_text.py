@@ -0,0 +1,196 @@
+# html_text.py
+"""
+HTML-to-text conversion for text/html-only emails, on the stdlib html.parser.
+
+Script, style, head and hidden elements (preheaders, tracking blocks) are
+dropped, images and link targets never reach the output, block elements
+become line breaks and whitespace is collapsed as the text is written. The
+HTML is fed in chunks and parsing stops once the output reaches its size cap,
+so a huge newsletter costs no more than its first screenful.
+"""
+
+import re
+from html.parser import HTMLParser
+
+# ------------------------
+# Config
+# ------------------------
+MAX_TEXT_CHARS = 20000     # output cap; well above any prompt budget
+MAX_HTML_CHARS = 2000000   # input cap, for HTML that is almost all markup
+CHUNK_CHARS = 16384        # HTML fed to the parser per step
+
+SKIP_TAGS = frozenset({"script", "style", "head", "title", "noscript", "template", "svg", "object", "iframe"})
+VOID_TAGS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+                       "param", "source", "track", "wbr"})
+LINE_TAGS = frozenset({"br", "div", "tr", "li", "dt", "dd", "blockquote", "pre", "address", "center",
+                       "section", "article", "header", "footer"})
+PARAGRAPH_TAGS = frozenset({"p", "h1", "h2", "h3", "h4", "h5", "h6", "table", "ul", "ol", "dl", "hr"})
+CELL_TAGS = frozenset({"td", "th"})
+HEAD_TAGS = frozenset({"title", "meta", "link", "style", "script", "base", "noscript", "template"})
+# Start tags that end an open element without its end tag: tag -> (elements it closes, boundaries)
+IMPLIED_ENDS = {
+    "tr": (frozenset({"tr"}), frozenset({"table"})),
+    "td": (frozenset({"td", "th"}), frozenset({"tr", "table"})),
+    "th": (frozenset({"td", "th"}), frozenset({"tr", "table"})),
+    "li": (frozenset({"li"}), frozenset({"ul", "ol"})),
+    "dt": (frozenset({"dt", "dd"}), frozenset({"dl"})),
+    "dd": (frozenset({"dt", "dd"}), frozenset({"dl"})),
+    "p": (frozenset({"p"}), frozenset({"div", "td", "th", "li", "table", "blockquote", "body"})),
+}
+# Zero-width characters used as preheader padding
+INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff\u034f\u00ad"))
+ZERO_LENGTH_RE = re.compile(r"[+-]?0*\.?0+(?:px|pt|em|rem|%)?")
+
+# Pending separators, weakest to strongest
+_SPACE, _LINE, _PARAGRAPH = " ", "\n", "\n\n"
+_RANK = {"": 0, _SPACE: 1, _LINE: 2, _PARAGRAPH: 3}
+
+
+def _hidden_style(style):
+    for declaration in style.lower().split(";"):
+        name, _, value = declaration.partition(":")
+        name, value = name.strip(), value.replace("!important", "").strip()
+        if ((name == "display" and value == "none") or (name == "visibility" and value == "hidden")
+                or (name == "mso-hide" and value == "all")
+                or (name == "max-height" and ZERO_LENGTH_RE.fullmatch(value))):
+            return True
+    return False
+
+
+def _hidden(attrs):
+    for name, value in attrs:
+        if name == "hidden":
+            return True
+        if name == "style" and value and _hidden_style(value):
+            return True
+    return False
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Collects the visible text of an HTML document, up to `max_chars`."""
+
+    def __init__(self, max_chars=MAX_TEXT_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.full = False
+        self._parts = []
+        self._length = 0
+        self._pending = ""
+        self._open = []         # open elements, innermost last
+        self._skip_at = None    # index in _open of the dropped element being skipped
+
+    @property
+    def _skipping(self):
+        return self._skip_at is not None
+
+    def _separate(self, separator):
+        if _RANK[separator] > _RANK[self._pending]:
+            self._pending = separator
+
+    def _write(self, text):
+        if self._length and self._pending:
+            text = self._pending + text
+        self._pending = ""
+        room = self.max_chars - self._length
+        if len(text) >= room:
+            text = text[:room]
+            self.full = True
+        self._parts.append(text)
+        self._length += len(text)
+
+    def _close_to(self, index):
+        """Close the open element at `index` and everything inside it."""
+        del self._open[index:]
+        if self._skipping and self._skip_at >= index:
+            self._skip_at = None
+
+    def _find_open(self, tags, boundaries=frozenset()):
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index] in tags:
+                return index
+            if self._open[index] in boundaries:
+                return None
+        return None
+
+    def _implied_ends(self, tag):
+        # Body content ends a <head> whose end tag was left out
+        if tag not in HEAD_TAGS:
+            index = self._find_open(("head",))
+            if index is not None:
+                self._close_to(index)
+        if tag in IMPLIED_ENDS:
+            index = self._find_open(*IMPLIED_ENDS[tag])
+            if index is not None:
+                self._close_to(index)
+
+    def handle_starttag(self, tag, attrs):
+        self._implied_ends(tag)
+        if tag not in VOID_TAGS:
+            self._open.append(tag)
+        if self._skipping:
+            return
+        if tag in SKIP_TAGS or _hidden(attrs):
+            if tag not in VOID_TAGS:
+                self._skip_at = len(self._open) - 1
+            return
+        if tag in PARAGRAPH_TAGS:
+            self._separate(_PARAGRAPH)
+        elif tag in LINE_TAGS:
+            self._separate(_LINE)
+            if tag == "li":
+                self._write("-")
+                self._separate(_SPACE)
+        elif tag in CELL_TAGS:
+            self._separate(_SPACE)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skipping and tag in ("br", "hr"):
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        # An end tag closes its element and anything left open inside it; strays are ignored
+        skipping = self._skipping
+        index = self._find_open((tag,))
+        if index is not None:
+            self._close_to(index)
+        if skipping:
+            return
+        if tag in PARAGRAPH_TAGS:
+            self._separate(_PARAGRAPH)
+        elif tag in LINE_TAGS:
+            self._separate(_LINE)
+        elif tag in CELL_TAGS:
+            self._separate(_SPACE)
+
+    def handle_data(self, data):
+        if self._skipping or self.full:
+            return
+        data = data.translate(INVISIBLE)
+        words = data.split()
+        if not words:
+            if data:
+                self._separate(_SPACE)
+            return
+        if data[0].isspace():
+            self._separate(_SPACE)
+        self._write(" ".join(words))
+        if data[-1].isspace():
+            self._separate(_SPACE)
+
+    def text(self):
+        return "".join(self._parts)
+
+
+def html_to_text(html, max_chars=MAX_TEXT_CHARS):
+    """Visible text of `html`, whitespace-collapsed and at most `max_chars` long."""
+    if not html:
+        return ""
+    parser = HTMLTextExtractor(max_chars)
+    end = min(len(html), MAX_HTML_CHARS)
+    for start in range(0, end, CHUNK_CHARS):
+        parser.feed(html[start:min(start + CHUNK_CHARS, end)])
+        if parser.full:
+            break
+    else:
+        parser.close()
+    return parser.text()
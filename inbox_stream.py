@@ -0,0 +1,253 @@
+# inbox_stream.py
+"""
+Paginated, generator-based inbox streaming.
+
+Messages are listed page by page (following nextPageToken) and yielded as
+compact EmailRecord objects whose body is only decoded when first accessed.
+With a second Gmail service, pages are fetched on a background thread into a
+bounded queue, so processing starts on the first page while later pages are
+still being fetched and memory stays flat however large the backlog is.
+"""
+
+import base64
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+import metrics
+from attachments import find_attachments
+from html_text import html_to_text
+from prompt_budget import ATTACHMENTS_MARKER
+
+# ------------------------
+# Config
+# ------------------------
+PAGE_SIZE = 100           # messages().list maxResults (Gmail allows up to 500)
+PREFETCH_RECORDS = 50     # records buffered ahead of the consumer
+KEEP_HEADERS = ("From", "To", "Subject", "Date", "Message-ID", "List-Unsubscribe", "Precedence")
+# Header names are case-insensitive (RFC 5322); kept headers are stored under the spelling above
+_CANONICAL_HEADERS = {name.lower(): name for name in KEEP_HEADERS}
+
+_DONE = object()
+
+# ------------------------
+# MIME helpers
+# ------------------------
+def decode_base64url(data: str) -> str:
+    if not data:
+        return ""
+    data = data.replace("-", "+").replace("_", "/")
+    padding = len(data) % 4
+    if padding:
+        data += "=" * (4 - padding)
+    try:
+        return base64.b64decode(data).decode("utf-8", errors="ignore")
+    except Exception:
+        return ""
+
+
+def _collect_text(payload: dict, plain: list, html: list):
+    mime_type = payload.get("mimeType", "")
+    data = payload.get("body", {}).get("data")
+    if data and not payload.get("filename"):
+        if mime_type == "text/plain":
+            plain.append(decode_base64url(data))
+        elif mime_type == "text/html":
+            html.append(decode_base64url(data))
+    for part in payload.get("parts", []) or []:
+        _collect_text(part, plain, html)
+
+
+def get_message_body(payload: dict) -> str:
+    """The text/plain parts of a message, or the text of its HTML parts when it has none."""
+    if not payload:
+        return ""
+    plain, html = [], []
+    _collect_text(payload, plain, html)
+    if plain or not html:
+        return "".join(plain)
+    with metrics.timed("mime.html"):
+        return "\n\n".join(html_to_text(part) for part in html)
+
+
+def extract_email_address(from_header: str) -> str:
+    if not from_header:
+        return ""
+    m = re.search(r"<([^>]+)>", from_header)
+    if m:
+        return m.group(1)
+    email_like = re.findall(r"[\w\.-]+@[\w\.-]+", from_header)
+    return email_like[0] if email_like else from_header
+
+
+def safe_fetch(service, msg_id, retries=3):
+    for attempt in range(retries):
+        try:
+            with metrics.timed("gmail.get"):
+                return service.users().messages().get(userId="me", id=msg_id, format="full").execute()
+        except Exception:
+            time.sleep(2)
+    return None
+
+
+# ------------------------
+# Compact email record
+# ------------------------
+@dataclass(slots=True)
+class EmailRecord:
+    """
+    One fetched message. `body` is decoded from the raw payload on first access
+    and the payload is then dropped. Supports `record["sender"]` style access so
+    it can be passed wherever the old email dicts were used. `attachments`
+    describes the supported attachments, whose text can be appended to the body
+    with add_attachment_text().
+    """
+    id: str
+    thread_id: str
+    sender: str
+    subject: str
+    headers: dict = field(default_factory=dict)
+    attachments: list = field(default_factory=list)
+    _payload: dict = field(default=None, repr=False)
+    _body: str = field(default=None, repr=False)
+
+    @classmethod
+    def from_message(cls, msg_data: dict) -> "EmailRecord":
+        payload = msg_data.get("payload", {})
+        headers = {}
+        for header in payload.get("headers", []):
+            name = _CANONICAL_HEADERS.get(header["name"].lower())
+            if name and name not in headers:
+                headers[name] = header["value"]
+        return cls(
+            id=msg_data["id"],
+            thread_id=msg_data.get("threadId", msg_data["id"]),
+            sender=extract_email_address(headers.get("From", "(Unknown)")),
+            subject=headers.get("Subject", "(No Subject)"),
+            headers=headers,
+            attachments=find_attachments(payload, msg_data["id"]),
+            _payload=payload,
+        )
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            with metrics.timed("mime.decode"):
+                self._body = (get_message_body(self._payload) or "(No content)").strip()
+            self._payload = None
+        return self._body
+
+    def add_attachment_text(self, text: str):
+        """Append extracted attachment text after the body, behind ATTACHMENTS_MARKER."""
+        self._body = self.body + ATTACHMENTS_MARKER + text
+        self.attachments = []
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "sender": self.sender, "subject": self.subject, "body": self.body}
+
+
+# ------------------------
+# Streaming
+# ------------------------
+def iter_message_pages(service, query="is:unread", label_ids=("INBOX",), page_size=PAGE_SIZE):
+    """Yield lists of {"id", "threadId"} stubs, one list per messages().list page."""
+    page_token = None
+    while True:
+        with metrics.timed("gmail.list"):
+            results = service.users().messages().list(
+                userId="me", labelIds=list(label_ids), q=query,
+                maxResults=page_size, pageToken=page_token
+            ).execute()
+        messages = results.get("messages", [])
+        if messages:
+            yield messages
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def iter_emails(service, query="is:unread", label_ids=("INBOX",), limit=None,
+                page_size=PAGE_SIZE, skip=None, spam_filter=None, on_spam=None):
+    """
+    Yield EmailRecords page by page.
+    `skip(msg_id)` drops ids before they are fetched; `spam_filter(record)` drops
+    fetched records (`on_spam(record)` is told about them).
+    """
+    if limit is not None:
+        if limit <= 0:
+            return
+        page_size = min(page_size, limit)
+    yielded = 0
+    for page in iter_message_pages(service, query, label_ids, page_size):
+        for msg in page:
+            msg_id = msg.get("id")
+            if not msg_id or (skip and skip(msg_id)):
+                continue
+            msg_data = safe_fetch(service, msg_id)
+            if not msg_data:
+                continue
+            record = EmailRecord.from_message(msg_data)
+            if spam_filter:
+                try:
+                    if spam_filter(record):
+                        metrics.incr("emails.spam")
+                        if on_spam:
+                            on_spam(record)
+                        continue
+                except Exception:
+                    pass
+            yield record
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+
+def stream_emails(service, prefetch_service=None, prefetch=PREFETCH_RECORDS, **kwargs):
+    """
+    Like iter_emails, but when `prefetch_service` (a second, thread-owned Gmail
+    service) is given, listing and fetching run on a background thread that keeps
+    up to `prefetch` records ready. Closing the generator stops the producer.
+    """
+    if prefetch_service is None:
+        yield from iter_emails(service, **kwargs)
+        return
+
+    buffer = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for record in iter_emails(prefetch_service, **kwargs):
+                if not put(record):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True, name="inbox-prefetch")
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,129 @@
+# llm_batch.py
+"""
+Deferred chat completions through the OpenAI Batch API.
+
+Drafts that nobody is waiting on (mass campaign emails, daily store reports)
+can be generated as one batch job instead of one synchronous request each:
+the prompts are written to a JSONL file, uploaded, submitted to
+/v1/batches and polled until the job finishes. Batch requests cost half as
+much and do not count against the per-minute rate limits, but may take up
+to the completion window to come back.
+
+    python llm_batch.py status <batch_id>    # check a submitted job
+"""
+
+import json
+import time
+
+import metrics
+from openai_client import get_client
+
+# ------------------------
+# Config
+# ------------------------
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+POLL_SECONDS = 30
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def chat_request(custom_id, messages, model="gpt-4o-mini", temperature=0.3):
+    """One line of a batch input file: a chat completion tagged with `custom_id`."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {"model": model, "messages": messages, "temperature": temperature},
+    }
+
+
+# ------------------------
+# Batch job lifecycle
+# ------------------------
+def submit(requests, description=None):
+    """Upload `requests` (chat_request dicts) as JSONL and start a batch job. Returns the batch id."""
+    data = "".join(json.dumps(request) + "\n" for request in requests).encode("utf-8")
+    client = get_client()
+    extra = {"metadata": {"description": description}} if description else {}
+    with metrics.timed("llm.batch_submit"):
+        input_file = client.files.create(file=("batch_input.jsonl", data), purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+            **extra,
+        )
+    metrics.incr("llm.batch_requests", len(requests))
+    print(f"📦 Submitted batch {batch.id} with {len(requests)} request(s)")
+    return batch.id
+
+
+def wait(batch_id, poll_seconds=POLL_SECONDS, timeout=None):
+    """Poll until the batch reaches a terminal status; returns the batch object."""
+    start = time.monotonic()
+    last_progress = None
+    while True:
+        with metrics.timed("llm.batch_poll"):
+            batch = get_client().batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        counts = batch.request_counts
+        progress = (batch.status, counts.completed if counts else 0)
+        if progress != last_progress:
+            total = counts.total if counts else "?"
+            print(f"⏳ Batch {batch_id}: {batch.status}, {progress[1]}/{total} done")
+            last_progress = progress
+        if timeout is not None and time.monotonic() - start >= timeout:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout}s")
+        time.sleep(poll_seconds)
+
+
+def _read_jsonl(file_id):
+    with metrics.timed("llm.batch_download"):
+        text = get_client().files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def results(batch, stage="llm.batch"):
+    """
+    {custom_id: completion text} for every request that succeeded. Failed
+    requests are reported and left out, so callers fall back per request.
+    """
+    if batch.status != "completed":
+        print(f"❌ Batch {batch.id} ended as {batch.status}")
+        return {}
+    texts, failed = {}, []
+    for line in _read_jsonl(batch.output_file_id) if batch.output_file_id else []:
+        response = line.get("response") or {}
+        if response.get("status_code") != 200:
+            failed.append(line)
+            continue
+        body = response.get("body") or {}
+        metrics.record_llm_usage(stage, body)
+        texts[line["custom_id"]] = body["choices"][0]["message"]["content"].strip()
+    failed += _read_jsonl(batch.error_file_id) if batch.error_file_id else []
+    if failed:
+        print(f"⚠️ {len(failed)} batch request(s) failed, e.g. {failed[0].get('error') or failed[0].get('response')}")
+    metrics.incr(f"{stage}.completed", len(texts))
+    return texts
+
+
+def run_batch(requests, stage="llm.batch", description=None, poll_seconds=POLL_SECONDS, timeout=None):
+    """submit(), wait() and results() in one call."""
+    if not requests:
+        return {}
+    batch_id = submit(requests, description)
+    return results(wait(batch_id, poll_seconds, timeout), stage)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3 or sys.argv[1] != "status":
+        print("Usage: python llm_batch.py status <batch_id>")
+        raise SystemExit(1)
+
+    batch = get_client().batches.retrieve(sys.argv[2])
+    counts = batch.request_counts
+    print(f"{batch.id}: {batch.status}"
+          + (f", {counts.completed}/{counts.total} done, {counts.failed} failed" if counts else ""))
@@ -0,0 +1,288 @@
+# llm_stream.py
+"""
+Streaming chat completions for the interactive compose and reply flows.
+
+Drafts are shown token by token as they arrive instead of after the whole
+completion. DraftFilter is the incremental form of clean_ai_draft: it only
+holds back the start of a line while that line could still turn out to be a
+greeting, subject line or sign-off. SummaryReplySplitter parses the
+"Summary: ... Reply: ..." format on the fly, and LiveDraft lets a worker
+thread stream a draft that the interactive review prints while it is still
+being generated.
+"""
+
+import queue
+import threading
+import time
+
+import metrics
+from openai_client import get_client, llm_slot
+
+# ------------------------
+# Config
+# ------------------------
+DROP_PREFIXES = ("dear ", "subject:")
+SIGN_OFFS = ("best regards,", "regards,", "sincerely,", "thank you,")
+SUMMARY_MARKER = "Summary:"
+REPLY_MARKER = "Reply:"
+
+
+# ------------------------
+# Streaming completion
+# ------------------------
+def stream_chat(stage, messages, model="gpt-4o-mini", temperature=0.3):
+    """
+    Yield the completion text delta by delta. Records `stage` for the whole
+    request, `<stage>.first_token` for time to first token, and token usage.
+    """
+    with llm_slot():
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            first = True
+            for chunk in response:
+                if getattr(chunk, "usage", None):
+                    metrics.record_llm_usage(stage, chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        metrics.record(f"{stage}.first_token", time.perf_counter() - start)
+                        first = False
+                    yield chunk.choices[0].delta.content
+            ok = True
+        finally:
+            metrics.record(stage, time.perf_counter() - start, ok)
+
+
+# ------------------------
+# Incremental draft cleaning
+# ------------------------
+def _drop_line(line):
+    """clean_ai_draft's rule for one complete, stripped line."""
+    lower = line.lower()
+    return not line or lower.startswith(DROP_PREFIXES) or lower in SIGN_OFFS
+
+
+def _undecided(partial):
+    """True while a stripped partial line could still be dropped or kept."""
+    lower = partial.lower()
+    if not lower or lower.startswith(DROP_PREFIXES):
+        return False
+    candidates = DROP_PREFIXES + SIGN_OFFS
+    return any(c.startswith(lower) for c in candidates) or lower.rstrip() in SIGN_OFFS
+
+
+class DraftFilter:
+    """
+    Incremental clean_ai_draft: feed() text deltas, get back the text that is
+    safe to show now; finish() returns the rest. The concatenated output is
+    exactly clean_ai_draft() of the concatenated input.
+    """
+
+    def __init__(self):
+        self.text = ""       # everything emitted so far
+        self._line = ""      # current line, leading whitespace dropped
+        self._keep = False   # current line decided as kept and partly emitted
+        self._pending_ws = ""
+
+    def _emit(self, text):
+        self.text += text
+        return text
+
+    def _start_kept_line(self):
+        return "\n" if self.text else ""
+
+    def feed(self, delta):
+        out = []
+        for piece in delta.splitlines(keepends=True):
+            content = piece.splitlines()[0]
+            ends_line = len(content) != len(piece)
+            if self._keep:
+                # Trailing whitespace is held back until more text follows on the line
+                body = self._pending_ws + content
+                stripped = body.rstrip()
+                self._pending_ws = body[len(stripped):]
+                out.append(self._emit(stripped))
+            else:
+                self._line = (self._line + content).lstrip()
+                if self._line and not _undecided(self._line.rstrip()) and not self._line.lower().startswith(DROP_PREFIXES):
+                    stripped = self._line.rstrip()
+                    self._pending_ws = self._line[len(stripped):]
+                    out.append(self._emit(self._start_kept_line() + stripped))
+                    self._keep = True
+            if ends_line:
+                out.append(self._end_line())
+        return "".join(out)
+
+    def _end_line(self):
+        out = ""
+        if not self._keep and not _drop_line(self._line.strip()):
+            out = self._emit(self._start_kept_line() + self._line.strip())
+        self._line, self._keep, self._pending_ws = "", False, ""
+        return out
+
+    def finish(self):
+        return self._end_line()
+
+
+def clean_ai_draft(draft):
+    """Removes greetings, subject lines, and AI-generated signatures from draft."""
+    return "\n".join(line.strip() for line in draft.splitlines() if not _drop_line(line.strip()))
+
+
+# ------------------------
+# Summary / Reply parsing
+# ------------------------
+def split_summary_and_reply(draft):
+    """
+    Split a 'Summary: ... Reply: ...' draft into (summary or None, cleaned reply).
+    Everything after the first "Reply:" is the reply. Defined by
+    SummaryReplySplitter, so a streamed draft shows exactly what this returns.
+    """
+    splitter = SummaryReplySplitter()
+    return _joined(splitter.feed(draft) + splitter.finish())
+
+
+def _joined(events):
+    summary = "".join(text for kind, text in events if kind == "summary")
+    reply = "".join(text for kind, text in events if kind == "reply")
+    return summary or None, reply
+
+
+class SummaryReplySplitter:
+    """
+    Parses a streamed 'Summary: ... Reply: ...' draft on the fly. feed() and
+    finish() return lists of ("summary" | "reply", text) chunks; reply text is
+    already cleaned. A draft that does not open with "Summary:" is all reply,
+    and a later "Reply:" inside the reply is kept as reply text.
+    """
+
+    def __init__(self):
+        self._state = "start"
+        self._buffer = ""
+        self._summary_ws = ""
+        self._started_summary = False
+        self._reply = DraftFilter()
+
+    def _summary(self, text):
+        """Summary text without markers, trimmed like str.strip() (trailing whitespace waits for more text)."""
+        text = text.replace(SUMMARY_MARKER, "")
+        if not self._started_summary:
+            text = text.lstrip()
+        stripped = text.rstrip()
+        if not stripped:
+            self._summary_ws += text
+            return []
+        chunk = self._summary_ws + stripped
+        self._summary_ws = text[len(stripped):]
+        self._started_summary = True
+        return [("summary", chunk)]
+
+    def _reply_chunk(self, text):
+        out = self._reply.feed(text)
+        return [("reply", out)] if out else []
+
+    def feed(self, delta):
+        self._buffer += delta
+        events = []
+        if self._state == "start":
+            head = self._buffer.lstrip()
+            if len(head) < len(SUMMARY_MARKER) and SUMMARY_MARKER.startswith(head):
+                return events
+            if head.startswith(SUMMARY_MARKER):
+                self._state = "summary"
+                self._buffer = head[len(SUMMARY_MARKER):]
+            else:
+                self._state = "reply"
+        if self._state == "summary":
+            index = self._buffer.find(REPLY_MARKER)
+            if index >= 0:
+                events += self._summary(self._buffer[:index])
+                self._state = "reply"
+                self._buffer = self._buffer[index + len(REPLY_MARKER):]
+            else:
+                # Hold back a tail that could be the start of either marker
+                keep = next((n for n in range(len(SUMMARY_MARKER) - 1, 0, -1)
+                             if self._buffer.endswith((REPLY_MARKER[:n], SUMMARY_MARKER[:n]))), 0)
+                events += self._summary(self._buffer[:len(self._buffer) - keep])
+                self._buffer = self._buffer[len(self._buffer) - keep:]
+                return events
+        if self._state == "reply":
+            events += self._reply_chunk(self._buffer)
+            self._buffer = ""
+        return events
+
+    def finish(self):
+        events = []
+        if self._state in ("start", "summary") and self._buffer:
+            if self._state == "start":
+                events += self._reply_chunk(self._buffer)
+            else:
+                events += self._summary(self._buffer)
+            self._buffer = ""
+        tail = self._reply.finish()
+        if tail:
+            events.append(("reply", tail))
+        return events
+
+
+class LiveDraft:
+    """
+    A Summary/Reply draft streamed on one thread and shown on another.
+
+    run() consumes the text deltas (call it on a worker thread, or use start()).
+    Iterating yields ("summary" | "reply", text) chunks as they arrive, and
+    result() waits for the end and returns the (summary, reply) that was
+    shown, the same as split_summary_and_reply() of the complete draft, or None
+    if generation failed or produced no reply.
+    """
+
+    def __init__(self, deltas):
+        self._deltas = deltas
+        self._events = queue.Queue()
+        self._shown = []
+        self._failed = False
+        self._done = threading.Event()
+
+    def run(self):
+        splitter = SummaryReplySplitter()
+        try:
+            for delta in self._deltas:
+                for event in splitter.feed(delta):
+                    self._shown.append(event)
+                    self._events.put(event)
+            for event in splitter.finish():
+                self._shown.append(event)
+                self._events.put(event)
+        except Exception as e:
+            print(f"❌ Error generating reply: {e}")
+            self._failed = True
+        finally:
+            self._events.put(None)
+            self._done.set()
+        return self
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True, name="live-draft").start()
+        return self
+
+    def __iter__(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                self._events.put(None)  # later iterations end immediately
+                return
+            yield event
+
+    def result(self):
+        self._done.wait()
+        if self._failed:
+            return None
+        summary, reply = _joined(self._shown)
+        return (summary, reply) if reply else None
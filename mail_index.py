@@ -0,0 +1,243 @@
+# mail_index.py
+"""
+Local full-text index of processed mail (SQLite FTS5).
+
+Every email that streams through the inbox is stored with its headers and
+cleaned body; summaries, triage priorities and extracted events are added
+once the pipeline has them. Thread context and "what did this sender say
+before" then become local millisecond queries instead of Gmail searches.
+
+    python mail_index.py search "supplier contract"
+    python mail_index.py from priya.sharma@retaileye.in
+    python mail_index.py stats
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+import metrics
+from prompt_budget import compact_whitespace, split_attachments, strip_history
+
+# ------------------------
+# Config
+# ------------------------
+INDEX_FILE = "mail_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    sender TEXT,
+    subject TEXT,
+    date TEXT,
+    body TEXT,
+    summary TEXT,
+    event TEXT,
+    priority INTEGER,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages(sender, indexed_at);
+CREATE INDEX IF NOT EXISTS messages_thread ON messages(thread_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    sender, subject, body, summary, content='messages', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, sender, subject, body, summary)
+    VALUES (new.rowid, new.sender, new.subject, new.body, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, sender, subject, body, summary)
+    VALUES ('delete', old.rowid, old.sender, old.subject, old.body, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, sender, subject, body, summary)
+    VALUES ('delete', old.rowid, old.sender, old.subject, old.body, old.summary);
+    INSERT INTO messages_fts(rowid, sender, subject, body, summary)
+    VALUES (new.rowid, new.sender, new.subject, new.body, new.summary);
+END;
+"""
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(INDEX_FILE, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+        if "priority" not in columns:  # index files written before triage
+            conn.execute("ALTER TABLE messages ADD COLUMN priority INTEGER")
+        _conn = conn
+    return _conn
+
+
+def close():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+# ------------------------
+# Writing
+# ------------------------
+def index_email(record):
+    """Store one fetched email (EmailRecord or email dict); re-indexing keeps its summary/event."""
+    headers = getattr(record, "headers", None) or {}
+    message, attached = split_attachments(record["body"])
+    body = compact_whitespace(strip_history(message))
+    if attached:
+        body += "\n\n" + compact_whitespace(attached)
+    with _lock, metrics.timed("index.write"):
+        conn = _connect()
+        conn.execute(
+            """INSERT INTO messages (id, thread_id, sender, subject, date, body, indexed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET
+                   sender=excluded.sender, subject=excluded.subject, body=excluded.body""",
+            (record["id"], getattr(record, "thread_id", None), record["sender"].lower(),
+             record["subject"], headers.get("Date"), body, time.time()),
+        )
+        conn.commit()
+
+
+def update_analysis(msg_id, summary=None, event=None, priority=None):
+    """Attach the AI summary, extracted event and/or triage priority to an indexed email."""
+    if summary is None and event is None and priority is None:
+        return
+    with _lock, metrics.timed("index.write"):
+        conn = _connect()
+        conn.execute(
+            """UPDATE messages SET summary = COALESCE(?, summary), event = COALESCE(?, event),
+                                   priority = COALESCE(?, priority) WHERE id = ?""",
+            (summary, json.dumps(event) if event else None, priority, msg_id),
+        )
+        conn.commit()
+
+
+# ------------------------
+# Queries
+# ------------------------
+def _row(row):
+    result = dict(row)
+    if result.get("event"):
+        result["event"] = json.loads(result["event"])
+    return result
+
+
+def _fts_query(text):
+    """Quote each term so user input can never be an FTS5 syntax error."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+def search(query, limit=10, raw=False):
+    """
+    Full-text search over sender, subject, body and summary, best match first.
+    Pass raw=True to use FTS5 query syntax (OR, NEAR, prefix*) directly.
+    """
+    match = query if raw else _fts_query(query)
+    if not match:
+        return []
+    with _lock, metrics.timed("index.search"):
+        rows = _connect().execute(
+            """SELECT m.id, m.thread_id, m.sender, m.subject, m.date, m.summary, m.event,
+                      snippet(messages_fts, 2, '[', ']', '…', 12) AS snippet
+               FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid
+               WHERE messages_fts MATCH ? ORDER BY bm25(messages_fts) LIMIT ?""",
+            (match, limit),
+        ).fetchall()
+    return [_row(r) for r in rows]
+
+
+def messages_from(sender, limit=10):
+    """Most recently indexed emails from `sender`."""
+    with _lock, metrics.timed("index.search"):
+        rows = _connect().execute(
+            """SELECT id, thread_id, sender, subject, date, summary, event FROM messages
+               WHERE sender = ? ORDER BY indexed_at DESC LIMIT ?""",
+            (sender.lower(), limit),
+        ).fetchall()
+    return [_row(r) for r in rows]
+
+
+def thread_messages(thread_id):
+    with _lock, metrics.timed("index.search"):
+        rows = _connect().execute(
+            "SELECT * FROM messages WHERE thread_id = ? ORDER BY indexed_at", (thread_id,)
+        ).fetchall()
+    return [_row(r) for r in rows]
+
+
+def indexed_since(since):
+    """Every email indexed at or after the `since` timestamp, highest priority first."""
+    with _lock, metrics.timed("index.search"):
+        rows = _connect().execute(
+            """SELECT id, thread_id, sender, subject, date, body, summary, event, priority, indexed_at
+               FROM messages WHERE indexed_at >= ?
+               ORDER BY priority IS NULL, priority DESC, indexed_at""",
+            (since,),
+        ).fetchall()
+    return [_row(r) for r in rows]
+
+
+def get(msg_id):
+    with _lock:
+        row = _connect().execute("SELECT * FROM messages WHERE id = ?", (msg_id,)).fetchone()
+    return _row(row) if row else None
+
+
+def stats():
+    with _lock:
+        conn = _connect()
+        total = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        summarized = conn.execute("SELECT COUNT(*) FROM messages WHERE summary IS NOT NULL").fetchone()[0]
+        events = conn.execute("SELECT COUNT(*) FROM messages WHERE event IS NOT NULL").fetchone()[0]
+        senders = conn.execute("SELECT COUNT(DISTINCT sender) FROM messages").fetchone()[0]
+    return {"messages": total, "summarized": summarized, "events": events, "senders": senders}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search the local index of processed mail.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search_cmd = sub.add_parser("search", help="Full-text search")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("-n", "--limit", type=int, default=10)
+    search_cmd.add_argument("--raw", action="store_true", help="Use FTS5 query syntax as-is")
+    from_cmd = sub.add_parser("from", help="Recent emails from a sender")
+    from_cmd.add_argument("sender")
+    from_cmd.add_argument("-n", "--limit", type=int, default=10)
+    sub.add_parser("stats", help="Index size")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        for key, value in stats().items():
+            print(f"{key.capitalize():<12}: {value}")
+        raise SystemExit(0)
+
+    start = time.perf_counter()
+    if args.command == "search":
+        results = search(args.query, args.limit, raw=args.raw)
+    else:
+        results = messages_from(args.sender, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for r in results:
+        print(f"\n📧 {r['subject']}")
+        print(f"   From: {r['sender']}   Date: {r['date'] or '-'}   ID: {r['id']}")
+        if r.get("snippet"):
+            print(f"   {' '.join(r['snippet'].split())}")
+        if r.get("summary"):
+            print(f"   Summary: {r['summary']}")
+        if r.get("event"):
+            print(f"   Event: {r['event'].get('title')} at {r['event'].get('start_time')}")
+    print(f"\n🔎 {len(results)} result(s) in {elapsed:.1f} ms")
@@ -1,23 +1,19 @@
 import os
-import re
-import time
 import json
-import base64
 import socket
+import atexit
+import argparse
+import threading
 from datetime import datetime
 from email.mime.text import MIMEText
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 
 # --- Project Imports ---
-from spam_classifier import is_spam
-from reply_handler import handle_email
-from compose_email import compose_email_flow
-from calender_integration import process_email_for_calendar
-from mass_email import send_mass_email
-from send_daily_report import send_daily_report , schedule_daily_report  # ✅ Linked module
+# Feature modules (OpenAI, sklearn, pandas, PyPDF2, Google clients) are imported
+# inside the menu option or stage that uses them, so startup stays fast.
+import metrics
+from inbox_stream import (
+    EmailRecord, decode_base64url, get_message_body, extract_email_address, safe_fetch, stream_emails
+)
 
 # ------------------------
 # Config
@@ -26,47 +22,84 @@ SCOPES = [
     "https://www.googleapis.com/auth/gmail.modify",
     "https://www.googleapis.com/auth/gmail.send"
 ]
+# Per-account state; accounts.activate() points these into an account's state directory
 REPLIED_FILE = "replied_emails.json"
+TOKEN_FILE = "token.json"
+SENDER_INFO_FILE = "sender_info.json"
+CREDENTIALS_FILE = "credentials.json"  # OAuth client, shared by all accounts
 
 # ------------------------
 # Replied emails tracking
 # ------------------------
-if os.path.exists(REPLIED_FILE):
-    with open(REPLIED_FILE, "r") as f:
-        replied_data = json.load(f)
-else:
-    replied_data = {"replied_ids": []}
+replied_data = {"replied_ids": []}
+# Set mirror of replied_ids for O(1) lookups; the lock guards both plus the file write
+_replied_ids = set()
+_replied_lock = threading.Lock()
+
+
+def load_replied_state():
+    """(Re)load REPLIED_FILE into replied_data and the lookup set."""
+    with _replied_lock:
+        replied_data.clear()
+        replied_data["replied_ids"] = []
+        if os.path.exists(REPLIED_FILE):
+            with open(REPLIED_FILE, "r") as f:
+                replied_data.update(json.load(f))
+        _replied_ids.clear()
+        _replied_ids.update(replied_data.get("replied_ids", []))
+
+
+load_replied_state()
 
 
 def has_replied(email_id: str) -> bool:
-    return email_id in replied_data.get("replied_ids", [])
+    return email_id in _replied_ids
 
 
 def mark_as_replied(email_id: str):
-    if email_id not in replied_data.get("replied_ids", []):
+    with _replied_lock:
+        if email_id in _replied_ids:
+            return
+        _replied_ids.add(email_id)
         replied_data.setdefault("replied_ids", []).append(email_id)
-        with open(REPLIED_FILE, "w") as f:
+        tmp_file = REPLIED_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
             json.dump(replied_data, f, indent=4)
+        os.replace(tmp_file, REPLIED_FILE)
 
 
 # ------------------------
 # Network check
 # ------------------------
-try:
-    socket.create_connection(("gmail.googleapis.com", 443), timeout=10)
-    print("✅ Connection successful to Gmail API host.")
-except Exception as e:
-    print("⚠️ Connection test failed:", e)
+def check_connection(host="gmail.googleapis.com", port=443, timeout=10):
+    try:
+        socket.create_connection((host, port), timeout=timeout).close()
+        print("✅ Connection successful to Gmail API host.")
+        return True
+    except Exception as e:
+        print("⚠️ Connection test failed:", e)
+        return False
+
+
+def check_connection_in_background():
+    """Run check_connection on a daemon thread so it never delays startup."""
+    thread = threading.Thread(target=check_connection, daemon=True)
+    thread.start()
+    return thread
 
 
 # ------------------------
 # Authenticate Gmail
 # ------------------------
-def authenticate_gmail():
+def load_gmail_credentials():
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
-    if os.path.exists("token.json"):
+    if os.path.exists(TOKEN_FILE):
         try:
-            creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+            creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
         except Exception:
             creds = None
 
@@ -77,141 +110,129 @@ def authenticate_gmail():
             except Exception:
                 creds = None
         if not creds:
-            if not os.path.exists("credentials.json"):
-                raise FileNotFoundError("credentials.json not found.")
-            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
+            if not os.path.exists(CREDENTIALS_FILE):
+                raise FileNotFoundError(f"{CREDENTIALS_FILE} not found.")
+            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
             creds = flow.run_local_server(port=0)
 
-        with open("token.json", "w") as token:
+        with open(TOKEN_FILE, "w") as token:
             token.write(creds.to_json())
+    return creds
 
-    service = build("gmail", "v1", credentials=creds)
-    profile = service.users().getProfile(userId="me").execute()
-    sender = profile.get("emailAddress")
-    return service, sender
-
-
-# ------------------------
-# Helpers
-# ------------------------
-def decode_base64url(data: str) -> str:
-    if not data:
-        return ""
-    data = data.replace("-", "+").replace("_", "/")
-    padding = len(data) % 4
-    if padding:
-        data += "=" * (4 - padding)
-    try:
-        return base64.b64decode(data).decode("utf-8", errors="ignore")
-    except Exception:
-        return ""
 
+def build_gmail_service(creds=None):
+    """Build a Gmail service; each thread that calls the API needs its own."""
+    from googleapiclient.discovery import build
 
-def get_message_body(payload: dict) -> str:
-    if not payload:
-        return ""
-    body_text = ""
-    mime_type = payload.get("mimeType", "")
-    if mime_type == "text/plain" and payload.get("body", {}).get("data"):
-        body_text += decode_base64url(payload["body"]["data"])
-    for part in payload.get("parts", []) or []:
-        body_text += get_message_body(part)
-    return body_text
+    return build("gmail", "v1", credentials=creds or load_gmail_credentials())
 
 
-def extract_email_address(from_header: str) -> str:
-    if not from_header:
-        return ""
-    m = re.search(r"<([^>]+)>", from_header)
-    if m:
-        return m.group(1)
-    email_like = re.findall(r"[\w\.-]+@[\w\.-]+", from_header)
-    return email_like[0] if email_like else from_header
+def authenticate_gmail():
+    service = build_gmail_service(load_gmail_credentials())
+    with metrics.timed("gmail.profile"):
+        profile = service.users().getProfile(userId="me").execute()
+    sender = profile.get("emailAddress")
+    return service, sender
 
 
-def safe_fetch(service, msg_id, retries=3):
-    for attempt in range(retries):
-        try:
-            return service.users().messages().get(userId="me", id=msg_id, format="full").execute()
-        except Exception:
-            time.sleep(2)
-    return None
+def load_sender_info(gmail_sender):
+    try:
+        with open(SENDER_INFO_FILE, "r") as f:
+            sender_info = json.load(f)
+        sender_info["email"] = gmail_sender
+    except Exception as e:
+        print(f"⚠️ Failed to load {SENDER_INFO_FILE}: {e}")
+        sender_info = {
+            "name": "Sahil Arora",
+            "email": gmail_sender,
+            "designation": "Team Head",
+            "company": "",
+            "phone": ""
+        }
+    return sender_info
 
 
 # ------------------------
 # Fetch incoming emails
 # ------------------------
-def fetch_emails(service, n=5):
-    try:
-        results = service.users().messages().list(
-            userId="me", labelIds=["INBOX"], q="is:unread", maxResults=n
-        ).execute()
-    except Exception:
-        return []
-
-    messages = results.get("messages", [])
-    emails_list = []
-
-    for msg in messages:
-        msg_id = msg.get("id")
-        if not msg_id or has_replied(msg_id):
-            continue
+def _spam_filter(record):
+    # Known senders and bulk-mail headers are decided without running the model
+    import sender_reputation
+    from spam_classifier import is_spam
+    return sender_reputation.is_spam_email(record, is_spam)
 
-        msg_data = safe_fetch(service, msg_id)
-        if not msg_data:
-            continue
-
-        headers = {h["name"]: h["value"] for h in msg_data.get("payload", {}).get("headers", [])}
-        subject = headers.get("Subject", "(No Subject)")
-        sender_raw = headers.get("From", "(Unknown)")
-        sender_email = extract_email_address(sender_raw)
-        body = get_message_body(msg_data.get("payload", {})) or "(No content)"
 
+def _indexed(records):
+    """Add each record to the local mail index as it streams past."""
+    import mail_index
+    for record in records:
         try:
-            if is_spam(body):
-                continue
-        except Exception:
-            pass
+            mail_index.index_email(record)
+        except Exception as e:
+            print(f"⚠️ Failed to index email {record.id}: {e}")
+        yield record
+
+
+def stream_incoming_emails(service, limit=None, prefetch_service=None, on_spam=None,
+                           attachment_service_factory=None):
+    """
+    Unread, unreplied, non-spam inbox emails as EmailRecords, page by page.
+    With `attachment_service_factory` (builds a Gmail service), attachment text
+    is extracted and added to each body before the email is indexed.
+    """
+    records = stream_emails(service, prefetch_service=prefetch_service, limit=limit,
+                            skip=has_replied, spam_filter=_spam_filter, on_spam=on_spam)
+    if attachment_service_factory:
+        from attachments import with_attachment_text
+        records = with_attachment_text(records, attachment_service_factory)
+    return _indexed(records)
 
-        emails_list.append({
-            "id": msg_id,
-            "sender": sender_email,
-            "subject": subject,
-            "body": body.strip()
-        })
 
-    return emails_list
+def fetch_emails(service, n=5):
+    try:
+        return list(stream_incoming_emails(service, limit=n))
+    except Exception:
+        return []
 
 
 # ------------------------
 # Main loop
 # ------------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Gmail Agent")
+    parser.add_argument("--profile", action="store_true", help="Print a per-stage timing breakdown on exit")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this local port")
+    parser.add_argument("--metrics-log", help="Append per-stage JSON lines to this file")
+    parser.add_argument("--no-connection-check", action="store_true",
+                        help="Skip the background connectivity check to the Gmail API host")
+    args = parser.parse_args()
+
+    if not args.no_connection_check:
+        check_connection_in_background()
+
+    if args.metrics_log:
+        metrics.enable_log(args.metrics_log)
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+        print(f"📈 Metrics available at http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.profile:
+        atexit.register(metrics.print_profile)
+
     try:
         service, gmail_sender = authenticate_gmail()
     except Exception as e:
         print("❌ Authentication failed:", e)
         raise SystemExit(1)
 
-    # Load sender info
-    try:
-        with open("sender_info.json", "r") as f:
-            sender_info = json.load(f)
-        sender_info["email"] = gmail_sender
-    except Exception as e:
-        print(f"⚠️ Failed to load sender_info.json: {e}")
-        sender_info = {
-            "name": "Sahil Arora",
-            "email": gmail_sender,
-            "designation": "Team Head",
-            "company": "",
-            "phone": ""
-        }
+    sender_info = load_sender_info(gmail_sender)
 
     print(f"✅ Authenticated as: {gmail_sender}")
 
     # Start the automatic daily report scheduler
+    from send_daily_report import send_daily_report, schedule_daily_report
     schedule_daily_report(service, gmail_sender)
+    from daily_digest import schedule_daily_digest, send_daily_digest
+    schedule_daily_digest(service, gmail_sender)
 
     while True:
         print("\n=== 🤖 AI Gmail Agent ===")
@@ -220,37 +241,44 @@ if __name__ == "__main__":
         print("3: Send mass email")
         print("4: Exit")
         print("5: Send daily report manually")
+        print("6: Triage incoming emails (summaries and priorities only)")
+        print("7: Send today's email digest")
         choice = input("Select an option: ").strip()
 
         if choice == "1":
-            emails = fetch_emails(service, n=5)
-            if not emails:
-                print("No new emails to process.")
+            from email_pipeline import process_emails
+            from gmail_labels import OutcomeLabeler
+
+            count = input("How many emails? (Enter for 5, 'all' to work through the whole backlog): ").strip().lower()
+            limit = None if count == "all" else int(count) if count.isdigit() else 5
+            # Handled and spam emails are labeled and marked read in bulk, so they leave the unread query
+            labeler = OutcomeLabeler(build_gmail_service())
+            labeler.flush()  # updates an earlier run could not send, before they are listed again
+            try:
+                # Pages are listed and fetched on a second connection while earlier emails are processed
+                emails = stream_incoming_emails(service, limit=limit, prefetch_service=build_gmail_service(),
+                                                on_spam=labeler.add_spam,
+                                                attachment_service_factory=build_gmail_service)
+                # Reply drafting, event extraction and freebusy run concurrently for all emails
+                processed = process_emails(service, emails, on_replied=mark_as_replied, on_outcome=labeler.add)
+            except Exception as e:
+                print(f"❌ Error fetching emails: {e}")
                 continue
-            for email_data in emails:
-                print(f"\n📧 Processing email from {email_data['sender']} with subject: {email_data['subject']}")
-                try:
-                    handle_email(service, email_data)
-                    mark_as_replied(email_data["id"])
-                except Exception as e:
-                    print(f"❌ Error handling email {email_data['id']}: {e}")
-                try:
-                    process_email_for_calendar(
-                        email_data["body"],
-                        email_sender=email_data["sender"],
-                        email_subject=email_data["subject"]
-                    )
-                except Exception as e:
-                    print(f"⚠️ Calendar integration error: {e}")
+            finally:
+                labeler.flush()
+            if not processed:
+                print("No new emails to process.")
 
         elif choice == "2":
             try:
+                from compose_email import compose_email_flow
                 compose_email_flow(service)
             except Exception as e:
                 print(f"❌ Error in compose flow: {e}")
 
         elif choice == "3":
             try:
+                from mass_email import send_mass_email
                 send_mass_email(service, sender_info)
             except Exception as e:
                 print(f"❌ Error running mass email flow: {e}")
@@ -262,5 +290,35 @@ if __name__ == "__main__":
         elif choice == "5":
             send_daily_report(service, gmail_sender)
 
+        elif choice == "6":
+            from summarize_emails import triage_and_index
+
+            count = input("How many emails? (Enter for 20, 'all' for the whole backlog): ").strip().lower()
+            limit = None if count == "all" else int(count) if count.isdigit() else 20
+            headers = {}  # id -> (subject, sender), for the listing
+
+            def remember(records):
+                for record in records:
+                    headers[record.id] = (record.subject, record.sender)
+                    yield record
+
+            try:
+                # Emails are packed several to a request as they stream in; nothing is replied to or marked read
+                emails = stream_incoming_emails(service, limit=limit, prefetch_service=build_gmail_service(),
+                                                attachment_service_factory=build_gmail_service)
+                results = triage_and_index(remember(emails))
+            except Exception as e:
+                print(f"❌ Error triaging emails: {e}")
+                continue
+            if not results:
+                print("No new emails to triage.")
+            for msg_id, result in sorted(results.items(), key=lambda item: -item[1]["priority"]):
+                subject, sender = headers[msg_id]
+                print(f"\n[{result['priority']}] {subject} — {sender}")
+                print(f"    {result['summary']}")
+
+        elif choice == "7":
+            send_daily_digest(service, gmail_sender)
+
         else:
             print("⚠️ Invalid choice. Try again.")
@@ -1,15 +1,24 @@
 # mass_email.py
 import csv
+import json
+import os
 import re
 import time
 import base64
 from email.mime.text import MIMEText
-from reply_handler import generate_ai_reply_for_mass  # Updated AI function for mass emails
+import metrics
+import llm_batch
+from campaign_delivery import CampaignTemplate, deliver
+from reply_handler import generate_ai_reply_for_mass, mass_prompt  # Updated AI function for mass emails
 
 # ------------------------
 # Config
 # ------------------------
-RATE_LIMIT_SECONDS = 1  # delay between sending emails
+BATCH_SENDS = True  # send through Gmail batch requests, paced by quota (campaign_delivery.py)
+RATE_LIMIT_SECONDS = 1  # one-by-one sends: delay between sending emails
+BATCH_POLL_SECONDS = 30  # deferred mode: how often to check the batch job
+BATCH_WAIT_SECONDS = 600  # deferred mode: how long the menu waits before saving the campaign for later
+PENDING_CAMPAIGNS_FILE = "pending_campaigns.json"  # deferred campaigns whose batch job is still running
 
 # ------------------------
 # Helpers
@@ -35,6 +44,127 @@ def _read_recipients_from_csv(filename: str):
         print(f"CSV file not found: {filename}")
     return recipients
 
+def _signature(sender_info):
+    return f"\n\n{sender_info['name']}\n{sender_info.get('designation','')}\n{sender_info.get('company','')}\n{sender_info.get('phone','')}".strip()
+
+def _send_one(service, sender_info, recipient, subject, ai_body):
+    final_body = ai_body + _signature(sender_info)  # append signature only once
+
+    msg = MIMEText(final_body)
+    msg["to"] = recipient["email"]
+    msg["from"] = sender_info["email"]
+    msg["subject"] = subject
+
+    raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
+    try:
+        with metrics.timed("gmail.send"):
+            service.users().messages().send(userId='me', body={'raw': raw}).execute()
+        print(f"✅ Sent to {recipient['name']} <{recipient['email']}>")
+    except Exception as e:
+        print(f"❌ Error sending to {recipient['email']}: {e}")
+
+def _print_result(result):
+    recipient = result["recipient"]
+    if result["error"]:
+        print(f"❌ Error sending to {recipient['email']}: {result['error']}")
+    else:
+        print(f"✅ Sent to {recipient['name']} <{recipient['email']}>")
+
+def _load_pending():
+    if not os.path.exists(PENDING_CAMPAIGNS_FILE):
+        return []
+    with open(PENDING_CAMPAIGNS_FILE, "r") as f:
+        return json.load(f)
+
+def _save_pending(campaigns):
+    if not campaigns:
+        if os.path.exists(PENDING_CAMPAIGNS_FILE):
+            os.remove(PENDING_CAMPAIGNS_FILE)
+        return
+    tmp_file = PENDING_CAMPAIGNS_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(campaigns, f, indent=4)
+    os.replace(tmp_file, PENDING_CAMPAIGNS_FILE)
+
+def _drop_pending(batch_id):
+    _save_pending([c for c in _load_pending() if c["batch_id"] != batch_id])
+
+def submit_campaign(recipients, instructions, subject):
+    """
+    Deferred mode: submit every recipient's draft as one OpenAI batch job
+    instead of one request each. The campaign is saved to
+    PENDING_CAMPAIGNS_FILE until it is sent or cancelled, so it can be
+    resumed after a restart. Returns the campaign.
+    """
+    requests = [
+        llm_batch.chat_request(str(i), [{"role": "user", "content": mass_prompt(r['name'], instructions, subject)}],
+                               temperature=0.4)
+        for i, r in enumerate(recipients)
+    ]
+    batch_id = llm_batch.submit(requests, description=f"Campaign: {subject}")
+    campaign = {"batch_id": batch_id, "subject": subject, "instructions": instructions, "recipients": recipients}
+    _save_pending(_load_pending() + [campaign])
+    return campaign
+
+def collect_campaign_bodies(campaign, timeout=BATCH_WAIT_SECONDS):
+    """
+    One body per recipient from the campaign's batch job, or None if the
+    campaign should not be sent now. A job still running after `timeout`
+    stays saved for later. Recipients the batch did not answer (a failed,
+    expired or cancelled job answers none) are only regenerated one by one
+    if you confirm; otherwise the campaign is cancelled.
+    """
+    recipients, instructions, subject = campaign["recipients"], campaign["instructions"], campaign["subject"]
+    try:
+        batch = llm_batch.wait(campaign["batch_id"], BATCH_POLL_SECONDS, timeout)
+    except TimeoutError:
+        print(f"⏳ Batch {campaign['batch_id']} is still running. The campaign is saved; "
+              f"choose 'Send mass email' again later to send it.")
+        return None
+    except Exception as e:
+        print(f"❌ Could not check batch {campaign['batch_id']}: {e}. The campaign is saved for later.")
+        return None
+
+    texts = llm_batch.results(batch, stage="llm.mass_batch")
+    missing = [i for i in range(len(recipients)) if not texts.get(str(i))]
+    if missing:
+        answer = input(f"⚠️ The batch has no draft for {len(missing)}/{len(recipients)} recipient(s). "
+                       f"Generate those now one by one (y) or cancel the campaign (n)? ").strip().lower()
+        if answer != 'y':
+            print("Campaign cancelled.")
+            _drop_pending(campaign["batch_id"])
+            return None
+        for i in missing:
+            texts[str(i)] = generate_ai_reply_for_mass(recipient_name=recipients[i]['name'],
+                                                       instructions=instructions, subject=subject)
+    return [texts[str(i)] for i in range(len(recipients))]
+
+def resume_pending_campaigns(service, sender_info):
+    """Offer to send deferred campaigns whose batch job was still running when they were submitted."""
+    for campaign in _load_pending():
+        answer = input(f"📦 Deferred campaign '{campaign['subject']}' to {len(campaign['recipients'])} recipient(s) "
+                       f"(batch {campaign['batch_id']}). Check and send it now? (y/n/cancel): ").strip().lower()
+        if answer == 'cancel':
+            _drop_pending(campaign["batch_id"])
+            print("Campaign cancelled.")
+        elif answer == 'y':
+            bodies = collect_campaign_bodies(campaign)
+            if bodies is not None:
+                _send_campaign(service, sender_info, campaign["recipients"], campaign["subject"], bodies)
+                _drop_pending(campaign["batch_id"])
+
+def _send_campaign(service, sender_info, recipients, subject, bodies):
+    if not BATCH_SENDS:
+        for r, ai_body in zip(recipients, bodies):
+            _send_one(service, sender_info, r, subject, ai_body)
+            time.sleep(RATE_LIMIT_SECONDS)
+        return
+
+    template = CampaignTemplate(sender_info["email"], subject, _signature(sender_info))
+    results = deliver(service, template, zip(recipients, bodies), on_result=_print_result)
+    sent = sum(1 for result in results if not result["error"])
+    print(f"📬 Sent {sent}/{len(results)} emails.")
+
 # ------------------------
 # Mass email flow
 # ------------------------
@@ -44,6 +174,11 @@ def send_mass_email(service, sender_info):
     Signatures are automatically taken from sender_info.json.
     Prompts user for specifications instead of using a fixed template.
     """
+    if _load_pending():
+        resume_pending_campaigns(service, sender_info)
+        if input("Start a new campaign? (y/n): ").strip().lower() != 'y':
+            return
+
     choice = input("Send emails (1) manually enter or (2) load from CSV? ").strip()
     recipients = []
 
@@ -78,35 +213,30 @@ def send_mass_email(service, sender_info):
             instructions=instructions,
             subject=subject
         )
-        signature = f"\n\n{sender_info['name']}\n{sender_info.get('designation','')}\n{sender_info.get('company','')}\n{sender_info.get('phone','')}".strip()
-        print(f"To: {r['email']}\nSubject: {subject}\nBody:\n{ai_body}{signature}\n---\n")
+        print(f"To: {r['email']}\nSubject: {subject}\nBody:\n{ai_body}{_signature(sender_info)}\n---\n")
 
     confirm = input(f"Proceed to send to {len(recipients)} recipients? (y/n): ").strip().lower()
     if confirm != 'y':
         print("Cancelled by user.")
         return
 
+    mode = input("Generate drafts (1) now or (2) deferred with the OpenAI Batch API (half price, can take hours)? ").strip()
+
     # ------------------------
     # Send emails
     # ------------------------
-    for r in recipients:
-        ai_body = generate_ai_reply_for_mass(
-            recipient_name=r['name'],
-            instructions=instructions,
-            subject=subject
-        )
-        signature = f"\n\n{sender_info['name']}\n{sender_info.get('designation','')}\n{sender_info.get('company','')}\n{sender_info.get('phone','')}".strip()
-        final_body = ai_body + signature  # append signature only once
-
-        msg = MIMEText(final_body)
-        msg["to"] = r["email"]
-        msg["from"] = sender_info["email"]
-        msg["subject"] = subject
-
-        raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
+    if mode == '2':
         try:
-            service.users().messages().send(userId='me', body={'raw': raw}).execute()
-            print(f"✅ Sent to {r['name']} <{r['email']}>")
+            campaign = submit_campaign(recipients, instructions, subject)
         except Exception as e:
-            print(f"❌ Error sending to {r['email']}: {e}")
-        time.sleep(RATE_LIMIT_SECONDS)
+            print(f"❌ Batch submission failed: {e}")
+            return
+        bodies = collect_campaign_bodies(campaign)
+        if bodies is None:
+            return
+        _send_campaign(service, sender_info, recipients, subject, bodies)
+        _drop_pending(campaign["batch_id"])
+    else:
+        bodies = (generate_ai_reply_for_mass(recipient_name=r['name'], instructions=instructions, subject=subject)
+                  for r in recipients)
+        _send_campaign(service, sender_info, recipients, subject, bodies)
@@ -0,0 +1,224 @@
+# metrics.py
+"""
+Lightweight per-stage timing and counting for the email pipeline.
+
+Every Gmail/Calendar/OpenAI call and local stage (MIME decode, spam scoring)
+is wrapped in `timed("<stage>")`. Results can be printed as a per-run
+breakdown (`--profile`), written as JSON lines (METRICS_LOG) or scraped as
+Prometheus text from a local endpoint (`--metrics-port`).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ------------------------
+# Config
+# ------------------------
+MAX_SAMPLES = 10000  # durations kept per stage for percentiles
+
+_lock = threading.Lock()
+_stages = defaultdict(lambda: {"count": 0, "errors": 0, "total": 0.0, "max": 0.0, "samples": []})
+_tokens = defaultdict(lambda: {"prompt": 0, "completion": 0})
+_counters = defaultdict(int)
+_log_file = None
+
+
+# ------------------------
+# Recording
+# ------------------------
+def enable_log(path):
+    """Append one JSON line per recorded stage to `path`."""
+    global _log_file
+    with _lock:
+        if _log_file:
+            _log_file.close()
+        _log_file = open(path, "a", encoding="utf-8") if path else None
+
+
+def record(stage, duration, ok=True):
+    with _lock:
+        stats = _stages[stage]
+        stats["count"] += 1
+        stats["total"] += duration
+        stats["max"] = max(stats["max"], duration)
+        if not ok:
+            stats["errors"] += 1
+        if len(stats["samples"]) < MAX_SAMPLES:
+            stats["samples"].append(duration)
+        if _log_file:
+            _log_file.write(json.dumps({"ts": round(time.time(), 3), "stage": stage,
+                                        "duration_ms": round(duration * 1000, 3), "ok": ok}) + "\n")
+            _log_file.flush()
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block under `stage`; exceptions are counted as errors and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        record(stage, time.perf_counter() - start, ok=False)
+        raise
+    record(stage, time.perf_counter() - start)
+
+
+def instrument(stage):
+    """Decorator form of `timed`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def record_llm_usage(stage, response):
+    """
+    Add prompt/completion token counts from an OpenAI response to `stage`.
+    `response` may also be a plain dict, as in Batch API output files.
+    """
+    if isinstance(response, dict):
+        usage = response.get("usage") or {}
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    else:
+        usage = getattr(response, "usage", None)
+        if not usage:
+            return
+        prompt, completion = getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+    with _lock:
+        _tokens[stage]["prompt"] += prompt or 0
+        _tokens[stage]["completion"] += completion or 0
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _tokens.clear()
+        _counters.clear()
+
+
+# ------------------------
+# Reporting
+# ------------------------
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def snapshot():
+    """Return a plain-dict copy of all stage stats, token counts and counters."""
+    with _lock:
+        stages = {
+            name: {
+                "count": s["count"],
+                "errors": s["errors"],
+                "total_ms": round(s["total"] * 1000, 3),
+                "mean_ms": round(s["total"] / s["count"] * 1000, 3) if s["count"] else 0.0,
+                "p50_ms": round(_percentile(s["samples"], 50) * 1000, 3),
+                "p95_ms": round(_percentile(s["samples"], 95) * 1000, 3),
+                "max_ms": round(s["max"] * 1000, 3),
+            }
+            for name, s in _stages.items()
+        }
+        return {"stages": stages, "tokens": {k: dict(v) for k, v in _tokens.items()},
+                "counters": dict(_counters)}
+
+
+def usage():
+    """Call counts per stage and total LLM tokens; cheap enough to check per email."""
+    with _lock:
+        return {"calls": {name: s["count"] for name, s in _stages.items()},
+                "llm_tokens": sum(t["prompt"] + t["completion"] for t in _tokens.values())}
+
+
+def format_profile(data=None):
+    data = data or snapshot()
+    lines = [f"{'stage':<28}{'calls':>7}{'errors':>8}{'total ms':>11}{'mean ms':>10}{'p95 ms':>10}{'tokens in/out':>16}",
+             "─" * 90]
+    for name, s in sorted(data["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+        tokens = data["tokens"].get(name)
+        token_text = f"{tokens['prompt']}/{tokens['completion']}" if tokens else ""
+        lines.append(f"{name:<28}{s['count']:>7}{s['errors']:>8}{s['total_ms']:>11.1f}"
+                     f"{s['mean_ms']:>10.1f}{s['p95_ms']:>10.1f}{token_text:>16}".rstrip())
+    # Tokens without request timings, e.g. Batch API results
+    for name, tokens in sorted(data["tokens"].items()):
+        if name not in data["stages"]:
+            token_text = f"{tokens['prompt']}/{tokens['completion']}"
+            lines.append(f"{name:<28}{'':>46}{token_text:>16}")
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"{name:<28}{value:>7}")
+    return "\n".join(lines)
+
+
+def print_profile():
+    print("\n📊 Per-stage profile for this run")
+    print(format_profile())
+
+
+def prometheus_text():
+    data = snapshot()
+    lines = [
+        "# HELP agent_stage_seconds Time spent per pipeline stage.",
+        "# TYPE agent_stage_seconds summary",
+    ]
+    for name, s in sorted(data["stages"].items()):
+        lines.append(f'agent_stage_seconds{{stage="{name}",quantile="0.5"}} {s["p50_ms"] / 1000}')
+        lines.append(f'agent_stage_seconds{{stage="{name}",quantile="0.95"}} {s["p95_ms"] / 1000}')
+        lines.append(f'agent_stage_seconds_sum{{stage="{name}"}} {s["total_ms"] / 1000}')
+        lines.append(f'agent_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+    lines += ["# HELP agent_stage_errors_total Failed calls per pipeline stage.",
+              "# TYPE agent_stage_errors_total counter"]
+    for name, s in sorted(data["stages"].items()):
+        lines.append(f'agent_stage_errors_total{{stage="{name}"}} {s["errors"]}')
+    lines += ["# HELP agent_llm_tokens_total OpenAI tokens per stage.",
+              "# TYPE agent_llm_tokens_total counter"]
+    for name, t in sorted(data["tokens"].items()):
+        lines.append(f'agent_llm_tokens_total{{stage="{name}",kind="prompt"}} {t["prompt"]}')
+        lines.append(f'agent_llm_tokens_total{{stage="{name}",kind="completion"}} {t["completion"]}')
+    lines += ["# HELP agent_events_total Pipeline event counters.",
+              "# TYPE agent_events_total counter"]
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f'agent_events_total{{name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port=9108, host="127.0.0.1"):
+    """Serve `prometheus_text()` on http://host:port/metrics from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            data = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if os.getenv("METRICS_LOG"):
+    enable_log(os.getenv("METRICS_LOG"))
@@ -0,0 +1,194 @@
+# online_spam_model.py
+"""
+Online-trainable spam engine: stateless hashing vectorizer + SGD logistic regression.
+
+Unlike spam_model.pkl + vectorizer.pkl there is no fitted vocabulary to load or
+hold in memory, and the model keeps learning with partial_fit from our own mail.
+Select it with SPAM_ENGINE=online.
+
+    python online_spam_model.py train --spam spam.mbox --ham ham_folder/
+    python online_spam_model.py update --spam message.eml
+    python online_spam_model.py check message.eml
+"""
+
+import atexit
+import email
+import mailbox
+import os
+import pickle
+import threading
+from email import policy
+
+# ------------------------
+# Config
+# ------------------------
+ONLINE_MODEL_FILE = "online_spam_model.pkl"
+N_FEATURES = 2 ** 18      # hashed feature space (coef_ is 2 MB of float64)
+TRAIN_BATCH = 500
+SAVE_EVERY = 20           # in-app feedback updates between saves
+
+_lock = threading.Lock()
+_vectorizer = None
+_model = None
+_pending = 0
+
+
+# ------------------------
+# Model
+# ------------------------
+def _get_vectorizer():
+    global _vectorizer
+    if _vectorizer is None:
+        from sklearn.feature_extraction.text import HashingVectorizer
+        _vectorizer = HashingVectorizer(n_features=N_FEATURES, alternate_sign=False,
+                                        ngram_range=(1, 2), norm="l2")
+    return _vectorizer
+
+
+def load_model():
+    """Load the trained classifier, or start an untrained one if none is saved."""
+    global _model
+    if _model is None:
+        if os.path.exists(ONLINE_MODEL_FILE):
+            with open(ONLINE_MODEL_FILE, "rb") as f:
+                _model = pickle.load(f)
+        else:
+            from sklearn.linear_model import SGDClassifier
+            _model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=0)
+    return _model
+
+
+def save_model():
+    global _pending
+    with _lock:
+        if _model is None or not hasattr(_model, "coef_"):
+            return
+        tmp_file = ONLINE_MODEL_FILE + ".tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(_model, f)
+        os.replace(tmp_file, ONLINE_MODEL_FILE)
+        _pending = 0
+
+
+def partial_fit(texts, labels):
+    """Incrementally train on `texts` with labels 1 (spam) / 0 (not spam)."""
+    vec = _get_vectorizer().transform(texts)
+    with _lock:
+        load_model().partial_fit(vec, labels, classes=[0, 1])
+
+
+def is_spam(email_text, threshold=0.8):
+    """`email_text` as built by spam_text(), the same form the model is trained on."""
+    vec = _get_vectorizer().transform([email_text])
+    # Under the lock: a concurrent partial_fit may be rewriting coef_
+    with _lock:
+        model = load_model()
+        if not hasattr(model, "coef_"):
+            return False  # untrained: never drop mail
+        return model.predict_proba(vec)[0][1] >= threshold
+
+
+def update(email_text, spam):
+    """Learn from one message the user marked spam / not spam; saved every SAVE_EVERY updates."""
+    global _pending
+    partial_fit([email_text], [1 if spam else 0])
+    with _lock:
+        _pending += 1
+        should_save = _pending >= SAVE_EVERY
+    if should_save:
+        save_model()
+
+
+atexit.register(lambda: _pending and save_model())
+
+
+# ------------------------
+# Reading labeled mail
+# ------------------------
+def spam_text(subject, body) -> str:
+    """
+    The text the model trains on and scores: subject line, then the plain-text
+    body. Attachment text appended to a body after it was scored is left out.
+    """
+    from prompt_budget import split_attachments
+
+    return f"{subject or ''}\n{split_attachments(body or '')[0].strip()}"
+
+
+def message_text(msg) -> str:
+    """spam_text() of an email.message.Message; HTML bodies are converted like incoming mail."""
+    from html_text import html_to_text
+
+    try:
+        part = msg.get_body(preferencelist=("plain", "html"))
+        body = part.get_content() if part else ""
+        if part is not None and part.get_content_type() == "text/html":
+            body = html_to_text(body)
+    except Exception:
+        body = ""
+    return spam_text(str(msg.get("Subject", "")), body)
+
+
+def iter_mail_texts(path):
+    """Yield message texts from an mbox file, a Maildir, a single .eml or a folder of .eml files."""
+    if os.path.isdir(path):
+        if all(os.path.isdir(os.path.join(path, sub)) for sub in ("cur", "new")):
+            for msg in mailbox.Maildir(path, factory=None):
+                yield message_text(email.message_from_bytes(msg.as_bytes(), policy=policy.default))
+            return
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                yield from iter_mail_texts(os.path.join(root, name))
+        return
+    if path.lower().endswith(".eml"):
+        with open(path, "rb") as f:
+            yield message_text(email.message_from_binary_file(f, policy=policy.default))
+    elif path.lower().endswith((".mbox", ".mbx")) or os.path.basename(path).lower() == "mbox":
+        for msg in mailbox.mbox(path):
+            yield message_text(email.message_from_bytes(msg.as_bytes(), policy=policy.default))
+
+
+def train_from_paths(spam_paths, ham_paths, batch_size=TRAIN_BATCH):
+    """Stream labeled messages into partial_fit in mixed batches. Returns (spam, ham) counts."""
+    import itertools
+
+    sources = [((text, 1) for p in spam_paths for text in iter_mail_texts(p)),
+               ((text, 0) for p in ham_paths for text in iter_mail_texts(p))]
+    # Interleave spam and ham so every batch sees both classes
+    interleaved = (item for pair in itertools.zip_longest(*sources) for item in pair if item)
+    counts = [0, 0]
+    while True:
+        batch = list(itertools.islice(interleaved, batch_size))
+        if not batch:
+            break
+        texts, labels = zip(*batch)
+        partial_fit(list(texts), list(labels))
+        for label in labels:
+            counts[1 - label] += 1
+    save_model()
+    return counts[0], counts[1]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train or update the online hashing spam model.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("train", "Train from labeled mbox/Maildir/.eml folders"),
+                            ("update", "Learn from messages the user marked spam / not spam")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--spam", nargs="*", default=[], help="Spam mbox files, Maildirs, .eml files or folders")
+        cmd.add_argument("--ham", nargs="*", default=[], help="Not-spam mbox files, Maildirs, .eml files or folders")
+    check = sub.add_parser("check", help="Score messages with the current model")
+    check.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        for path in args.paths:
+            for text in iter_mail_texts(path):
+                verdict = "🚫 spam" if is_spam(text) else "✅ not spam"
+                print(f"{verdict}  {text.splitlines()[0][:70]}")
+    else:
+        spam_count, ham_count = train_from_paths(args.spam, args.ham)
+        verb = "Trained on" if args.command == "train" else "Updated with"
+        print(f"✅ {verb} {spam_count} spam and {ham_count} not-spam messages → {ONLINE_MODEL_FILE}")
@@ -0,0 +1,42 @@
+# openai_client.py
+"""
+Shared OpenAI client, created on first use.
+
+Importing a module that talks to OpenAI no longer builds a client or
+requires OPENAI_API_KEY; the key is only checked when a request is made.
+Every completion runs inside `llm_slot()`, which the multi-account supervisor
+points at a semaphore shared by all worker processes.
+"""
+
+import contextlib
+import os
+import threading
+
+_client = None
+_lock = threading.Lock()
+_limiter = None
+
+
+def get_client():
+    """Return the process-wide OpenAI client, creating it on first call."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise ValueError("OPENAI_API_KEY not found in environment variables.")
+                from openai import OpenAI
+                _client = OpenAI(api_key=api_key)
+    return _client
+
+
+def set_concurrency_limiter(semaphore):
+    """Make llm_slot() hold `semaphore` (e.g. a multiprocessing Manager semaphore); None removes it."""
+    global _limiter
+    _limiter = semaphore
+
+
+def llm_slot():
+    """Context manager around one LLM request; waits for a free slot when a limiter is set."""
+    return _limiter if _limiter is not None else contextlib.nullcontext()
@@ -0,0 +1,149 @@
+# prompt_budget.py
+"""
+Shared preprocessing for email text sent to the LLM.
+
+Strips quoted reply chains, forwarded history and signatures, collapses
+whitespace and enforces a token budget, so long threads cost the same as the
+new message they carry. Tokens are counted with tiktoken when it is
+installed, otherwise with a ~4 characters/token estimate.
+"""
+
+import re
+import metrics
+
+# ------------------------
+# Config
+# ------------------------
+MAX_BODY_TOKENS = 1500     # email body in reply / summary prompts
+MAX_EVENT_TOKENS = 1000    # email body in calendar extraction prompts
+MAX_REPORT_TOKENS = 1000   # PDF report text in the daily report prompt
+MAX_ATTACHMENTS_TOKENS = 1200  # attachment text added after an email body
+TOKENIZER_ENCODING = "o200k_base"  # gpt-4o family
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARK = "\n[...]"
+MIN_OWN_TEXT_CHARS = 40    # shorter text above a forward ("FYI") keeps the forwarded message
+ATTACHMENTS_MARKER = "\n\n=== Attachments ===\n"  # separates extracted attachment text from the body
+
+# ------------------------
+# Precompiled patterns
+# ------------------------
+REPLY_HEADER_RE = re.compile(r"^[ \t]*On\b[^\n]{0,200}(?:\n[^\n]{0,200})?\bwrote:[ \t]*$", re.M)
+OUTLOOK_HEADER_RE = re.compile(r"^[ \t]*From:[^\n]+\n[ \t]*(?:Sent|Date):", re.M)
+ORIGINAL_MESSAGE_RE = re.compile(r"^[ \t]*-{2,}[ \t]*Original Message[ \t]*-{2,}", re.M | re.I)
+FORWARDED_RE = re.compile(r"^[ \t]*(?:-{2,}[ \t]*Forwarded message[ \t]*-{2,}|Begin forwarded message:)", re.M | re.I)
+QUOTED_LINE_RE = re.compile(r"^[ \t]*>[^\n]*(?:\n|$)", re.M)
+SIGNATURE_DELIMITER_RE = re.compile(r"^-- \r?$", re.M)  # RFC 3676 "-- " only; a bare "--" is content
+MOBILE_FOOTER_RE = re.compile(r"^[ \t]*(?:Sent from my \w[^\n]*|Get Outlook for \w[^\n]*)$", re.M | re.I)
+HORIZONTAL_SPACE_RE = re.compile(r"[ \t ​]+")
+BLANK_LINES_RE = re.compile(r"\n[ \t]*(?:\n[ \t]*)+")
+
+_encoding = None
+
+
+# ------------------------
+# Token counting
+# ------------------------
+def _get_encoding():
+    """tiktoken encoding, loaded on first use; False if tiktoken is unavailable."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens` tokens, marking the cut."""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        cut = encoding.decode(tokens[:max_tokens])
+    else:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max_chars]
+    # Prefer ending on a whole word
+    space = cut.rfind(" ", len(cut) - 40)
+    if space > 0:
+        cut = cut[:space]
+    metrics.incr("prompt.truncated")
+    return cut.rstrip() + TRUNCATION_MARK
+
+
+# ------------------------
+# Cleaning
+# ------------------------
+def compact_whitespace(text: str) -> str:
+    text = HORIZONTAL_SPACE_RE.sub(" ", text)
+    text = BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def _cut_at_first(text: str, patterns) -> str:
+    """Drop everything from the earliest match, unless that would leave nothing."""
+    cut = len(text)
+    for pattern in patterns:
+        m = pattern.search(text)
+        if m and m.start() < cut and text[:m.start()].strip():
+            cut = m.start()
+    return text[:cut]
+
+
+def strip_history(text: str, keep_forwarded: bool = False) -> str:
+    """
+    Remove quoted reply chains, earlier messages and the signature block.
+    A forwarded message is kept verbatim with `keep_forwarded`, or when the
+    text above it is too short to stand on its own.
+    """
+    forwarded = FORWARDED_RE.search(text)
+    forwarded_text = ""
+    if forwarded:
+        own_text = text[:forwarded.start()]
+        if keep_forwarded or len(compact_whitespace(own_text)) < MIN_OWN_TEXT_CHARS:
+            # Its From:/Date: block is the forward's header, not earlier history
+            text, forwarded_text = own_text, text[forwarded.start():]
+    text = _cut_at_first(text, [REPLY_HEADER_RE, OUTLOOK_HEADER_RE, ORIGINAL_MESSAGE_RE, FORWARDED_RE])
+    without_quotes = QUOTED_LINE_RE.sub("", text)
+    if without_quotes.strip():
+        text = without_quotes
+    text = _cut_at_first(text, [SIGNATURE_DELIMITER_RE])
+    return MOBILE_FOOTER_RE.sub("", text + forwarded_text)
+
+
+def split_attachments(body: str):
+    """(message text, attachment text) of a body that may carry extracted attachments."""
+    message, _, attached = body.partition(ATTACHMENTS_MARKER)
+    return message, attached
+
+
+def compact_email_body(body: str, max_tokens: int = MAX_BODY_TOKENS, keep_forwarded: bool = False,
+                       attachments_tokens: int = MAX_ATTACHMENTS_TOKENS) -> str:
+    """
+    Prepare an email body for a prompt: strip history and signatures,
+    collapse whitespace and enforce `max_tokens`. Attachment text is kept
+    apart from the stripping and has its own budget, `attachments_tokens`.
+    """
+    if not body:
+        return ""
+    body, attached = split_attachments(body)
+    compacted = compact_whitespace(strip_history(body, keep_forwarded))
+    if not compacted:
+        compacted = compact_whitespace(body)
+    metrics.incr("prompt.chars_removed", max(0, len(body) - len(compacted)))
+    compacted = truncate_to_tokens(compacted, max_tokens)
+    if attached.strip():
+        compacted += "\n\nAttachments:\n" + truncate_to_tokens(compact_whitespace(attached), attachments_tokens)
+    return compacted
@@ -1,17 +1,13 @@
 # reply_handler.py
-from openai import OpenAI
-import os
+import sys
 import base64
 from email.utils import parseaddr
-
-# ------------------------
-# Setup OpenAI client
-# ------------------------
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found in environment variables.")
-
-client = OpenAI(api_key=api_key)
+import metrics
+from openai_client import get_client, llm_slot
+from llm_stream import LiveDraft, clean_ai_draft, split_summary_and_reply, stream_chat
+from prompt_budget import compact_email_body
+import sender_reputation
+import spam_classifier
 
 # ------------------------
 # Prevent sending emails to yourself
@@ -23,32 +19,15 @@ def normalize_email(email):
     """Normalize email by removing aliases."""
     return email.split('+')[0].lower()
 
-# ------------------------
-# Clean AI-generated draft
-# ------------------------
-def clean_ai_draft(draft):
-    """Removes greetings, subject lines, and AI-generated signatures from draft."""
-    lines = draft.splitlines()
-    cleaned = []
-
-    for line in lines:
-        line_strip = line.strip()
-        if not line_strip:
-            continue
-        if line_strip.lower().startswith("dear "):
-            continue
-        if line_strip.lower().startswith("subject:"):
-            continue
-        if line_strip.lower() in ["best regards,", "regards,", "sincerely,", "thank you,"]:
-            continue
-        cleaned.append(line_strip)
-    return "\n".join(cleaned)
-
 # ------------------------
 # Generate AI Summary + Reply
 # ------------------------
-def generate_summary_and_reply(email_body, sender, subject):
-    prompt = f"""
+# clean_ai_draft and split_summary_and_reply live in llm_stream, which also
+# applies them incrementally while a reply streams in.
+
+def summary_reply_prompt(email_body, sender, subject):
+    email_body = compact_email_body(email_body)
+    return f"""
 You are an AI email assistant.
 
 1. First, summarize the incoming email in 2-3 sentences.
@@ -68,12 +47,17 @@ Summary:
 Reply:
 [reply here]
 """
+
+def generate_summary_and_reply(email_body, sender, subject):
+    prompt = summary_reply_prompt(email_body, sender, subject)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
+        with llm_slot(), metrics.timed("llm.reply"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+            )
+        metrics.record_llm_usage("llm.reply", response)
         draft = response.choices[0].message.content.strip()
         return draft
     except Exception as e:
@@ -93,22 +77,79 @@ def confirm_and_send(service, to_email, subject, body):
     raw_message = base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
     try:
         message = {"raw": raw_message}
-        sent = service.users().messages().send(userId="me", body=message).execute()
+        with metrics.timed("gmail.send"):
+            sent = service.users().messages().send(userId="me", body=message).execute()
         print(f"📧 Email sent successfully! ID: {sent['id']}")
+        return sent
     except Exception as e:
         print(f"❌ Error sending email: {e}")
+        return None
 
 # ------------------------
 # Handle individual incoming email (interactive)
 # ------------------------
-def handle_email(service, email_data):
+def is_ignored_sender(sender):
+    sender_email = parseaddr(sender)[1].lower()
+    return normalize_email(sender_email) in [normalize_email(e) for e in IGNORE_LIST]
+
+def analyze_email(email_data):
+    """
+    Non-interactive half of handle_email: the LLM call and draft parsing.
+    Safe to run on a worker thread. Returns (summary, reply) or None on failure.
+    """
+    subject = email_data["subject"] if email_data["subject"].strip() else "(No Subject)"
+    draft = generate_summary_and_reply(email_data["body"], email_data["sender"], subject)
+    if not draft:
+        return None
+    summary, reply = split_summary_and_reply(draft)
+    return (summary, reply) if reply else None
+
+def analyze_email_live(email_data):
+    """
+    Streaming analyze_email: returns a LiveDraft that is not started yet. Call
+    run() on a worker thread (or start()) and iterate it to show the summary
+    and reply as they are generated.
+    """
+    subject = email_data["subject"] if email_data["subject"].strip() else "(No Subject)"
+    prompt = summary_reply_prompt(email_data["body"], email_data["sender"], subject)
+    return LiveDraft(stream_chat("llm.reply", [{"role": "user", "content": prompt}], temperature=0.3))
+
+def show_live_draft(live, out=sys.stdout):
+    """Print a LiveDraft's summary and reply while they stream. Returns live.result()."""
+    out.write("\n--- AI-generated Summary ---\n")
+    out.flush()
+    section = "summary"
+    summary_shown = False
+    for kind, text in live:
+        if kind == "reply" and section == "summary":
+            if not summary_shown:
+                out.write("No summary generated.")
+            out.write("\n--------------------------\n\n--- AI-generated Reply ---\n")
+            section = "reply"
+        summary_shown = summary_shown or kind == "summary"
+        out.write(text)
+        out.flush()
+    if section == "summary" and not summary_shown:
+        out.write("No summary generated.")
+    out.write("\n--------------------------\n")
+    out.flush()
+    return live.result()
+
+def handle_email(service, email_data, analysis=None):
+    """
+    Show the email, its AI summary and reply, then ask before sending.
+    `analysis` is a precomputed analyze_email() result or a LiveDraft that may still be
+    streaming; when omitted the reply is streamed here as it is generated.
+    Returns the outcome: "processed" (reply sent), "skipped" (ignored or discarded)
+    or None when no reply could be generated or sent.
+    """
     sender = email_data["sender"]
     sender_email = parseaddr(sender)[1].lower()
 
     # Skip emails from yourself or ignored addresses
-    if normalize_email(sender_email) in [normalize_email(e) for e in IGNORE_LIST]:
+    if is_ignored_sender(sender):
         print(f"⚠️ Skipping email from yourself or ignored sender: {sender_email}")
-        return
+        return "skipped"
 
     subject = email_data["subject"] if email_data["subject"].strip() else "(No Subject)"
     body = email_data["body"]
@@ -119,37 +160,28 @@ def handle_email(service, email_data):
     print(body[:300] + "..." if len(body) > 300 else body)
     print("----------------------")
 
-    # Generate AI summary + reply
-    draft = generate_summary_and_reply(body, sender, subject)
-    if not draft:
-        print("❌ Failed to generate reply.")
-        return
-
-    # Split summary and reply from AI output
-    summary, reply = None, None
-    if "Summary:" in draft and "Reply:" in draft:
-        try:
-            parts = draft.split("Reply:")
-            summary = parts[0].replace("Summary:", "").strip()
-            reply = parts[1].strip()
-        except Exception:
-            reply = draft
+    # Generate AI summary + reply, shown token by token while it streams
+    if analysis is None:
+        analysis = analyze_email_live(email_data).start()
+    if isinstance(analysis, LiveDraft):
+        analysis = show_live_draft(analysis)
+        if not analysis:
+            print("❌ Failed to generate reply.")
+            return None
     else:
-        reply = draft
+        if not analysis:
+            print("❌ Failed to generate reply.")
+            return None
 
-    # Clean AI reply
-    reply_cleaned = clean_ai_draft(reply)
+        print("\n--- AI-generated Summary ---")
+        print(analysis[0] or "No summary generated.")
+        print("--------------------------")
 
-    print("\n--- AI-generated Summary ---")
-    if summary:
-        print(summary)
-    else:
-        print("No summary generated.")
-    print("--------------------------")
+        print("\n--- AI-generated Reply ---")
+        print(analysis[1])
+        print("--------------------------")
 
-    print("\n--- AI-generated Reply ---")
-    print(reply_cleaned)
-    print("--------------------------")
+    summary, reply_cleaned = analysis
 
     # Ask user for signature interactively
     name = input("Enter your name for signature: ").strip() or "Your Name"
@@ -172,15 +204,63 @@ def handle_email(service, email_data):
     # Confirm before sending
     choice = input("Do you want to send this reply? (y/n): ").strip().lower()
     if choice == "y":
-        confirm_and_send(service, sender_email, subject, final_reply)
-    else:
-        print("❌ Reply discarded.")
+        if not confirm_and_send(service, sender_email, subject, final_reply):
+            return None
+        # Replying is a strong "not spam" signal for this sender
+        sender_reputation.record_verdict(sender_email, False, weight=sender_reputation.USER_ACTION_WEIGHT, user=True)
+        spam_classifier.record_feedback(body, False, subject=email_data["subject"])
+        return "processed"
+    print("❌ Reply discarded.")
+    return "skipped"
+
+def create_draft_reply(service, email_data, analysis=None, signature=""):
+    """
+    Unattended counterpart of handle_email: save the AI reply as a Gmail draft in
+    the email's thread for the user to review. Returns "drafted", "skipped"
+    (ignored sender) or None when no reply could be generated or saved.
+    """
+    from email.mime.text import MIMEText
+
+    sender = email_data["sender"]
+    sender_email = parseaddr(sender)[1].lower()
+    if is_ignored_sender(sender):
+        return "skipped"
+
+    if analysis is None:
+        analysis = analyze_email(email_data)
+    elif isinstance(analysis, LiveDraft):
+        analysis = analysis.result()
+    if not analysis:
+        print(f"❌ Failed to generate reply for {email_data['id']}.")
+        return None
+
+    subject = email_data["subject"] if email_data["subject"].strip() else "(No Subject)"
+    recipient_name = parseaddr(sender)[0] or "there"
+    msg = MIMEText(f"Dear {recipient_name},\n\n{analysis[1]}\n\n{signature}".strip())
+    msg["to"] = sender_email
+    msg["subject"] = subject if subject.lower().startswith("re:") else "Re: " + subject
+    message_id = (getattr(email_data, "headers", None) or {}).get("Message-ID")
+    if message_id:
+        msg["In-Reply-To"] = message_id
+        msg["References"] = message_id
+
+    message = {"raw": base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")}
+    thread_id = getattr(email_data, "thread_id", None)
+    if thread_id:
+        message["threadId"] = thread_id
+    try:
+        with metrics.timed("gmail.draft"):
+            service.users().drafts().create(userId="me", body={"message": message}).execute()
+    except Exception as e:
+        print(f"❌ Error saving draft for {email_data['id']}: {e}")
+        return None
+    return "drafted"
 
 # ------------------------
 # Generate AI reply for mass email (auto signature from JSON)
 # ------------------------
-def generate_ai_reply_for_mass(recipient_name, instructions, subject):
-    prompt = f"""
+def mass_prompt(recipient_name, instructions, subject):
+    return f"""
 You are a professional email assistant.
 
 Recipient: {recipient_name}
@@ -191,12 +271,17 @@ Instructions / specifications: {instructions if instructions else 'Default profe
 Write a polite, engaging, professional email. Include proper greetings and closing.
 Do NOT include any signature — the signature will be added later manually.
 """
+
+def generate_ai_reply_for_mass(recipient_name, instructions, subject):
+    prompt = mass_prompt(recipient_name, instructions, subject)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
-        )
+        with llm_slot(), metrics.timed("llm.mass"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.4,
+            )
+        metrics.record_llm_usage("llm.mass", response)
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"❌ Error generating AI reply: {e}")
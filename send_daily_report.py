@@ -1,8 +1,6 @@
 import os
 import glob
 import base64
-import pandas as pd
-import schedule
 import threading
 import time
 from datetime import datetime
@@ -10,16 +8,17 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from PyPDF2 import PdfReader
-from openai import OpenAI
+import metrics
+import llm_batch
+from openai_client import get_client, llm_slot
+from prompt_budget import compact_whitespace, truncate_to_tokens, MAX_REPORT_TOKENS
 
 # === CONFIGURATION ===
 REPORTS_FOLDER = r"C:\RetailEye\outputs"
 RECIPIENTS_CSV = r"C:\Users\DELL\Documents\Stores\recipients.csv"
 EMAIL_COLUMN = "email"
-
-# Initialize OpenAI client (API key already in environment)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+DEFERRED_REPORTS = False  # scheduled reports: generate through the OpenAI Batch API (half price, arrives later)
+BATCH_POLL_SECONDS = 60  # deferred reports: how often to check the batch job
 
 # === FUNCTION TO GET NEWEST PDF ===
 def get_latest_pdf():
@@ -33,6 +32,8 @@ def load_recipients(csv_path):
     if not os.path.exists(csv_path):
         print(f"⚠️ Recipients CSV not found at {csv_path}")
         return []
+    import pandas as pd  # heavy, only needed when a report is actually sent
+
     df = pd.read_csv(csv_path)
     if EMAIL_COLUMN not in df.columns:
         print(f"⚠️ Column '{EMAIL_COLUMN}' not found in recipients CSV.")
@@ -40,15 +41,18 @@ def load_recipients(csv_path):
     return df[EMAIL_COLUMN].dropna().tolist()
 
 # === FUNCTION TO EXTRACT TEXT FROM PDF ===
+@metrics.instrument("pdf.extract")
 def extract_text_from_pdf(pdf_path):
     try:
+        from PyPDF2 import PdfReader
+
         reader = PdfReader(pdf_path)
         text = ""
         for page in reader.pages:
             page_text = page.extract_text() or ""
             text += page_text + "\n"
-        # Truncate to avoid overloading GPT
-        return text[:4000].strip()
+        # Collapse PDF layout whitespace, then cap the prompt size by tokens
+        return truncate_to_tokens(compact_whitespace(text), MAX_REPORT_TOKENS)
     except Exception as e:
         print(f"⚠️ Failed to read PDF: {e}")
         return ""
@@ -61,8 +65,7 @@ def extract_store_name(file_path):
     return clean_name or "Retail Store"
 
 # === FUNCTION TO GENERATE EMAIL BODY USING OPENAI ===
-def generate_email_body(store_name, pdf_path):
-    pdf_text = extract_text_from_pdf(pdf_path)
+def report_messages(store_name, pdf_text):
     prompt = f"""
     You are a helpful AI assistant writing daily business summary emails.
     The following is report data for the store "{store_name}".
@@ -79,23 +82,43 @@ def generate_email_body(store_name, pdf_path):
     - Do NOT include any personal signature; just end with a polite closing such as 'Best regards' or 'Thank you'.
     - Keep it plain text, not formatted for HTML or Markdown.
     """
+    return [
+        {"role": "system", "content": "You are a professional business communication assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+def fallback_email_body(store_name):
+    return f"Hello,\n\nThe daily report for {store_name} has been generated. Please find it attached or view it in the RetailEye app.\n\nBest regards,\nAI Agent"
 
+def generate_email_body(store_name, pdf_path):
+    pdf_text = extract_text_from_pdf(pdf_path)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a professional business communication assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6,
-        )
+        with llm_slot(), metrics.timed("llm.report"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=report_messages(store_name, pdf_text),
+                temperature=0.6,
+            )
+        metrics.record_llm_usage("llm.report", response)
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"⚠️ OpenAI generation failed: {e}")
-        return f"Hello,\n\nThe daily report for {store_name} has been generated. Please find it attached or view it in the RetailEye app.\n\nBest regards,\nAI Agent"
+        return fallback_email_body(store_name)
+
+def generate_email_body_deferred(store_name, pdf_path):
+    """generate_email_body through the OpenAI Batch API: half price, but returns when the batch job finishes."""
+    pdf_text = extract_text_from_pdf(pdf_path)
+    request = llm_batch.chat_request(store_name, report_messages(store_name, pdf_text), temperature=0.6)
+    try:
+        texts = llm_batch.run_batch([request], stage="llm.report_batch", description=f"Daily report: {store_name}",
+                                    poll_seconds=BATCH_POLL_SECONDS)
+    except Exception as e:
+        print(f"⚠️ OpenAI batch generation failed: {e}")
+        texts = {}
+    return texts.get(store_name) or fallback_email_body(store_name)
 
 # === MAIN REPORT SENDER FUNCTION ===
-def send_daily_report(service, sender):
+def send_daily_report(service, sender, deferred=False):
     latest_pdf = get_latest_pdf()
     if not latest_pdf:
         print("⚠️ No PDF report found in outputs folder.")
@@ -109,7 +132,10 @@ def send_daily_report(service, sender):
     store_name = extract_store_name(latest_pdf)
     now = datetime.now().strftime("%d %b %Y, %I:%M %p")
     subject = f"Daily Report of Store {store_name}"
-    body_text = generate_email_body(store_name, latest_pdf)
+    if deferred:
+        body_text = generate_email_body_deferred(store_name, latest_pdf)
+    else:
+        body_text = generate_email_body(store_name, latest_pdf)
 
     message = MIMEMultipart()
     message["to"] = ", ".join(recipients)
@@ -128,14 +154,19 @@ def send_daily_report(service, sender):
     raw_message = {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}
 
     try:
-        service.users().messages().send(userId="me", body=raw_message).execute()
+        with metrics.timed("gmail.send"):
+            service.users().messages().send(userId="me", body=raw_message).execute()
         print(f"✅ Smart AI-generated report email for '{store_name}' sent successfully to {len(recipients)} recipients at {now}.")
     except Exception as e:
         print("❌ Error sending daily report:", e)
 
 # === DAILY SCHEDULER FUNCTION ===
-def schedule_daily_report(service, sender):
-    schedule.every().day.at("20:00").do(send_daily_report, service, sender)
+def schedule_daily_report(service, sender, deferred=None):
+    import schedule
+
+    if deferred is None:
+        deferred = DEFERRED_REPORTS
+    schedule.every().day.at("20:00").do(send_daily_report, service, sender, deferred)
 
     def run_scheduler():
         while True:
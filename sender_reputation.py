@@ -0,0 +1,253 @@
+# sender_reputation.py
+"""
+Sender reputation cache and header rules ahead of the spam model.
+
+A persistent per-sender / per-domain table (allowlist, blocklist and running
+spam/ham counts) plus List-Unsubscribe / Precedence header rules decide mail
+from well-known senders without vectorizing the body. The table learns from
+model verdicts and from user actions (replying, allow/block). A sender ruled
+spam from its history is still re-checked by the model every RECHECK_EVERY
+messages, so a false positive can recover without the allow command.
+
+    python sender_reputation.py show
+    python sender_reputation.py allow boss@retaileye.in
+    python sender_reputation.py block offers.example.com
+"""
+
+import atexit
+import json
+import os
+import threading
+
+import metrics
+
+# ------------------------
+# Config
+# ------------------------
+REPUTATION_FILE = "sender_reputation.json"
+MIN_SAMPLES = 5          # verdicts needed before a sender/domain is trusted either way
+SPAM_RATIO = 0.9         # at or above: decided as spam
+HAM_RATIO = 0.1          # at or below: decided as not spam
+USER_ACTION_WEIGHT = 5   # a reply from the user counts as this many "not spam" verdicts
+RECHECK_EVERY = 10       # every Nth fast-path spam verdict for a sender runs the model instead
+SAVE_EVERY = 25          # write the table after this many updates (and at exit)
+# Shared mailbox providers: the domain says nothing about the sender
+FREEMAIL_DOMAINS = {"gmail.com", "googlemail.com", "yahoo.com", "outlook.com", "hotmail.com",
+                    "live.com", "icloud.com", "proton.me", "protonmail.com", "rediffmail.com"}
+
+_lock = threading.Lock()
+_table = None
+_dirty = 0
+
+
+# ------------------------
+# Persistence
+# ------------------------
+def _load():
+    global _table
+    if _table is None:
+        table = {"allow": [], "block": [], "senders": {}, "domains": {}, "fast_spam": {}}
+        if os.path.exists(REPUTATION_FILE):
+            try:
+                with open(REPUTATION_FILE, "r") as f:
+                    table.update(json.load(f))
+            except Exception as e:
+                print(f"⚠️ Failed to load {REPUTATION_FILE}: {e}")
+        table["allow"] = set(table["allow"])
+        table["block"] = set(table["block"])
+        _table = table
+    return _table
+
+
+def save():
+    """Write the table if it changed since the last save."""
+    global _dirty
+    with _lock:
+        if _table is None or not _dirty:
+            return
+        data = dict(_table, allow=sorted(_table["allow"]), block=sorted(_table["block"]))
+        tmp_file = REPUTATION_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_file, REPUTATION_FILE)
+        _dirty = 0
+
+
+def reset():
+    """Save and forget the loaded table, so the next lookup reads REPUTATION_FILE again."""
+    global _table
+    save()
+    with _lock:
+        _table = None
+
+
+def _mark_dirty():
+    global _dirty
+    _dirty += 1
+    return _dirty >= SAVE_EVERY
+
+
+atexit.register(save)
+
+
+# ------------------------
+# Lookups
+# ------------------------
+def _split(sender):
+    address = (sender or "").strip().lower()
+    domain = address.rsplit("@", 1)[1] if "@" in address else ""
+    return address, domain
+
+
+def _ratio_verdict(counts):
+    if not counts:
+        return None
+    spam, ham = counts
+    if spam + ham < MIN_SAMPLES:
+        return None
+    ratio = spam / (spam + ham)
+    if ratio >= SPAM_RATIO:
+        return True
+    if ratio <= HAM_RATIO:
+        return False
+    return None
+
+
+def header_verdict(headers):
+    """
+    Spam verdict from headers alone, or None. Only junk and bulk (marketing)
+    precedence counts: Precedence: list is every mailing list, team group and
+    notification service, which the model decides like any other mail.
+    """
+    if not headers:
+        return None
+    precedence = headers.get("Precedence", "").strip().lower()
+    if precedence == "junk":
+        return True
+    if headers.get("List-Unsubscribe") and precedence == "bulk":
+        return True
+    return None
+
+
+def check_sender(sender, headers=None):
+    """
+    Fast-path spam verdict: True (spam), False (not spam) or None (ask the model).
+    Order: allow/block lists, header rules, sender history, then domain history.
+    """
+    address, domain = _split(sender)
+    with _lock:
+        table = _load()
+        if address in table["allow"] or domain in table["allow"]:
+            return False
+        if address in table["block"] or domain in table["block"]:
+            return True
+        verdict = header_verdict(headers)
+        if verdict is not None:
+            return verdict
+        verdict = _ratio_verdict(table["senders"].get(address))
+        if verdict is None and domain not in FREEMAIL_DOMAINS:
+            verdict = _ratio_verdict(table["domains"].get(domain))
+        return verdict
+
+
+def _due_for_recheck(sender):
+    """
+    Counts a fast-path spam verdict for `sender`; True on every RECHECK_EVERY-th
+    one, when the model should decide instead. Blocklisted senders are never re-checked.
+    """
+    address, domain = _split(sender)
+    with _lock:
+        table = _load()
+        if address in table["block"] or domain in table["block"]:
+            return False
+        hits = table["fast_spam"].get(address, 0) + 1
+        table["fast_spam"][address] = hits % RECHECK_EVERY
+        _mark_dirty()
+        return hits >= RECHECK_EVERY
+
+
+# ------------------------
+# Updates
+# ------------------------
+def record_verdict(sender, is_spam, weight=1, user=False):
+    """
+    Add a spam/not-spam verdict (from the model or the user) to the sender and
+    domain counts. A `user` verdict also clears the sender's opposite count, so
+    what the user says overrides the model's history for that sender.
+    """
+    address, domain = _split(sender)
+    if not address:
+        return
+    with _lock:
+        table = _load()
+        index = 0 if is_spam else 1
+        for key, bucket in ((address, "senders"), (domain, "domains")):
+            if key:
+                counts = table[bucket].setdefault(key, [0, 0])
+                counts[index] += weight
+        if user:
+            table["senders"][address][1 - index] = 0
+            table["fast_spam"].pop(address, None)
+        should_save = _mark_dirty()
+    if should_save:
+        save()
+
+
+def allow_sender(address_or_domain):
+    with _lock:
+        table = _load()
+        key = address_or_domain.strip().lower()
+        table["block"].discard(key)
+        table["allow"].add(key)
+        _mark_dirty()
+    save()
+
+
+def block_sender(address_or_domain):
+    with _lock:
+        table = _load()
+        key = address_or_domain.strip().lower()
+        table["allow"].discard(key)
+        table["block"].add(key)
+        _mark_dirty()
+    save()
+
+
+def is_spam_email(record, model_check):
+    """
+    Reputation fast path first; `model_check(body, subject=...)` runs only for
+    undecided senders, so their body is the only one decoded and vectorized,
+    and for the occasional re-check of a sender ruled spam.
+    """
+    verdict = check_sender(record.sender, getattr(record, "headers", None))
+    if verdict is not None and not (verdict and _due_for_recheck(record.sender)):
+        metrics.incr("spam.fast_path")
+        return verdict
+    if verdict:
+        metrics.incr("spam.recheck")
+    spam = bool(model_check(record.body, subject=record.subject))
+    record_verdict(record.sender, spam)
+    return spam
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if command == "allow" and len(sys.argv) > 2:
+        allow_sender(sys.argv[2])
+        print(f"✅ Allowed {sys.argv[2]}")
+    elif command == "block" and len(sys.argv) > 2:
+        block_sender(sys.argv[2])
+        print(f"🚫 Blocked {sys.argv[2]}")
+    elif command == "show":
+        table = _load()
+        print(f"Allowlist: {', '.join(sorted(table['allow'])) or '-'}")
+        print(f"Blocklist: {', '.join(sorted(table['block'])) or '-'}")
+        print(f"\n{'sender':<40}{'spam':>6}{'ham':>6}  verdict")
+        ranked = sorted(table["senders"].items(), key=lambda item: -sum(item[1]))[:20]
+        for address, counts in ranked:
+            verdict = {True: "spam", False: "ok", None: "model"}[_ratio_verdict(counts)]
+            print(f"{address:<40}{counts[0]:>6}{counts[1]:>6}  {verdict}")
+    else:
+        print("Usage: python sender_reputation.py [show | allow <address|domain> | block <address|domain>]")
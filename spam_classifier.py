@@ -1,9 +1,26 @@
+import os
 import pickle
 import re
+import metrics
 
-# Load model and vectorizer
-model = pickle.load(open("spam_model.pkl", "rb"))
-vectorizer = pickle.load(open("vectorizer.pkl", "rb"))
+MODEL_FILE = "spam_model.pkl"
+VECTORIZER_FILE = "vectorizer.pkl"
+# "pickle": frozen TF-IDF model above; "online": hashing + SGD model in online_spam_model.py
+SPAM_ENGINE = os.getenv("SPAM_ENGINE", "pickle")
+
+model = None
+vectorizer = None
+
+
+def load_model():
+    """Load the pickled model and vectorizer on first use (unpickling pulls in sklearn)."""
+    global model, vectorizer
+    if model is None:
+        with open(VECTORIZER_FILE, "rb") as f:
+            vectorizer = pickle.load(f)
+        with open(MODEL_FILE, "rb") as f:
+            model = pickle.load(f)
+    return model, vectorizer
 
 def clean_text(text):
     # Basic cleaning
@@ -11,11 +28,22 @@ def clean_text(text):
     text = text.strip()
     return text
 
-def is_spam(email_text, threshold=0.8):
+@metrics.instrument("spam.score")
+def is_spam(email_text, threshold=0.8, subject=""):
+    if SPAM_ENGINE == "online":
+        import online_spam_model
+        return online_spam_model.is_spam(online_spam_model.spam_text(subject, email_text), threshold)
+    model, vectorizer = load_model()
     vec = vectorizer.transform([email_text])
     if hasattr(model, "predict_proba"):
         prob = model.predict_proba(vec)[0][1]  # probability of spam
         return prob >= threshold
     else:
         # fallback: use hard prediction
-        return model.predict(vec)[0] == 1
\ No newline at end of file
+        return model.predict(vec)[0] == 1
+
+def record_feedback(email_text, spam, subject=""):
+    """User marked a message spam / not spam; only the online engine can learn from it."""
+    if SPAM_ENGINE == "online":
+        import online_spam_model
+        online_spam_model.update(online_spam_model.spam_text(subject, email_text), spam)
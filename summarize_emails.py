@@ -1,16 +1,30 @@
 # summarize_emails.py
 
-import os
-from openai import OpenAI
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 
+import metrics
+from openai_client import get_client, llm_slot
+from prompt_budget import compact_email_body, count_tokens, split_attachments
 
-# Setup OpenAI client
+# ------------------------
+# Config
+# ------------------------
+TRIAGE_BATCH_TOKENS = 3000  # email text packed into one triage request
+TRIAGE_MAX_EMAILS = 20      # emails per triage request, so the JSON reply stays well under its limit
+TRIAGE_EMAIL_TOKENS = 400   # per email in a triage request, attachment text included
+TRIAGE_ATTACHMENTS_TOKENS = 100  # share of that for attachment text, when the email has any
+TRIAGE_WORKERS = 4          # triage requests in flight at once
+DEFAULT_PRIORITY = 3        # for emails the model did not score
 
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not set in environment variables.")
+TRIAGE_PROMPT = """Triage each email below. For every email return its id exactly as given,
+a one-sentence summary, and a priority from 1 to 5:
+5 = urgent, needs action today; 4 = needs a reply soon; 3 = normal;
+2 = low, can wait; 1 = FYI only (newsletters, notifications, receipts).
+Return ONLY JSON like:
+{"emails": [{"id": "<id>", "summary": "<one sentence>", "priority": <1-5>}]}
 
-client = OpenAI(api_key=api_key)
+"""
 
 
 # Summarize an email
@@ -20,18 +34,141 @@ def summarize_email(email_body):
     Generate a concise 3-bullet summary of an email using OpenAI.
     Returns a string containing the summary.
     """
-    prompt = f"Summarize the following email into 3 key bullet points:\n\n{email_body}"
+    prompt = f"Summarize the following email into 3 key bullet points:\n\n{compact_email_body(email_body)}"
 
     try:
-        response = client.chat.completions.create(
+        with llm_slot(), metrics.timed("llm.summary"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You summarize emails in exactly 3 bullet points."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3
+            )
+        metrics.record_llm_usage("llm.summary", response)
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"Error summarizing email: {e}")
+        return "Summary not available."
+
+
+# ------------------------
+# Batched triage
+# ------------------------
+def _triage_entry(email):
+    body_tokens = TRIAGE_EMAIL_TOKENS
+    if split_attachments(email["body"])[1].strip():
+        body_tokens -= TRIAGE_ATTACHMENTS_TOKENS
+    body = compact_email_body(email["body"], body_tokens, attachments_tokens=TRIAGE_ATTACHMENTS_TOKENS)
+    return f'<email id="{email["id"]}">\nFrom: {email["sender"]}\nSubject: {email["subject"]}\n\n{body}\n</email>'
+
+
+def pack_emails(emails, max_tokens=TRIAGE_BATCH_TOKENS, max_emails=TRIAGE_MAX_EMAILS):
+    """
+    Group `emails` (a list or a stream) into triage batches of at most
+    `max_tokens` of email text and `max_emails` emails each.
+    Yields lists of (email, prompt entry) pairs.
+    """
+    batch, used = [], 0
+    for email in emails:
+        entry = _triage_entry(email)
+        tokens = count_tokens(entry)
+        if batch and (used + tokens > max_tokens or len(batch) >= max_emails):
+            yield batch
+            batch, used = [], 0
+        batch.append((email, entry))
+        used += tokens
+    if batch:
+        yield batch
+
+
+def _priority(value):
+    try:
+        return min(5, max(1, int(value)))
+    except (TypeError, ValueError):
+        return DEFAULT_PRIORITY
+
+
+def triage_batch(batch):
+    """
+    One request for a packed batch. Returns {msg_id: {"summary", "priority"}}
+    for the emails the model answered; ids it invented are ignored.
+    """
+    prompt = TRIAGE_PROMPT + "\n\n".join(entry for _, entry in batch)
+    with llm_slot(), metrics.timed("llm.triage"):
+        response = get_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": "You summarize emails in exactly 3 bullet points."},
+                {"role": "system", "content": "You triage emails in JSON format only."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3
+            response_format={"type": "json_object"},
+            temperature=0.2
         )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"Error summarizing email: {e}")
-        return "Summary not available."
+    metrics.record_llm_usage("llm.triage", response)
+    metrics.incr("triage.emails", len(batch))
+
+    data = json.loads(response.choices[0].message.content)
+    ids = {email["id"] for email, _ in batch}
+    results = {}
+    for item in data.get("emails", []) if isinstance(data, dict) else []:
+        msg_id = str(item.get("id", ""))
+        if msg_id in ids and item.get("summary"):
+            results[msg_id] = {"summary": str(item["summary"]).strip(), "priority": _priority(item.get("priority"))}
+    return results
+
+
+def _summarize_alone(email):
+    return {"summary": summarize_email(email["body"]), "priority": DEFAULT_PRIORITY}
+
+
+def triage_emails(emails, max_tokens=TRIAGE_BATCH_TOKENS, workers=TRIAGE_WORKERS):
+    """
+    Summary and priority (1 = FYI ... 5 = urgent) for each of `emails`, keyed by
+    message id in input order. Emails are packed into as few requests as the
+    token budget allows, and each batch is sent as soon as it is full, so a
+    stream is triaged while later pages are still being fetched; only a few
+    batches are held in memory at a time. An email missing from its batch's
+    reply is summarized on its own.
+    """
+    results, order, pending = {}, [], {}
+
+    def collect(future):
+        batch = pending.pop(future)
+        try:
+            answered = future.result()
+        except Exception as e:
+            print(f"⚠️ Triage request for {len(batch)} email(s) failed: {e}")
+            answered = {}
+        missing = [email for email, _ in batch if email["id"] not in answered]
+        if missing:
+            metrics.incr("triage.fallback", len(missing))
+            for email, result in zip(missing, pool.map(_summarize_alone, missing)):
+                answered[email["id"]] = result
+        results.update(answered)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="triage") as pool:
+        for batch in pack_emails(emails, max_tokens):
+            order.extend(email["id"] for email, _ in batch)
+            pending[pool.submit(triage_batch, batch)] = batch
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+        for future in as_completed(list(pending)):
+            collect(future)
+    return {msg_id: results[msg_id] for msg_id in order}
+
+
+def triage_and_index(emails, **kwargs):
+    """triage_emails, with every summary and priority stored in the local mail index."""
+    import mail_index
+
+    results = triage_emails(emails, **kwargs)
+    for msg_id, result in results.items():
+        try:
+            mail_index.update_analysis(msg_id, summary=result["summary"], priority=result["priority"])
+        except Exception as e:
+            print(f"⚠️ Failed to index triage for {msg_id}: {e}")
+    return results
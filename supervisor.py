@@ -0,0 +1,163 @@
+# supervisor.py
+"""
+Run the agent unattended across every mailbox in accounts.json.
+
+Each account gets one worker per run in a process pool, so accounts are
+processed in parallel across cores. A worker streams the account's unread
+mail, saves AI replies as drafts in their threads, books free calendar slots
+and labels what it handled. All workers share one LLM concurrency limit, and
+every account's Gmail quota units and LLM tokens are accounted per day and
+stop a run once its daily budget is spent.
+
+    python supervisor.py                      # one pass over all accounts
+    python supervisor.py --interval 300       # poll every 5 minutes
+    python supervisor.py --processes 4 --llm-concurrency 16
+"""
+
+import argparse
+import contextlib
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import accounts
+
+LOG_FILE = "agent.log"  # per account, in its state directory
+
+
+# ------------------------
+# Worker (runs in a pool process)
+# ------------------------
+def _within_budget(records, budget):
+    """Stop the stream once this run has spent the account's remaining quota."""
+    import metrics
+
+    for record in records:
+        used = metrics.usage()
+        if (accounts.gmail_units(used["calls"]) >= budget["gmail_units"]
+                or used["llm_tokens"] >= budget["llm_tokens"]):
+            print("⚠️ Daily quota reached; stopping this run.")
+            metrics.incr("quota.stopped")
+            return
+        yield record
+
+
+def run_account(account, limiter=None, budget=None):
+    """One unattended pass over `account`'s unread mail. Returns a result dict."""
+    import metrics
+    import openai_client
+
+    accounts.activate(account)
+    metrics.reset()
+    openai_client.set_concurrency_limiter(limiter)
+
+    import calender_integration
+    import main
+    from email_pipeline import process_emails
+    from gmail_labels import OutcomeLabeler
+    from reply_handler import create_draft_reply
+
+    result = {"account": account["name"], "processed": 0, "error": None}
+    start = time.perf_counter()
+    with open(accounts.state_path(account, LOG_FILE), "a", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log):
+        print(f"\n=== {time.strftime('%Y-%m-%d %H:%M:%S')} run ===")
+        try:
+            # Workers never open a browser: tokens come from `python accounts.py add`
+            for token_file in (main.TOKEN_FILE, calender_integration.TOKEN_FILE):
+                if not os.path.exists(token_file):
+                    raise FileNotFoundError(f"{token_file} missing; run: python accounts.py add {account['name']}")
+
+            service, address = main.authenticate_gmail()
+            info = main.load_sender_info(address)
+            signature = "\n".join(info.get(key, "") for key in ("name", "designation", "company", "phone")).strip()
+            labeler = OutcomeLabeler(main.build_gmail_service())
+            labeler.flush()  # updates an earlier run could not send, before they are listed again
+            try:
+                emails = main.stream_incoming_emails(service, limit=account["max_emails"],
+                                                     prefetch_service=main.build_gmail_service(),
+                                                     on_spam=labeler.add_spam,
+                                                     attachment_service_factory=main.build_gmail_service)
+                if budget:
+                    emails = _within_budget(emails, budget)
+                result["processed"] = process_emails(
+                    service, emails, on_replied=main.mark_as_replied, on_outcome=labeler.add,
+                    handler=functools.partial(create_draft_reply, signature=signature),
+                )
+            finally:
+                labeler.flush()
+        except Exception as e:
+            print(f"❌ Run failed: {e}")
+            result["error"] = str(e)
+        print(metrics.format_profile())
+
+    import sender_reputation
+    sender_reputation.save()
+    result["elapsed"] = time.perf_counter() - start
+    result["usage"] = metrics.usage()
+    return result
+
+
+# ------------------------
+# Supervisor
+# ------------------------
+def run_all(account_list, processes=None, llm_concurrency=accounts.LLM_CONCURRENCY):
+    """Run every enabled account with quota left once, in parallel. Returns the worker results."""
+    runnable = []
+    for account in account_list:
+        if not account["enabled"]:
+            continue
+        budget = accounts.remaining(account)
+        if min(budget.values()) <= 0:
+            print(f"⏸️ {account['name']}: daily quota used up, skipped")
+            continue
+        runnable.append((account, budget))
+    if not runnable:
+        return []
+
+    processes = processes or min(len(runnable), os.cpu_count() or 1)
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    # A fresh process per account run, so no client, cache or token leaks between mailboxes
+    with ctx.Manager() as manager, \
+            ProcessPoolExecutor(processes, mp_context=ctx, max_tasks_per_child=1) as pool:
+        limiter = manager.BoundedSemaphore(llm_concurrency)
+        futures = {pool.submit(run_account, account, limiter, budget): account for account, budget in runnable}
+        for future in as_completed(futures):
+            account = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"account": account["name"], "processed": 0, "error": str(e),
+                          "elapsed": 0.0, "usage": {"calls": {}, "llm_tokens": 0}}
+            quota = accounts.record_usage(account, result["usage"], result["processed"])
+            status = f"❌ {result['error']}" if result["error"] else "✅"
+            print(f"{status} {account['name']}: {result['processed']} email(s) in {result['elapsed']:.1f}s, "
+                  f"today {quota['gmail_units']} Gmail units / {quota['llm_tokens']} LLM tokens")
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the agent for every account in accounts.json.")
+    parser.add_argument("--accounts", default=accounts.ACCOUNTS_FILE, help="Accounts config file")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: one per account, up to the CPU count)")
+    parser.add_argument("--llm-concurrency", type=int, help="LLM requests in flight across all workers")
+    parser.add_argument("--interval", type=float, help="Repeat every N seconds instead of running once")
+    args = parser.parse_args()
+
+    while True:
+        config = accounts.load_config(args.accounts)
+        if not config["accounts"]:
+            print(f"No accounts in {args.accounts}. Add one with: python accounts.py add <name>")
+            raise SystemExit(1)
+        started = time.perf_counter()
+        results = run_all(config["accounts"], args.processes,
+                          args.llm_concurrency or config["llm_concurrency"])
+        total = sum(r["processed"] for r in results)
+        print(f"🤖 {total} email(s) across {len(results)} account(s) in {time.perf_counter() - started:.1f}s")
+        if not args.interval:
+            break
+        time.sleep(max(0.0, args.interval - (time.perf_counter() - started)))
@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import attachments
+from inbox_stream import EmailRecord
+
+
+class FakeExtractor:
+    def __init__(self, service_factory):
+        self.futures = []
+
+    def submit(self, record):
+        future = Future()
+        self.futures.append((future, record))
+        threading.Timer(0.05, future.set_result, [record]).start()
+        return future
+
+    def close(self):
+        pass
+
+
+def _records(count, with_attachments=(), fetch_seconds=0.0, pulled=None):
+    for i in range(count):
+        time.sleep(fetch_seconds)
+        record = EmailRecord(f"m{i}", f"m{i}", "a@example.com", f"Subject {i}", _body="body")
+        if i in with_attachments:
+            record.attachments = [{"filename": "report.pdf"}]
+        if pulled is not None:
+            pulled.append(i)
+        yield record
+
+
+def test_first_record_is_not_held_for_lookahead(monkeypatch):
+    monkeypatch.setattr(attachments, "save", lambda: None)
+    pulled = []
+    stream = attachments.with_attachment_text(_records(20, pulled=pulled), None, lookahead=20)
+    assert next(stream).id == "m0"
+    assert pulled == [0]
+
+
+def test_order_kept_around_slow_extraction(monkeypatch):
+    monkeypatch.setattr(attachments, "save", lambda: None)
+    monkeypatch.setattr(attachments, "AttachmentExtractor", FakeExtractor)
+    records = _records(6, with_attachments={1, 4})
+    ids = [record.id for record in attachments.with_attachment_text(records, None, lookahead=3)]
+    assert ids == [f"m{i}" for i in range(6)]
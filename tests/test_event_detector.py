@@ -0,0 +1,27 @@
+from event_detector import evaluate
+
+GMAIL_REPLY = ("Thanks, that works for me.\n\n"
+               "On Mon, 5 Jan 2026 at 10:30, Priya Shah <priya@example.com> wrote:\n"
+               "> Can you send the updated price list?\n")
+OUTLOOK_REPLY = ("Noted, I will update the sheet.\n\n"
+                 "From: Rahul Mehta <rahul@example.com>\n"
+                 "Sent: Tuesday, January 6, 2026 4:15 PM\n"
+                 "To: Store Ops <ops@example.com>\n"
+                 "Subject: Stock levels\n\n"
+                 "Please check the stock levels for the Koramangala store.\n")
+MEETING_IN_REPLY = ("Let's meet on Friday at 3 pm to go through it.\n\n"
+                    "On Thu, 8 Jan 2026 at 09:12, Anil <anil@example.com> wrote:\n"
+                    "> Could we review the festive plan together?\n")
+FORWARDED_INVITE = ("FYI\n\n---------- Forwarded message ---------\n"
+                    "From: HR <hr@example.com>\nDate: Fri, 9 Jan 2026 at 11:00\n"
+                    "Subject: Interview\n\nYour interview is scheduled for 12 January at 2:30 PM.\n")
+NEWSLETTER = "This week's tips: keep your shelves tidy and your displays bright."
+
+LABELED = [(GMAIL_REPLY, False), (OUTLOOK_REPLY, False), (MEETING_IN_REPLY, True),
+           (FORWARDED_INVITE, True), (NEWSLETTER, False)]
+
+
+def test_reply_headers_do_not_make_candidates():
+    result = evaluate(LABELED)
+    assert result["recall"] == 1.0
+    assert result["llm_calls"] == 2
@@ -0,0 +1,38 @@
+import gmail_labels
+
+
+class FakeGmail:
+    def __init__(self, fail):
+        self.fail = fail
+        self.modified = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def batchModify(self, userId, body):
+        if self.fail:
+            raise OSError("backend error")
+        self.modified.append((tuple(body["addLabelIds"]), list(body["ids"])))
+        return self
+
+    def execute(self):
+        return {}
+
+
+def test_unsent_updates_carry_over_to_next_run(monkeypatch, tmp_path):
+    monkeypatch.setattr(gmail_labels, "PENDING_FILE", str(tmp_path / "pending_labels.json"))
+    monkeypatch.setattr(gmail_labels, "ensure_labels",
+                        lambda service: {name: name for name in gmail_labels.OUTCOME_LABELS.values()})
+
+    first = gmail_labels.OutcomeLabeler(FakeGmail(fail=True))
+    first.add("m1", "skipped")
+    first.add("m2", "spam")
+    assert first.flush() == 0
+
+    service = FakeGmail(fail=False)
+    assert gmail_labels.OutcomeLabeler(service).flush() == 2
+    assert sorted(service.modified) == [(("Agent/Skipped",), ["m1"]), (("Agent/Spam",), ["m2"])]
+    assert not (tmp_path / "pending_labels.json").exists()
@@ -0,0 +1,27 @@
+from html_text import html_to_text
+
+
+def test_omitted_head_end_tag_keeps_body():
+    html = "<html><head><title>x</title><body><p>Hi there, meeting at 3pm</p></body></html>"
+    assert html_to_text(html) == "Hi there, meeting at 3pm"
+
+
+def test_unclosed_hidden_cell_ends_with_its_row():
+    html = '<table><tr><td style="display:none">hidden<tr><td>Visible row<td>cell 2</table>'
+    assert html_to_text(html) == "Visible row cell 2"
+
+
+def test_end_tag_of_enclosing_element_ends_hidden_span():
+    assert html_to_text('<div><span style="display:none">x</div>visible') == "visible"
+
+
+def test_hidden_styles_are_parsed():
+    html = ('<div style="max-height:050px">shown</div><div style="max-height: 0px !important">gone</div>'
+            '<span style="DISPLAY: none">x</span><p style="visibility:hidden">y</p>ok')
+    assert html_to_text(html) == "shown\nok"
+
+
+def test_scripts_and_preheader_dropped():
+    html = ("<body><div style='display:none'>Preheader​​</div><script>var x;</script>"
+            "<ul><li>one<li>two</ul></body>")
+    assert html_to_text(html) == "- one\n- two"
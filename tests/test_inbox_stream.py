@@ -0,0 +1,23 @@
+import sender_reputation
+from inbox_stream import EmailRecord
+
+
+def test_header_names_match_case_insensitively():
+    record = EmailRecord.from_message({"id": "m1", "payload": {"headers": [
+        {"name": "from", "value": "News <news@shop.example>"},
+        {"name": "SUBJECT", "value": "Weekly deals"},
+        {"name": "Message-Id", "value": "<abc@shop.example>"},
+        {"name": "List-unsubscribe", "value": "<mailto:stop@shop.example>"},
+        {"name": "precedence", "value": "bulk"},
+        {"name": "X-Mailer", "value": "ignored"},
+    ]}})
+    assert record.sender == "news@shop.example"
+    assert record.subject == "Weekly deals"
+    assert record.headers == {
+        "From": "News <news@shop.example>",
+        "Subject": "Weekly deals",
+        "Message-ID": "<abc@shop.example>",
+        "List-Unsubscribe": "<mailto:stop@shop.example>",
+        "Precedence": "bulk",
+    }
+    assert sender_reputation.header_verdict(record.headers) is True
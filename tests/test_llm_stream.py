@@ -0,0 +1,66 @@
+import random
+
+from llm_stream import DraftFilter, LiveDraft, SummaryReplySplitter, clean_ai_draft, split_summary_and_reply
+
+DRAFTS = [
+    "Dear Anna,\n\nThanks for the update.  \nSubject: Re: plans\nI'll send the file today.\n\nBest regards,\nSam",
+    "  Regards, see below\r\nDear team\nsubject line ahead\nThank you,\n\n",
+    "Sincerely,   \nDe\nSub\nOK",
+    "",
+]
+SUMMARY_DRAFTS = [
+    "Summary: They ask for the report.\nReply: Dear Bob,\nI'll send it Friday.\nBest regards,",
+    "Summary:  Two asks.  \n\nReply:\nFirst answer.\nReply: second answer kept\nRegards,",
+    "Reply: no summary here\nSummary: and a late one",
+    "Just a reply, no markers.",
+]
+
+
+def _chunkings(text, rng):
+    yield [text]
+    yield list(text)
+    for _ in range(20):
+        cuts = sorted(rng.sample(range(len(text) + 1), min(len(text), rng.randint(1, 8))))
+        yield [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def _filtered(chunks):
+    draft_filter = DraftFilter()
+    out = "".join(draft_filter.feed(chunk) for chunk in chunks) + draft_filter.finish()
+    assert out == draft_filter.text
+    return out
+
+
+def _split(chunks):
+    splitter = SummaryReplySplitter()
+    events = [event for chunk in chunks for event in splitter.feed(chunk)] + splitter.finish()
+    summary = "".join(text for kind, text in events if kind == "summary")
+    return summary or None, "".join(text for kind, text in events if kind == "reply")
+
+
+def test_draft_filter_matches_clean_ai_draft():
+    rng = random.Random(7)
+    for draft in DRAFTS + SUMMARY_DRAFTS:
+        for chunks in _chunkings(draft, rng):
+            assert _filtered(chunks) == clean_ai_draft(draft)
+
+
+def test_splitter_matches_split_summary_and_reply():
+    rng = random.Random(11)
+    for draft in SUMMARY_DRAFTS:
+        for chunks in _chunkings(draft, rng):
+            assert _split(chunks) == split_summary_and_reply(draft)
+
+
+def test_second_reply_marker_stays_in_reply():
+    summary, reply = split_summary_and_reply(SUMMARY_DRAFTS[1])
+    assert summary == "Two asks."
+    assert reply == "First answer.\nReply: second answer kept"
+
+
+def test_live_draft_result_is_what_was_shown():
+    draft = SUMMARY_DRAFTS[1]
+    live = LiveDraft(list(draft)).run()
+    shown = list(live)
+    assert live.result() == split_summary_and_reply(draft)
+    assert "".join(text for kind, text in shown if kind == "reply") == live.result()[1]
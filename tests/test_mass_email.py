@@ -0,0 +1,50 @@
+import builtins
+import types
+
+import llm_batch
+import mass_email
+
+RECIPIENTS = [{"name": "Ann", "email": "ann@example.com"}, {"name": "Bo", "email": "bo@example.com"}]
+SENDER = {"name": "Me", "email": "me@example.com"}
+
+
+def _campaign(monkeypatch, tmp_path, status, texts, answers):
+    monkeypatch.setattr(mass_email, "PENDING_CAMPAIGNS_FILE", str(tmp_path / "pending.json"))
+    monkeypatch.setattr(llm_batch, "submit", lambda requests, description=None: "batch_1")
+    monkeypatch.setattr(llm_batch, "wait", lambda batch_id, poll, timeout: types.SimpleNamespace(status=status))
+    monkeypatch.setattr(llm_batch, "results", lambda batch, stage: dict(texts) if batch.status == "completed" else {})
+    monkeypatch.setattr(mass_email, "generate_ai_reply_for_mass", lambda recipient_name, instructions, subject:
+                        f"fresh draft for {recipient_name}")
+    answers = iter(answers)
+    monkeypatch.setattr(builtins, "input", lambda prompt="": next(answers))
+    sent = []
+    monkeypatch.setattr(mass_email, "_send_campaign",
+                        lambda service, sender_info, recipients, subject, bodies: sent.extend(bodies))
+    campaign = mass_email.submit_campaign(RECIPIENTS, "mention the sale", "Offers")
+    return campaign, sent
+
+
+def test_failed_batch_never_sends_instructions(monkeypatch, tmp_path):
+    campaign, sent = _campaign(monkeypatch, tmp_path, "expired", {}, ["n"])
+    assert mass_email.collect_campaign_bodies(campaign) is None
+    assert sent == [] and mass_email._load_pending() == []
+
+
+def test_missing_drafts_regenerated_on_request(monkeypatch, tmp_path):
+    campaign, _ = _campaign(monkeypatch, tmp_path, "completed", {"0": "batch draft"}, ["y"])
+    assert mass_email.collect_campaign_bodies(campaign) == ["batch draft", "fresh draft for Bo"]
+
+
+def test_running_batch_is_saved_and_resumed(monkeypatch, tmp_path):
+    campaign, sent = _campaign(monkeypatch, tmp_path, "completed", {"0": "a", "1": "b"}, ["y"])
+
+    def still_running(batch_id, poll, timeout):
+        raise TimeoutError(batch_id)
+
+    monkeypatch.setattr(llm_batch, "wait", still_running)
+    assert mass_email.collect_campaign_bodies(campaign) is None
+    assert [c["batch_id"] for c in mass_email._load_pending()] == ["batch_1"]
+
+    monkeypatch.setattr(llm_batch, "wait", lambda batch_id, poll, timeout: types.SimpleNamespace(status="completed"))
+    mass_email.resume_pending_campaigns(None, SENDER)
+    assert sent == ["a", "b"] and mass_email._load_pending() == []
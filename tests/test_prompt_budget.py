@@ -0,0 +1,41 @@
+from prompt_budget import compact_email_body, strip_history
+
+FORWARD = ("FYI\n\n---------- Forwarded message ---------\n"
+           "From: Priya <p@x.com>\nDate: Mon, 20 Oct 2026 at 10:02\nSubject: Review\nTo: me@x.com\n\n"
+           "Can we meet on Thursday 23 October at 3 PM to go over the store review?\n")
+
+
+def test_forwarded_invite_kept_for_calendar_extraction():
+    body = compact_email_body(FORWARD, 1000, keep_forwarded=True)
+    assert "Thursday 23 October at 3 PM" in body
+    assert body.startswith("FYI")
+
+
+def test_short_note_above_forward_keeps_forwarded_message():
+    assert "Thursday 23 October at 3 PM" in compact_email_body(FORWARD)
+
+
+def test_forward_dropped_below_a_real_message():
+    body = ("Hi team, please review the notes below before tomorrow's call and send me your comments.\n\n"
+            + FORWARD.split("\n\n", 1)[1])
+    compacted = compact_email_body(body)
+    assert compacted.startswith("Hi team")
+    assert "Thursday" not in compacted
+
+
+def test_reply_history_still_stripped():
+    body = "Sounds good, see you then.\n\nOn Mon, 20 Oct 2026 at 10:02, Priya <p@x.com> wrote:\n> Can we meet?\n"
+    assert compact_email_body(body) == "Sounds good, see you then."
+
+
+def test_outlook_history_still_stripped():
+    body = "Approved.\n\nFrom: Priya <p@x.com>\nSent: Monday, October 20, 2026 10:02 AM\nSubject: Budget\n\nPlease approve."
+    assert compact_email_body(body) == "Approved."
+
+
+def test_bare_double_dash_is_content():
+    assert compact_email_body("Agenda\n--\nItem 1: budget") == "Agenda\n--\nItem 1: budget"
+
+
+def test_rfc_signature_delimiter_strips_signature():
+    assert strip_history("Thanks for the update.\n-- \nSahil Arora\nTeam Head").strip() == "Thanks for the update."
@@ -0,0 +1,49 @@
+from sender_reputation import header_verdict
+
+
+def test_bulk_mail_with_unsubscribe_is_spam():
+    assert header_verdict({"List-Unsubscribe": "<mailto:u@x.com>", "Precedence": "bulk"}) is True
+    assert header_verdict({"Precedence": "junk"}) is True
+
+
+def test_mailing_lists_are_left_to_the_model():
+    headers = {"List-Unsubscribe": "<mailto:team+unsubscribe@googlegroups.com>", "Precedence": "list"}
+    assert header_verdict(headers) is None
+    assert header_verdict({"From": "notifications@github.com"}) is None
+
+
+def _fresh_table(monkeypatch, tmp_path):
+    import sender_reputation
+
+    monkeypatch.setattr(sender_reputation, "REPUTATION_FILE", str(tmp_path / "reputation.json"))
+    sender_reputation.reset()
+    return sender_reputation
+
+
+def test_sender_ruled_spam_is_rechecked_and_recovers(monkeypatch, tmp_path):
+    reputation = _fresh_table(monkeypatch, tmp_path)
+    from inbox_stream import EmailRecord
+
+    for _ in range(reputation.MIN_SAMPLES):
+        reputation.record_verdict("news@shop.example", True)
+    record = EmailRecord("m1", "m1", "news@shop.example", "Your order", _body="Your order has shipped.")
+    checked = []
+
+    def model_check(body, subject=""):
+        checked.append(body)
+        return False
+
+    verdicts = [reputation.is_spam_email(record, model_check) for _ in range(reputation.RECHECK_EVERY)]
+    assert verdicts[:-1] == [True] * (reputation.RECHECK_EVERY - 1)
+    assert verdicts[-1] is False and len(checked) == 1
+    reputation.reset()
+
+
+def test_user_reply_overrides_spam_history(monkeypatch, tmp_path):
+    reputation = _fresh_table(monkeypatch, tmp_path)
+    for _ in range(50):
+        reputation.record_verdict("friend@shop.example", True)
+    assert reputation.check_sender("friend@shop.example") is True
+    reputation.record_verdict("friend@shop.example", False, weight=reputation.USER_ACTION_WEIGHT, user=True)
+    assert reputation.check_sender("friend@shop.example") is False
+    reputation.reset()
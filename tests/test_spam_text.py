@@ -0,0 +1,45 @@
+import base64
+from email.message import EmailMessage
+
+import online_spam_model
+import sender_reputation
+from inbox_stream import EmailRecord
+
+HTML = "<html><body><p>Huge <b>festive</b> sale</p><div style='display:none'>preheader</div></body></html>"
+
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def test_training_text_matches_scoring_text():
+    msg = EmailMessage()
+    msg["Subject"] = "Offers inside"
+    msg.set_content(HTML, subtype="html")
+    record = EmailRecord.from_message({"id": "m1", "payload": {
+        "mimeType": "text/html",
+        "headers": [{"name": "From", "value": "shop@example.com"}, {"name": "Subject", "value": "Offers inside"}],
+        "body": {"data": _b64(HTML)},
+    }})
+    assert online_spam_model.message_text(msg) == online_spam_model.spam_text(record.subject, record.body)
+
+
+def test_model_check_gets_subject(monkeypatch):
+    monkeypatch.setattr(sender_reputation, "check_sender", lambda sender, headers=None: None)
+    monkeypatch.setattr(sender_reputation, "record_verdict", lambda sender, spam: None)
+    seen = {}
+
+    def model_check(body, subject=""):
+        seen.update(body=body, subject=subject)
+        return False
+
+    record = EmailRecord("m2", "m2", "a@example.com", "Invoice", _body="Please find the invoice.")
+    sender_reputation.is_spam_email(record, model_check)
+    assert seen == {"body": "Please find the invoice.", "subject": "Invoice"}
+
+
+def test_feedback_text_leaves_out_attachments():
+    record = EmailRecord("m3", "m3", "a@example.com", "Invoice", _body="Please find the invoice.")
+    scored = online_spam_model.spam_text(record.subject, record.body)
+    record.add_attachment_text("[invoice.pdf]\nTotal due: 4,500")
+    assert online_spam_model.spam_text(record.subject, record.body) == scored
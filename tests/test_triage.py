@@ -0,0 +1,38 @@
+import summarize_emails
+from summarize_emails import pack_emails, triage_emails
+
+
+def _emails(n, words=20):
+    return [{"id": f"m{i}", "sender": "a@example.com", "subject": f"Note {i}", "body": "word " * words}
+            for i in range(n)]
+
+
+def test_pack_emails_respects_count_and_token_budget():
+    batches = list(pack_emails(_emails(45), max_tokens=10**6, max_emails=20))
+    assert [len(b) for b in batches] == [20, 20, 5]
+    batches = list(pack_emails(_emails(6, words=200), max_tokens=450))
+    assert all(len(b) <= 2 for b in batches) and sum(map(len, batches)) == 6
+
+
+def test_triage_emails_keeps_order_and_falls_back_for_missing_ids(monkeypatch):
+    def fake_batch(batch):
+        # The model drops every third email
+        return {email["id"]: {"summary": "s", "priority": 4}
+                for email, _ in batch if int(email["id"][1:]) % 3}
+
+    monkeypatch.setattr(summarize_emails, "triage_batch", fake_batch)
+    monkeypatch.setattr(summarize_emails, "summarize_email", lambda body: "alone")
+    results = triage_emails(iter(_emails(50)), max_tokens=200, workers=2)
+    assert list(results) == [f"m{i}" for i in range(50)]
+    assert results["m3"] == {"summary": "alone", "priority": summarize_emails.DEFAULT_PRIORITY}
+    assert results["m4"] == {"summary": "s", "priority": 4}
+
+
+def test_triage_entry_budget_includes_attachments():
+    from prompt_budget import ATTACHMENTS_MARKER, count_tokens
+
+    email = {"id": "m1", "sender": "a@example.com", "subject": "Report",
+             "body": "Numbers attached. " * 400 + ATTACHMENTS_MARKER + "[report.pdf]\n" + "sales figure " * 2000}
+    entry = summarize_emails._triage_entry(email)
+    assert "Attachments:" in entry
+    assert count_tokens(entry) <= summarize_emails.TRIAGE_EMAIL_TOKENS + 40  # envelope and cut marks